@@ -1,16 +1,24 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, Response, stream_with_context, abort
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from models import db, User, Lieferant, Buchung, Lager, Artikel, Rolle, Auftrag, Todo, Kunde, auftrag_artikel
+from models import db, User, Lieferant, Buchung, Lager, Artikel, Rolle, Auftrag, Todo, Kunde, SyncLauf, auftrag_artikel
 from config import Config
 from datetime import datetime, date
 from decimal import Decimal
 from functools import wraps
 import os
-from werkzeug.utils import secure_filename
 
 # Import Gmail und PDF Services
 from services.gmail_service import GmailService
+from services.job_service import JobService, worker_starten
 from services.pdf_service import PDFService
+from services.dashboard_service import DashboardService
+from services.buchungen_service import BuchungenService
+from services.listen_service import ListenService
+from services.export_service import ExportService, EXPORT_FORMATE
+from services.bankimport_service import BankimportService
+from services.abgleich_service import AbgleichService
+from services.duplikat_service import DuplikatService
+from services.pdf_ablage import PDFAblage
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -42,56 +50,27 @@ def index():
         if jahr < 2025:
             jahr = 2025
     
-    # Kennzahlen für das ausgewählte Jahr
-    einnahmen = db.session.query(db.func.sum(Buchung.betrag)).filter(
-        Buchung.typ == 'Einnahme',
-        Buchung.jahr == jahr
-    ).scalar() or Decimal('0.00')
-    
-    ausgaben = db.session.query(db.func.sum(Buchung.betrag)).filter(
-        Buchung.typ == 'Ausgabe',
-        Buchung.jahr == jahr
-    ).scalar() or Decimal('0.00')
-    
-    gewinn = einnahmen - ausgaben
-    
-    # Monatsübersicht für Diagramm
-    monatsdaten = db.session.query(
-        db.func.strftime('%m', Buchung.datum).label('monat'),
-        db.func.sum(Buchung.betrag).label('betrag')
-    ).filter(
-        Buchung.jahr == jahr
-    ).group_by('monat').all()
-    
-    monats_einnahmen = {}
-    monats_ausgaben = {}
-    
-    for monat, betrag in monatsdaten:
-        buchungen = Buchung.query.filter(
-            db.func.strftime('%m', Buchung.datum) == monat,
-            Buchung.jahr == jahr
-        ).all()
-        
-        for b in buchungen:
-            if b.typ == 'Einnahme':
-                monats_einnahmen[monat] = monats_einnahmen.get(monat, Decimal('0.00')) + b.betrag
-            else:
-                monats_ausgaben[monat] = monats_ausgaben.get(monat, Decimal('0.00')) + b.betrag
-    
+    # Kennzahlen und Monatsübersicht für das ausgewählte Jahr (aus dem Monats-Rollup)
+    uebersicht = DashboardService().get_jahresuebersicht(jahr)
+
     # Jahre für Dropdown generieren
     current_year = datetime.now().year
     start_year = 2025
     end_year = current_year + 2
     jahre = list(range(start_year, end_year + 1))
     
+    # Laufende Gmail-Synchronisation (Fortschrittsanzeige)
+    sync_job = JobService().get_aktiver_job()
+    
     return render_template('dashboard.html', 
                          jahr=jahr,
+                         sync_job=sync_job,
                          jahre=jahre,
-                         einnahmen=einnahmen,
-                         ausgaben=ausgaben,
-                         gewinn=gewinn,
-                         monats_einnahmen=monats_einnahmen,
-                         monats_ausgaben=monats_ausgaben)
+                         einnahmen=uebersicht['einnahmen'],
+                         ausgaben=uebersicht['ausgaben'],
+                         gewinn=uebersicht['gewinn'],
+                         monats_einnahmen=uebersicht['monats_einnahmen'],
+                         monats_ausgaben=uebersicht['monats_ausgaben'])
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -131,10 +110,10 @@ def einnahmen():
         current_year = datetime.now().year
         jahr = current_year if current_year >= 2025 else 2025
     
-    buchungen = Buchung.query.filter(
-        Buchung.typ == 'Einnahme',
-        Buchung.jahr == jahr
-    ).order_by(Buchung.datum.desc()).all()
+    # Nur die erste Seite laden, weitere per "Mehr laden" (einnahmen_seite)
+    service = BuchungenService(app.config['LISTEN_SEITENGROESSE'])
+    sortierung, richtung = service.sortierung_pruefen(request.args.get('sort'), request.args.get('richtung'))
+    buchungen, naechster_cursor = service.get_seite('Einnahme', jahr, sortierung=sortierung, richtung=richtung)
     
     # Jahre für Dropdown
     current_year = datetime.now().year
@@ -142,7 +121,32 @@ def einnahmen():
     end_year = current_year + 2
     jahre = list(range(start_year, end_year + 1))
     
-    return render_template('einnahmen.html', buchungen=buchungen, jahr=jahr, jahre=jahre)
+    return render_template('einnahmen.html', buchungen=buchungen, naechster_cursor=naechster_cursor,
+                           sortierung=sortierung, richtung=richtung, jahr=jahr, jahre=jahre)
+
+@app.route('/einnahmen/seite')
+@login_required
+def einnahmen_seite():
+    """Weitere Einnahmen nachladen (Tabellenzeilen als HTML-Fragment)"""
+    jahr = request.args.get('jahr', type=int)
+    if not jahr:
+        return jsonify({'error': 'Jahr fehlt'}), 400
+    
+    service = BuchungenService(app.config['LISTEN_SEITENGROESSE'])
+    try:
+        buchungen, naechster_cursor = service.get_seite(
+            'Einnahme', jahr,
+            cursor=request.args.get('cursor'),
+            sortierung=request.args.get('sort'),
+            richtung=request.args.get('richtung')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'html': render_template('einnahmen_zeilen.html', buchungen=buchungen),
+        'naechster_cursor': naechster_cursor
+    })
 
 @app.route('/einnahmen/neu', methods=['GET', 'POST'])
 @login_required
@@ -161,14 +165,20 @@ def einnahmen_neu():
         
         # PDF-Upload
         pdf_pfad = None
+        pdf_hash = None
         if 'pdf' in request.files:
             file = request.files['pdf']
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                filename = f"{timestamp}_{filename}"
-                pdf_pfad = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(pdf_pfad)
+                # Ablage nach Inhalt (SHA-256), gleiche PDFs werden nur einmal gespeichert
+                pdf_pfad, pdf_hash = PDFAblage().speichern(file.stream)
+        
+        # Dieselbe Rechnung (Nummer + Betrag) oder dasselbe PDF schon erfasst?
+        duplikat_service = DuplikatService()
+        duplikat = duplikat_service.finden('Einnahme', None, rechnungsnummer, betrag, pdf_hash)
+        if duplikat:
+            # Die abgelegte Datei entfernt scripts/duplikate.py --aufraeumen, falls sie verwaist
+            flash(f'Diese Rechnung ist bereits erfasst: {duplikat_service.beschreiben(duplikat)}.', 'error')
+            return redirect(url_for('einnahmen_neu'))
         
         buchung = Buchung(
             typ='Einnahme',
@@ -177,6 +187,7 @@ def einnahmen_neu():
             rechnungsnummer=rechnungsnummer,
             titel=titel,
             pdf_pfad=pdf_pfad,
+            pdf_hash=pdf_hash,
             jahr=datum.year,
             quelle='Manuell',
             ueberwiesen_am=ueberwiesen_am
@@ -203,37 +214,10 @@ def ausgaben():
         current_year = datetime.now().year
         jahr = current_year if current_year >= 2025 else 2025
     
-    # Alle aktiven Ausgaben-Lieferanten
-    lieferanten = Lieferant.query.filter_by(typ='Ausgabe', aktiv=True).order_by(Lieferant.name).all()
-    
-    # Buchungen nach Lieferant gruppiert
-    ausgaben_dict = {}
-    ausgaben_summens = {}  # Dictionary für Gesamtbeträge
-    
-    for lieferant in lieferanten:
-        buchungen = Buchung.query.filter(
-            Buchung.typ == 'Ausgabe',
-            Buchung.lieferant_id == lieferant.id,
-            Buchung.jahr == jahr
-        ).order_by(Buchung.datum.desc()).all()
-        if buchungen:
-            ausgaben_dict[lieferant] = buchungen
-            # Gesamtbetrag berechnen
-            gesamtbetrag = sum(float(b.betrag) for b in buchungen)
-            ausgaben_summens[lieferant] = gesamtbetrag
-    
-    # Buchungen ohne Lieferant
-    buchungen_ohne_lieferant = Buchung.query.filter(
-        Buchung.typ == 'Ausgabe',
-        Buchung.lieferant_id.is_(None),
-        Buchung.jahr == jahr
-    ).order_by(Buchung.datum.desc()).all()
-    
-    if buchungen_ohne_lieferant:
-        ausgaben_dict[None] = buchungen_ohne_lieferant
-        # Gesamtbetrag berechnen
-        gesamtbetrag = sum(float(b.betrag) for b in buchungen_ohne_lieferant)
-        ausgaben_summens[None] = gesamtbetrag
+    # Erste Seite je Lieferant inkl. Gesamtbeträge (eine Abfrage + Rollup), weitere per "Mehr laden"
+    service = BuchungenService(app.config['LISTEN_SEITENGROESSE'])
+    sortierung, richtung = service.sortierung_pruefen(request.args.get('sort'), request.args.get('richtung'))
+    ausgaben = service.get_ausgaben_nach_lieferant(jahr, sortierung=sortierung, richtung=richtung)
     
     # Jahre für Dropdown
     current_year = datetime.now().year
@@ -241,7 +225,87 @@ def ausgaben():
     end_year = current_year + 2
     jahre = list(range(start_year, end_year + 1))
     
-    return render_template('ausgaben.html', ausgaben_dict=ausgaben_dict, ausgaben_summens=ausgaben_summens, jahr=jahr, jahre=jahre)
+    return render_template('ausgaben.html',
+                           ausgaben_dict=ausgaben['ausgaben_dict'],
+                           ausgaben_summens=ausgaben['ausgaben_summens'],
+                           ausgaben_anzahl=ausgaben['ausgaben_anzahl'],
+                           naechste_cursor=ausgaben['naechste_cursor'],
+                           sortierung=sortierung, richtung=richtung,
+                           jahr=jahr, jahre=jahre)
+
+@app.route('/ausgaben/seite')
+@login_required
+def ausgaben_seite():
+    """Weitere Ausgaben eines Lieferanten nachladen (Tabellenzeilen als HTML-Fragment)"""
+    if not current_user.hat_berechtigung('ausgaben'):
+        return jsonify({'error': 'Keine Berechtigung'}), 403
+    
+    jahr = request.args.get('jahr', type=int)
+    if not jahr:
+        return jsonify({'error': 'Jahr fehlt'}), 400
+    
+    # 'sonstige' = Ausgaben ohne Lieferant
+    lieferant = request.args.get('lieferant', 'sonstige')
+    try:
+        lieferant_id = None if lieferant == 'sonstige' else int(lieferant)
+    except ValueError:
+        return jsonify({'error': 'Ungültiger Lieferant'}), 400
+    
+    service = BuchungenService(app.config['LISTEN_SEITENGROESSE'])
+    try:
+        buchungen, naechster_cursor = service.get_seite(
+            'Ausgabe', jahr,
+            cursor=request.args.get('cursor'),
+            sortierung=request.args.get('sort'),
+            richtung=request.args.get('richtung'),
+            lieferant_id=lieferant_id
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'html': render_template('ausgaben_zeilen.html', buchungen=buchungen),
+        'naechster_cursor': naechster_cursor
+    })
+
+@app.route('/export/<int:jahr>')
+@login_required
+def buchungen_export(jahr):
+    """Alle Buchungen eines Jahres als CSV bzw. DATEV-CSV (gestreamt)"""
+    if not current_user.hat_berechtigung('dashboard'):
+        flash('Sie haben keine Berechtigung für diesen Bereich.', 'error')
+        return redirect(url_for('login'))
+    
+    exportformat = request.args.get('format', 'csv')
+    if exportformat not in EXPORT_FORMATE:
+        flash(f'Unbekanntes Exportformat: {exportformat}', 'error')
+        return redirect(url_for('index', jahr=jahr))
+    
+    service = ExportService(
+        bankkonto=app.config['DATEV_BANKKONTO'],
+        erloeskonto=app.config['DATEV_ERLOESKONTO'],
+        aufwandskonto=app.config['DATEV_AUFWANDSKONTO']
+    )
+    zeichensatz = 'windows-1252' if exportformat == 'datev' else 'utf-8'
+    # Ohne Content-Length sendet der Server die Antwort in Chunks, sobald die Kopfzeile vorliegt
+    return Response(
+        stream_with_context(service.exportieren(jahr, exportformat)),
+        content_type=f'text/csv; charset={zeichensatz}',
+        headers={
+            'Content-Disposition': f'attachment; filename="{service.dateiname(jahr, exportformat)}"',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@app.route('/ausgaben/duplikate')
+@login_required
+def duplikate():
+    """Doppelt erfasste Rechnungen (gleiche Rechnung oder gleiches PDF)"""
+    if not current_user.hat_berechtigung('ausgaben'):
+        flash('Sie haben keine Berechtigung für diesen Bereich.', 'error')
+        return redirect(url_for('index'))
+    
+    return render_template('duplikate.html', gruppen=DuplikatService().bericht())
 
 @app.route('/ausgaben/zielkonto/<int:buchung_id>', methods=['POST'])
 @login_required
@@ -283,6 +347,85 @@ def einnahmen_ueberwiesen(buchung_id):
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/bank')
+@login_required
+def bank():
+    """Importierte Bankumsätze"""
+    if not current_user.hat_berechtigung('einnahmen'):
+        flash('Sie haben keine Berechtigung für diesen Bereich.', 'error')
+        return redirect(url_for('index'))
+    
+    service = BankimportService()
+    gesamt, offen = service.get_anzahl()
+    pruefliste = AbgleichService().get_pruefliste()
+    return render_template('bank.html', umsaetze=service.get_letzte_umsaetze(), gesamt=gesamt, offen=offen,
+                           pruefliste=pruefliste)
+
+@app.route('/bank/import', methods=['POST'])
+@login_required
+def bank_import():
+    """Kontoauszug (CSV) importieren"""
+    if not current_user.hat_berechtigung('einnahmen'):
+        flash('Sie haben keine Berechtigung für diesen Bereich.', 'error')
+        return redirect(url_for('index'))
+    
+    datei = request.files.get('datei')
+    if not datei or not datei.filename:
+        flash('Bitte eine CSV-Datei auswählen.', 'error')
+        return redirect(url_for('bank'))
+    
+    try:
+        ergebnis = BankimportService().importieren(datei.read())
+    except ValueError as e:
+        flash(f'Kontoauszug konnte nicht gelesen werden: {e}', 'error')
+        return redirect(url_for('bank'))
+    except Exception as e:
+        app.logger.error(f"Fehler beim Bankimport: {e}")
+        flash(f'Fehler beim Import: {str(e)}', 'error')
+        return redirect(url_for('bank'))
+    
+    flash(f"{ergebnis['importiert']} Umsätze importiert, {ergebnis['duplikate']} bereits vorhanden.", 'success')
+    if ergebnis['fehler']:
+        zeilen = ', '.join(str(nr) for nr, _ in ergebnis['fehler'][:10])
+        flash(f"{len(ergebnis['fehler'])} Zeilen übersprungen (Zeile {zeilen}{' ...' if len(ergebnis['fehler']) > 10 else ''}).", 'error')
+    return redirect(url_for('bank'))
+
+@app.route('/bank/abgleich', methods=['POST'])
+@login_required
+def bank_abgleich():
+    """Bankumsätze mit offenen Buchungen abgleichen"""
+    if not current_user.hat_berechtigung('einnahmen'):
+        flash('Sie haben keine Berechtigung für diesen Bereich.', 'error')
+        return redirect(url_for('index'))
+    
+    try:
+        ergebnis = AbgleichService(app.config['ABGLEICH_SCHWELLE']).abgleichen()
+        flash(f"{ergebnis['zugeordnet']} von {ergebnis['umsaetze']} Umsätzen zugeordnet, "
+              f"{ergebnis['vorschlaege']} Vorschläge zur Prüfung.", 'success')
+    except Exception as e:
+        app.logger.error(f"Fehler beim Bankabgleich: {e}")
+        flash(f'Fehler beim Abgleich: {str(e)}', 'error')
+    return redirect(url_for('bank'))
+
+@app.route('/bank/vorschlag/<int:id>/<aktion>', methods=['POST'])
+@login_required
+def bank_vorschlag(id, aktion):
+    """Vorschlag der Prüfliste bestätigen oder ablehnen"""
+    if not current_user.hat_berechtigung('einnahmen'):
+        flash('Sie haben keine Berechtigung für diesen Bereich.', 'error')
+        return redirect(url_for('index'))
+    
+    service = AbgleichService()
+    if aktion == 'bestaetigen':
+        buchung = service.bestaetigen(id)
+        flash(f'Umsatz der Buchung {buchung.rechnungsnummer or buchung.titel or buchung.id} zugeordnet.', 'success')
+    elif aktion == 'ablehnen':
+        service.ablehnen(id)
+        flash('Vorschlag abgelehnt.', 'success')
+    else:
+        abort(404)
+    return redirect(url_for('bank'))
+
 @app.route('/ausgaben/neu', methods=['GET', 'POST'])
 @login_required
 def ausgaben_neu():
@@ -303,14 +446,20 @@ def ausgaben_neu():
         
         # PDF-Upload
         pdf_pfad = None
+        pdf_hash = None
         if 'pdf' in request.files:
             file = request.files['pdf']
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                filename = f"{timestamp}_{filename}"
-                pdf_pfad = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(pdf_pfad)
+                # Ablage nach Inhalt (SHA-256), gleiche PDFs werden nur einmal gespeichert
+                pdf_pfad, pdf_hash = PDFAblage().speichern(file.stream)
+        
+        # Dieselbe Rechnung (Nummer + Betrag) oder dasselbe PDF schon erfasst?
+        duplikat_service = DuplikatService()
+        duplikat = duplikat_service.finden('Ausgabe', lieferant_id, rechnungsnummer, betrag, pdf_hash)
+        if duplikat:
+            # Die abgelegte Datei entfernt scripts/duplikate.py --aufraeumen, falls sie verwaist
+            flash(f'Diese Rechnung ist bereits erfasst: {duplikat_service.beschreiben(duplikat)}.', 'error')
+            return redirect(url_for('ausgaben_neu'))
         
         # Prüfe ob DPD-Rechnung (für automatisches Abbuchen)
         von_zielkonto_abgebucht = False
@@ -327,6 +476,7 @@ def ausgaben_neu():
             rechnungsnummer=rechnungsnummer,
             titel=titel,
             pdf_pfad=pdf_pfad,
+            pdf_hash=pdf_hash,
             jahr=datum.year,
             quelle='Manuell',
             von_zielkonto_abgebucht=von_zielkonto_abgebucht
@@ -358,12 +508,14 @@ def lieferanten_neu():
     if request.method == 'POST':
         name = request.form.get('name')
         gmail_label = request.form.get('gmail_label', '')
+        gmail_sync_intervall = request.form.get('gmail_sync_intervall', type=int)
         typ = request.form.get('typ')
         aktiv = request.form.get('aktiv') == 'on'
         
         lieferant = Lieferant(
             name=name,
             gmail_label=gmail_label,
+            gmail_sync_intervall=gmail_sync_intervall,
             typ=typ,
             aktiv=aktiv
         )
@@ -385,6 +537,7 @@ def lieferanten_bearbeiten(id):
     if request.method == 'POST':
         lieferant.name = request.form.get('name')
         lieferant.gmail_label = request.form.get('gmail_label', '')
+        lieferant.gmail_sync_intervall = request.form.get('gmail_sync_intervall', type=int)
         lieferant.typ = request.form.get('typ')
         lieferant.aktiv = request.form.get('aktiv') == 'on'
         
@@ -423,7 +576,8 @@ def lager():
         return redirect(url_for('index'))
     """Lager-Übersicht"""
     lager_id = request.args.get('lager_id', type=int)
-    lager_liste = Lager.query.filter_by(aktiv=True).order_by(Lager.name).all()
+    service = ListenService()
+    lager_liste = service.get_lager_liste()
     
     if not lager_liste:
         flash('Keine Lager vorhanden. Bitte erstellen Sie zuerst ein Lager.', 'info')
@@ -434,12 +588,10 @@ def lager():
         lager_id = lager_liste[0].id
     
     aktuelles_lager = Lager.query.get_or_404(lager_id)
-    artikel = Artikel.query.filter_by(lager_id=lager_id).order_by(Artikel.name).all()
+    artikel = service.get_artikel(lager_id)
     
-    # Artikelanzahl pro Lager für Template
-    artikel_anzahl = {}
-    for l in lager_liste:
-        artikel_anzahl[l.id] = Artikel.query.filter_by(lager_id=l.id).count()
+    # Artikelanzahl pro Lager für Template (eine gruppierte Abfrage)
+    artikel_anzahl = service.get_artikel_anzahl()
     
     return render_template('lager.html', 
                          lager_liste=lager_liste,
@@ -554,7 +706,8 @@ def artikel_neu():
         flash('Artikel erfolgreich angelegt.', 'success')
         return redirect(url_for('lager', lager_id=lager_id))
     
-    lager_liste = Lager.query.filter_by(aktiv=True).order_by(Lager.name).all()
+    service = ListenService()
+    lager_liste = service.get_lager_liste()
     if not lager_liste:
         flash('Bitte erstellen Sie zuerst ein Lager.', 'error')
         return redirect(url_for('lager_neu'))
@@ -590,7 +743,8 @@ def artikel_bearbeiten(id):
         flash('Artikel erfolgreich aktualisiert.', 'success')
         return redirect(url_for('lager', lager_id=lager_id))
     
-    lager_liste = Lager.query.filter_by(aktiv=True).order_by(Lager.name).all()
+    service = ListenService()
+    lager_liste = service.get_lager_liste()
     return render_template('artikel_form.html', artikel=artikel, lager_liste=lager_liste, lager_id=artikel.lager_id)
 
 @app.route('/artikel/<int:id>/loeschen', methods=['POST'])
@@ -647,13 +801,14 @@ def gmail_sync():
             flash('Gmail-Service konnte nicht initialisiert werden. Bitte prüfen Sie die Gmail-Credentials.', 'error')
             return redirect(url_for('index'))
         
-        # Synchronisation durchführen
-        anzahl = gmail_service.sync_rechnungen()
+        # Synchronisation als Hintergrund-Job einreihen (Fortschritt im Dashboard)
+        job, neu = JobService().einreihen(benutzer_id=current_user.id)
+        worker_starten(app)
         
-        if anzahl > 0:
-            flash(f'{anzahl} neue Rechnungen wurden importiert.', 'success')
+        if neu:
+            flash('Gmail-Synchronisation gestartet.', 'success')
         else:
-            flash('Keine neuen Rechnungen gefunden.', 'info')
+            flash('Es läuft bereits eine Gmail-Synchronisation.', 'info')
             
     except Exception as e:
         import traceback
@@ -664,11 +819,32 @@ def gmail_sync():
     
     return redirect(url_for('index'))
 
+@app.route('/gmail/sync/status')
+@login_required
+def gmail_sync_status():
+    """Status und Fortschritt des letzten Gmail-Sync-Jobs (JSON, vom Dashboard abgefragt)"""
+    job = JobService().get_letzter_job()
+    if not job:
+        return jsonify({'status': None})
+    return jsonify(job.als_dict())
+
+@app.route('/einstellungen/sync-laeufe')
+@login_required
+def sync_laeufe():
+    """Messwerte der letzten Gmail-Sync-Läufe (Zeiten je Stufe, Quota)"""
+    if not current_user.hat_berechtigung('benutzer'):
+        flash('Sie haben keine Berechtigung für diesen Bereich.', 'error')
+        return redirect(url_for('index'))
+    
+    laeufe = SyncLauf.query.order_by(SyncLauf.gestartet_am.desc()).limit(50).all()
+    return render_template('sync_laeufe.html', laeufe=laeufe)
+
 @app.route('/rechnungen/<path:filename>')
 @login_required
 def rechnungen(filename):
-    """PDF-Dateien ausliefern"""
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    """PDF-Dateien ausliefern (Inhaltsname wird in der Ablage nachgeschlagen)"""
+    ablage = PDFAblage()
+    return send_from_directory(ablage.basis, os.path.relpath(ablage.pfad(filename), ablage.basis))
 
 # ==================== BENUTZER- UND ROLLENVERWALTUNG ====================
 
@@ -1015,12 +1191,9 @@ def auftraege():
         status_filter = request.args.get('status', 'alle')
         
         try:
-            query = Auftrag.query
-            
-            if status_filter != 'alle':
-                query = query.filter(Auftrag.status == status_filter)
-            
-            auftraege = query.order_by(Auftrag.created_at.desc()).all()
+            auftraege = ListenService().get_auftraege(
+                status=status_filter if status_filter != 'alle' else None
+            )
         except Exception as e:
             app.logger.error(f"Fehler beim Abrufen der Aufträge: {e}")
             import traceback
@@ -1446,7 +1619,7 @@ def kunden():
         flash('Sie haben keine Berechtigung für diesen Bereich.', 'error')
         return redirect(url_for('index'))
     
-    kunden = Kunde.query.order_by(Kunde.name).all()
+    kunden = ListenService().get_kunden()
     return render_template('kunden.html', kunden=kunden)
 
 @app.route('/kunden/neu', methods=['GET', 'POST'])
@@ -1524,6 +1697,10 @@ def init_db():
     with app.app_context():
         db.create_all()
         
+        # Ausstehende Schema-Migrationen anwenden (inkl. Aufbau des Monats-Rollups)
+        from migrate_schema import migrate
+        migrate()
+        
         # Standard-Admin-Benutzer erstellen (falls nicht vorhanden)
         if User.query.count() == 0:
             admin = User(username='admin')
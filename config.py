@@ -34,10 +34,41 @@ class Config:
         # Fallback auf absoluten Pfad
         GMAIL_TOKEN_PATH = '/opt/erp_tml/credentials/gmail_token.json'
     
+    # Gmail-Sync: Labels ohne Checkpoint nur über diesen Zeitraum prüfen (ältere per Backfill)
+    GMAIL_SYNC_ZEITRAUM_TAGE = int(os.environ.get('GMAIL_SYNC_ZEITRAUM_TAGE') or 90)
+    # Gmail-Sync: parallele Anhang-Downloads (Threads) und PDF-Analysen (Prozesse, 0 = im Sync-Prozess;
+    # Standard: ein Kern bleibt für Downloads und Datenbank frei)
+    GMAIL_DOWNLOAD_THREADS = int(os.environ.get('GMAIL_DOWNLOAD_THREADS') or 4)
+    GMAIL_PDF_PROZESSE = int(os.environ.get('GMAIL_PDF_PROZESSE') or min(4, (os.cpu_count() or 1) - 1))
+    # Gmail-API: Quota-Einheiten je Sekunde (Gmail-Limit 250 je Nutzer, Reserve für andere Clients)
+    GMAIL_QUOTA_EINHEITEN_PRO_SEKUNDE = int(os.environ.get('GMAIL_QUOTA_EINHEITEN_PRO_SEKUNDE') or 200)
+    # Gmail-Sync: Zeiten je Pipeline-Stufe messen und je Lauf speichern (Tabelle sync_lauf, 0 = aus)
+    GMAIL_SYNC_MESSUNG = os.environ.get('GMAIL_SYNC_MESSUNG', '1') != '0'
+    # Gmail-Sync-Daemon (gmail_sync_cron.py --daemon): Intervall je Label, sofern beim Lieferanten
+    # nicht anders eingestellt, und längste Wartezeit nach Rate-Limit/Serverfehlern
+    GMAIL_SYNC_INTERVALL_MINUTEN = int(os.environ.get('GMAIL_SYNC_INTERVALL_MINUTEN') or 60)
+    GMAIL_SYNC_BACKOFF_MAX_MINUTEN = int(os.environ.get('GMAIL_SYNC_BACKOFF_MAX_MINUTEN') or 60)
+    GMAIL_DAEMON_STATUS_PATH = os.environ.get('GMAIL_DAEMON_STATUS_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'gmail_daemon_status.json')
+    
+    # PDF-Analyse: Text-Backend 'pymupdf' (schnell, Standard) oder 'pdfplumber' (Layout-Analyse, langsamer);
+    # findet PyMuPDF keinen Betrag, wird das PDF zusätzlich mit pdfplumber gelesen
+    PDF_TEXT_BACKEND = os.environ.get('PDF_TEXT_BACKEND') or 'pymupdf'
+    
     # File uploads
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'rechnungen')
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_UPLOAD_SIZE', 10485760))  # 10MB
     
+    # Listen (Einnahmen/Ausgaben): Einträge pro Seite bzw. pro "Mehr laden"
+    LISTEN_SEITENGROESSE = int(os.environ.get('LISTEN_SEITENGROESSE') or 50)
+    
+    # Export (DATEV-CSV für den ASCII-Import): Sachkonten, Standard SKR03
+    DATEV_BANKKONTO = os.environ.get('DATEV_BANKKONTO') or '1200'
+    DATEV_ERLOESKONTO = os.environ.get('DATEV_ERLOESKONTO') or '8400'
+    DATEV_AUFWANDSKONTO = os.environ.get('DATEV_AUFWANDSKONTO') or '3400'
+    
+    # Bankabgleich: Zuordnungen ab dieser Konfidenz automatisch verbuchen, darunter Prüfliste
+    ABGLEICH_SCHWELLE = float(os.environ.get('ABGLEICH_SCHWELLE') or 0.9)
+    
     # Server
     HOST = os.environ.get('HOST') or '0.0.0.0'
     PORT = int(os.environ.get('PORT') or 5000)
@@ -2,19 +2,46 @@
 """
 Cron-Job für automatische Gmail-Synchronisation
 Dieses Script sollte regelmäßig (z.B. stündlich) ausgeführt werden.
+
+Alternativ bleibt es mit --daemon dauerhaft aktiv und synchronisiert jedes
+Label in seinem Intervall (Start-Overhead nur einmal, Backoff bei 429/5xx).
+--status zeigt den letzten Stand des Daemons.
 """
 
 import sys
 import os
+import json
+import logging
+import argparse
 
 # Pfad zum Projekt hinzufügen
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import app
-from services.gmail_service import GmailService
+from services.job_service import JobService
+from services.sync_daemon import SyncDaemon
 from models import db
 
-def sync_gmail():
+def daemon_status():
+    """Letzten Stand des Daemons ausgeben"""
+    pfad = app.config['GMAIL_DAEMON_STATUS_PATH']
+    if not os.path.exists(pfad):
+        print(f"Keine Statusdatei gefunden: {pfad}")
+        return 1
+    with open(pfad) as f:
+        status = json.load(f)
+    zustand = 'beendet' if status['beendet'] else f"PID {status['pid']}"
+    print(f"Sync-Daemon ({zustand}), gestartet {status['gestartet_am']}, zuletzt aktiv {status['aktualisiert_am']}")
+    if status['letzter_job']:
+        job = status['letzter_job']
+        print(f"Letzter Job {job['id']}: {job['status']} - {job['meldung']}")
+    for label in status['labels']:
+        print(f"  {label['label']}: {label['status'] or 'noch nicht gelaufen'}, "
+              f"letzter Lauf {label['letzter_lauf'] or '-'}, nächster {label['naechster_lauf']}"
+              + (f", {label['fehlversuche']} Fehlversuche (HTTP {label['http_status']})" if label['fehlversuche'] else ''))
+    return 0
+
+def sync_gmail(daemon=False):
     """Gmail synchronisieren"""
     with app.app_context():
         try:
@@ -24,14 +51,36 @@ def sync_gmail():
                 print(f"Gmail-Credentials nicht gefunden: {credentials_path}")
                 return 0  # Nicht als Fehler behandeln
             
-            gmail_service = GmailService()
-            anzahl = gmail_service.sync_rechnungen()
-            print(f"Gmail-Synchronisation erfolgreich: {anzahl} neue Rechnungen importiert.")
+            if daemon:
+                logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+                SyncDaemon().laufen()
+                return 0
+            
+            # Über die Job-Tabelle ausführen, damit nie zwei Syncs parallel laufen
+            job_service = JobService()
+            job, neu = job_service.einreihen()
+            if not neu:
+                print(f"Gmail-Synchronisation läuft bereits (Job {job.id}), übersprungen.")
+                return 0
+            if not job_service.ausfuehren(job):
+                print(f"Job {job.id} wurde von einem anderen Worker übernommen, übersprungen.")
+                return 0
+            
+            if job.status == 'fehler':
+                print(f"Fehler bei Gmail-Synchronisation: {job.meldung}", file=sys.stderr)
+                return 1
+            # Meldung enthält ggf. die Warnung aus der Prüfung des Monats-Rollups
+            print(f"Gmail-Synchronisation erfolgreich: {job.meldung}")
             return 0
         except Exception as e:
             print(f"Fehler bei Gmail-Synchronisation: {e}", file=sys.stderr)
             return 1
 
 if __name__ == '__main__':
-    sys.exit(sync_gmail())
-
+    parser = argparse.ArgumentParser(description='Gmail-Synchronisation (einmalig oder als Daemon)')
+    parser.add_argument('--daemon', action='store_true', help='dauerhaft laufen, Labels im Intervall synchronisieren')
+    parser.add_argument('--status', action='store_true', help='letzten Stand des Daemons anzeigen')
+    args = parser.parse_args()
+    if args.status:
+        sys.exit(daemon_status())
+    sys.exit(sync_gmail(daemon=args.daemon))
\ No newline at end of file
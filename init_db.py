@@ -28,6 +28,14 @@ if __name__ == '__main__':
             print(f"⚠️  Migration-Warnung: {e}")
             # Ignoriere Fehler, falls Tabelle noch nicht existiert
         
+        # Versionierte Schema-Migrationen (Indizes etc.)
+        try:
+            from migrate_schema import migrate
+            version = migrate()
+            print(f"✓ Schema-Version: {version}")
+        except Exception as e:
+            print(f"⚠️  Schema-Migration-Warnung: {e}")
+        
         # Standard-Admin-Benutzer erstellen (falls nicht vorhanden)
         if User.query.count() == 0:
             admin = User(username='admin')
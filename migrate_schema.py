@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Versionierte Schema-Migrationen
+
+Jede Migration hat eine fortlaufende Versionsnummer. Die zuletzt angewandte
+Version steht in der Tabelle schema_version, bereits angewandte Migrationen
+werden übersprungen. Neue Datenbanken erhalten die Indizes bereits über
+db.create_all(); die Migrationen sind daher idempotent geschrieben.
+Auch Datenbestände, die aus den Buchungen abgeleitet werden (z.B. das
+Monats-Rollup), baut eine Migration auf: nach diesem Script ist die
+Datenbank ohne weitere Schritte (init_db) vollständig.
+
+Verwendung:
+    python migrate_schema.py
+"""
+
+import os
+from models import db
+from sqlalchemy import text, inspect
+
+
+def _migration_1_buchung_indizes():
+    """Indizes für die Buchungslisten, Lieferanten-Filter, Gmail-Duplikatcheck und offene Forderungen"""
+    # Der eindeutige Index auf gmail_message_id scheitert an bestehenden Duplikaten
+    duplikate = db.session.execute(text(
+        "SELECT gmail_message_id, COUNT(*) FROM buchung "
+        "WHERE gmail_message_id IS NOT NULL "
+        "GROUP BY gmail_message_id HAVING COUNT(*) > 1"
+    )).fetchall()
+    if duplikate:
+        liste = ', '.join(f"{message_id} ({anzahl}x)" for message_id, anzahl in duplikate[:10])
+        raise Exception(f"Doppelte gmail_message_id in buchung, bitte zuerst bereinigen: {liste}")
+
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_buchung_typ_jahr_datum ON buchung (typ, jahr, datum)"
+    ))
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_buchung_lieferant_jahr ON buchung (lieferant_id, jahr)"
+    ))
+    db.session.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_buchung_gmail_message_id ON buchung (gmail_message_id)"
+    ))
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_buchung_offene_einnahmen ON buchung (datum) "
+        "WHERE typ = 'Einnahme' AND ueberwiesen_am IS NULL"
+    ))
+
+
+def _migration_2_banktransaktion():
+    """Tabelle für importierte Kontoauszüge"""
+    from models import Banktransaktion
+    Banktransaktion.__table__.create(db.session.connection(), checkfirst=True)
+
+
+def _migration_3_abgleich_vorschlag():
+    """Prüfliste des Bankabgleichs"""
+    from models import AbgleichVorschlag
+    AbgleichVorschlag.__table__.create(db.session.connection(), checkfirst=True)
+
+
+def _spalte_hinzufuegen(tabelle, spalte, typ):
+    """ALTER TABLE ... ADD COLUMN, falls die Spalte noch fehlt (neue DBs: create_all)"""
+    vorhandene = {s['name'] for s in inspect(db.session.connection()).get_columns(tabelle)}
+    if spalte not in vorhandene:
+        db.session.execute(text(f"ALTER TABLE {tabelle} ADD COLUMN {spalte} {typ}"))
+
+
+def _migration_4_buchung_fingerprint():
+    """Spalten und Indizes für die Duplikaterkennung, Bestand nachberechnen"""
+    from models import rechnungs_fingerprint
+    from services.duplikat_service import datei_hash
+
+    _spalte_hinzufuegen('buchung', 'fingerprint', 'VARCHAR(64)')
+    _spalte_hinzufuegen('buchung', 'pdf_hash', 'VARCHAR(64)')
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_buchung_fingerprint ON buchung (fingerprint)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_buchung_pdf_hash ON buchung (pdf_hash)"))
+
+    zeilen = db.session.execute(text(
+        "SELECT id, typ, lieferant_id, rechnungsnummer, betrag, pdf_pfad FROM buchung"
+    )).fetchall()
+    updates = []
+    for buchung_id, typ, lieferant_id, rechnungsnummer, betrag, pdf_pfad in zeilen:
+        updates.append({
+            'id': buchung_id,
+            'fingerprint': rechnungs_fingerprint(typ, lieferant_id, rechnungsnummer, betrag),
+            'pdf_hash': datei_hash(pdf_pfad) if pdf_pfad and os.path.exists(pdf_pfad) else None
+        })
+    if updates:
+        db.session.execute(
+            text("UPDATE buchung SET fingerprint = :fingerprint, pdf_hash = :pdf_hash WHERE id = :id"),
+            updates
+        )
+
+
+def _migration_5_gmail_checkpoint():
+    """historyId je Gmail-Label für die inkrementelle Synchronisation"""
+    from models import GmailCheckpoint
+    GmailCheckpoint.__table__.create(db.session.connection(), checkfirst=True)
+
+
+def _migration_6_sync_job():
+    """Hintergrund-Jobs der Gmail-Synchronisation"""
+    from models import SyncJob
+    SyncJob.__table__.create(db.session.connection(), checkfirst=True)
+
+
+def _migration_7_lieferant_sync_intervall():
+    """Sync-Intervall je Lieferant für den Gmail-Sync-Daemon"""
+    _spalte_hinzufuegen('lieferant', 'gmail_sync_intervall', 'INTEGER')
+
+
+def _migration_8_pdf_ablage():
+    """PDFs in die inhaltsadressierte Ablage (ab/cd/<sha256>.pdf) umziehen
+
+    Die Dateien werden parallel verschoben; ein vorhandener pdf_hash erspart
+    das Lesen. Bricht die Migration ab, findet ein erneuter Lauf bereits
+    verschobene Dateien über pdf_hash wieder.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from services.pdf_ablage import PDFAblage, INHALT_NAME
+
+    ablage = PDFAblage()
+    zeilen = db.session.execute(text(
+        "SELECT id, pdf_pfad, pdf_hash FROM buchung WHERE pdf_pfad IS NOT NULL AND pdf_pfad != ''"
+    )).fetchall()
+    dateien = {}  # alter Pfad -> {'hash', 'ids'} (mehrere Buchungen können auf dieselbe Datei zeigen)
+    updates = []
+    for buchung_id, pdf_pfad, pdf_hash in zeilen:
+        if INHALT_NAME.match(os.path.basename(pdf_pfad)):
+            continue
+        if not os.path.exists(pdf_pfad):
+            # Alte Pfade mit anderem Basisverzeichnis über den Dateinamen suchen
+            pdf_pfad = ablage.pfad(os.path.basename(pdf_pfad))
+        if os.path.exists(pdf_pfad):
+            eintrag = dateien.setdefault(pdf_pfad, {'hash': pdf_hash, 'ids': []})
+            eintrag['hash'] = eintrag['hash'] or pdf_hash
+            eintrag['ids'].append(buchung_id)
+        elif pdf_hash and os.path.exists(ablage.pfad(f'{pdf_hash}.pdf')):
+            # Bei einem abgebrochenen Lauf bereits verschoben
+            updates.append({'id': buchung_id, 'pdf_pfad': ablage.pfad(f'{pdf_hash}.pdf'), 'pdf_hash': pdf_hash})
+
+    with ThreadPoolExecutor(max_workers=min(8, 2 * (os.cpu_count() or 1))) as pool:
+        umgezogen = pool.map(lambda pfad: (pfad, ablage.umziehen(pfad, dateien[pfad]['hash'])), list(dateien))
+        for alter_pfad, (neuer_pfad, sha) in umgezogen:
+            for buchung_id in dateien[alter_pfad]['ids']:
+                updates.append({'id': buchung_id, 'pdf_pfad': neuer_pfad, 'pdf_hash': sha})
+    if updates:
+        db.session.execute(
+            text("UPDATE buchung SET pdf_pfad = :pdf_pfad, pdf_hash = :pdf_hash WHERE id = :id"),
+            updates
+        )
+
+
+def _migration_9_sync_lauf():
+    """Messwerte der Gmail-Sync-Läufe"""
+    from models import SyncLauf
+    SyncLauf.__table__.create(db.session.connection(), checkfirst=True)
+
+
+def _migration_10_buchung_gmail_anhang():
+    """Mehrere PDFs je E-Mail: eindeutig ist (gmail_message_id, gmail_anhang_nr)"""
+    _spalte_hinzufuegen('buchung', 'gmail_anhang_nr', 'INTEGER')
+    # Bisher wurde nur das erste PDF einer E-Mail importiert
+    db.session.execute(text(
+        "UPDATE buchung SET gmail_anhang_nr = 0 WHERE gmail_message_id IS NOT NULL AND gmail_anhang_nr IS NULL"
+    ))
+    db.session.execute(text("DROP INDEX IF EXISTS ix_buchung_gmail_message_id"))
+    db.session.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_buchung_gmail_anhang ON buchung (gmail_message_id, gmail_anhang_nr)"
+    ))
+
+
+
+def _migration_11_buchung_monats_summe():
+    """Monats-Rollup für Dashboard und Auswertungen anlegen und aus den Buchungen aufbauen
+
+    Der Neuaufbau ersetzt einen vorhandenen Inhalt vollständig und läuft ohne
+    eigenen Commit in der Transaktion der Migration.
+    """
+    from models import BuchungMonatsSumme
+    from services.monatssummen_service import MonatssummenService
+    BuchungMonatsSumme.__table__.create(db.session.connection(), checkfirst=True)
+    MonatssummenService().rebuild(commit=False)
+
+
+def _migration_12_gmail_duplikat():
+    """Als Duplikat übersprungene Gmail-Anhänge"""
+    from models import GmailDuplikat
+    GmailDuplikat.__table__.create(db.session.connection(), checkfirst=True)
+
+# (Version, Beschreibung, Funktion) - nur anhängen, nie umnummerieren
+MIGRATIONEN = [
+    (1, 'Indizes für buchung', _migration_1_buchung_indizes),
+    (2, 'Tabelle banktransaktion', _migration_2_banktransaktion),
+    (3, 'Tabelle abgleich_vorschlag', _migration_3_abgleich_vorschlag),
+    (4, 'Duplikaterkennung für buchung', _migration_4_buchung_fingerprint),
+    (5, 'Tabelle gmail_checkpoint', _migration_5_gmail_checkpoint),
+    (6, 'Tabelle sync_job', _migration_6_sync_job),
+    (7, 'Sync-Intervall für lieferant', _migration_7_lieferant_sync_intervall),
+    (8, 'PDF-Ablage nach Inhalt', _migration_8_pdf_ablage),
+    (9, 'Tabelle sync_lauf', _migration_9_sync_lauf),
+    (10, 'Mehrere PDF-Anhänge je E-Mail', _migration_10_buchung_gmail_anhang),
+    (11, 'Monats-Rollup buchung_monats_summe', _migration_11_buchung_monats_summe),
+    (12, 'Tabelle gmail_duplikat', _migration_12_gmail_duplikat),
+]
+
+
+def get_schema_version():
+    """Aktuell angewandte Schema-Version (0 = keine Migration angewandt)"""
+    db.session.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+    version = db.session.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    db.session.commit()
+    return version or 0
+
+
+def migrate(ausgabe=print):
+    """Alle ausstehenden Migrationen anwenden (benötigt App-Kontext)
+
+    Jede Migration läuft in einer eigenen Transaktion; bei einem Fehler wird
+    abgebrochen und die Version bleibt auf dem letzten erfolgreichen Stand.
+    """
+    version = get_schema_version()
+    for ziel_version, beschreibung, funktion in MIGRATIONEN:
+        if ziel_version <= version:
+            continue
+        try:
+            ausgabe(f"Führe Migration {ziel_version} aus: {beschreibung}...")
+            funktion()
+            db.session.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {'v': ziel_version})
+            db.session.commit()
+            ausgabe(f"✓ Migration {ziel_version} angewandt")
+        except Exception:
+            db.session.rollback()
+            raise
+    return get_schema_version()
+
+
+if __name__ == '__main__':
+    import sys
+    from app import app
+
+    with app.app_context():
+        try:
+            db.create_all()
+            version = migrate()
+            print(f"\n✓ Schema-Version: {version}")
+            sys.exit(0)
+        except Exception as e:
+            print(f"❌ Fehler bei Migration: {e}")
+            import traceback
+            traceback.print_exc()
+            sys.exit(1)
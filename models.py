@@ -2,6 +2,10 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+import hashlib
+import re
+from sqlalchemy import event
 
 db = SQLAlchemy()
 
@@ -77,6 +81,7 @@ class Lieferant(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     gmail_label = db.Column(db.String(200), nullable=True)
+    gmail_sync_intervall = db.Column(db.Integer, nullable=True)  # Minuten (Sync-Daemon), leer = Standard
     typ = db.Column(db.String(20), nullable=False)  # 'Einnahme' oder 'Ausgabe'
     aktiv = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -90,6 +95,21 @@ class Lieferant(db.Model):
 
 class Buchung(db.Model):
     """Buchung-Modell"""
+    # Indizes für die Listen, den Lieferanten-Filter, den Gmail-Duplikatcheck und offene Forderungen
+    # (bestehende Datenbanken: migrate_schema.py)
+    __table_args__ = (
+        db.Index('ix_buchung_typ_jahr_datum', 'typ', 'jahr', 'datum'),
+        db.Index('ix_buchung_lieferant_jahr', 'lieferant_id', 'jahr'),
+        # Eine Buchung je PDF-Anhang einer E-Mail
+        db.Index('ix_buchung_gmail_anhang', 'gmail_message_id', 'gmail_anhang_nr', unique=True),
+        db.Index('ix_buchung_offene_einnahmen', 'datum',
+                 sqlite_where=db.text("typ = 'Einnahme' AND ueberwiesen_am IS NULL"),
+                 postgresql_where=db.text("typ = 'Einnahme' AND ueberwiesen_am IS NULL")),
+        # Duplikaterkennung (Rechnungs-Fingerprint bzw. PDF-Inhalt)
+        db.Index('ix_buchung_fingerprint', 'fingerprint'),
+        db.Index('ix_buchung_pdf_hash', 'pdf_hash'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     typ = db.Column(db.String(20), nullable=False)  # 'Einnahme' oder 'Ausgabe'
     lieferant_id = db.Column(db.Integer, db.ForeignKey('lieferant.id'), nullable=True)
@@ -101,8 +121,11 @@ class Buchung(db.Model):
     jahr = db.Column(db.Integer, nullable=False)
     quelle = db.Column(db.String(20), nullable=False, default='Manuell')  # 'Gmail' oder 'Manuell'
     gmail_message_id = db.Column(db.String(200), nullable=True)  # Zur Vermeidung von Duplikaten
+    gmail_anhang_nr = db.Column(db.Integer, nullable=True)  # Position des PDFs in der E-Mail (0 = erstes)
     von_zielkonto_abgebucht = db.Column(db.Boolean, default=False, nullable=False)
     ueberwiesen_am = db.Column(db.Date, nullable=True)  # Datum der Überweisung (nur für Einnahmen)
+    fingerprint = db.Column(db.String(64), nullable=True)  # SHA-256 aus Typ, Lieferant, Rechnungsnummer, Betrag
+    pdf_hash = db.Column(db.String(64), nullable=True)  # SHA-256 des PDF-Inhalts
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -227,4 +250,329 @@ class Kunde(db.Model):
     auftraege = db.relationship('Auftrag', backref='kunde_obj', lazy=True)
     
     def __repr__(self):
-        return f'<Kunde {self.name}>'
\ No newline at end of file
+        return f'<Kunde {self.name}>'
+
+class BuchungMonatsSumme(db.Model):
+    """Monatliche Summen der Buchungen (Rollup für Dashboard und Auswertungen)
+
+    Wird über die Mapper-Events von Buchung fortgeschrieben. Beträge werden
+    in Cent gespeichert, damit die laufende Summe exakt bleibt.
+    """
+    __tablename__ = 'buchung_monats_summe'
+    __table_args__ = (
+        db.UniqueConstraint('jahr', 'monat', 'typ', 'lieferant_id', name='uq_buchung_monats_summe'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    jahr = db.Column(db.Integer, nullable=False)
+    monat = db.Column(db.Integer, nullable=False)  # 1-12
+    typ = db.Column(db.String(20), nullable=False)  # 'Einnahme' oder 'Ausgabe'
+    lieferant_id = db.Column(db.Integer, db.ForeignKey('lieferant.id'), nullable=True)
+    summe_cent = db.Column(db.BigInteger, nullable=False, default=0)
+    anzahl = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def summe(self):
+        """Summe als Decimal in Euro"""
+        return Decimal(self.summe_cent or 0).scaleb(-2)
+
+    def __repr__(self):
+        return f'<BuchungMonatsSumme {self.jahr}-{self.monat:02d} {self.typ} {self.lieferant_id}: {self.summe}>'
+
+
+class Banktransaktion(db.Model):
+    """Umsatz aus einem importierten Kontoauszug (CSV-Export der Bank)
+
+    Duplikate werden über den Hash aus (Datum, Betrag, Verwendungszweck)
+    erkannt, damit sich überschneidende Auszüge mehrfach importiert werden können.
+    """
+    __table_args__ = (
+        db.Index('ix_banktransaktion_datum', 'buchungsdatum'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    buchungsdatum = db.Column(db.Date, nullable=False)
+    betrag = db.Column(db.Numeric(12, 2), nullable=False)  # Eingang positiv, Abgang negativ
+    verwendungszweck = db.Column(db.String(500), nullable=True)
+    gegenpartei = db.Column(db.String(200), nullable=True)  # Auftraggeber bzw. Empfänger
+    iban = db.Column(db.String(34), nullable=True)
+    hash = db.Column(db.String(64), nullable=False, unique=True)
+    buchung_id = db.Column(db.Integer, db.ForeignKey('buchung.id'), nullable=True)  # zugeordnete Buchung
+    importiert_am = db.Column(db.DateTime, default=datetime.utcnow)
+
+    buchung = db.relationship('Buchung', backref='banktransaktionen', lazy=True)
+
+    def __repr__(self):
+        return f'<Banktransaktion {self.buchungsdatum} {self.betrag}>'
+
+
+class AbgleichVorschlag(db.Model):
+    """Vorschlag des Bankabgleichs unterhalb der Konfidenzschwelle (Prüfliste)
+
+    Abgelehnte Paare bleiben gespeichert, damit sie beim nächsten Abgleich
+    nicht erneut vorgeschlagen werden.
+    """
+    __tablename__ = 'abgleich_vorschlag'
+    __table_args__ = (
+        db.UniqueConstraint('banktransaktion_id', 'buchung_id', name='uq_abgleich_vorschlag'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    banktransaktion_id = db.Column(db.Integer, db.ForeignKey('banktransaktion.id'), nullable=False)
+    buchung_id = db.Column(db.Integer, db.ForeignKey('buchung.id'), nullable=False)
+    konfidenz = db.Column(db.Float, nullable=False)
+    abgelehnt = db.Column(db.Boolean, default=False, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    banktransaktion = db.relationship('Banktransaktion', lazy='joined')
+    buchung = db.relationship('Buchung', lazy='joined')
+
+    def __repr__(self):
+        return f'<AbgleichVorschlag {self.banktransaktion_id} -> {self.buchung_id} ({self.konfidenz:.2f})>'
+
+
+class GmailCheckpoint(db.Model):
+    """Stand der Gmail-Synchronisation je Label (historyId der History-API)
+
+    Der nächste Lauf fragt nur die seitdem hinzugekommenen Nachrichten ab.
+    """
+    __tablename__ = 'gmail_checkpoint'
+
+    id = db.Column(db.Integer, primary_key=True)
+    label = db.Column(db.String(200), nullable=False, unique=True)
+    history_id = db.Column(db.String(30), nullable=False)
+    aktualisiert_am = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<GmailCheckpoint {self.label} {self.history_id}>'
+
+
+class GmailDuplikat(db.Model):
+    """Gmail-Anhang, der als Duplikat einer vorhandenen Buchung übersprungen wurde
+
+    Damit lädt der nächste Sync die E-Mail nicht erneut. Wird die Buchung,
+    deren Duplikat der Anhang war, gelöscht, gilt die E-Mail wieder als neu.
+    """
+    __tablename__ = 'gmail_duplikat'
+    __table_args__ = (
+        db.UniqueConstraint('gmail_message_id', 'gmail_anhang_nr', name='uq_gmail_duplikat'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    gmail_message_id = db.Column(db.String(100), nullable=False)
+    gmail_anhang_nr = db.Column(db.Integer, nullable=False, default=0)
+    buchung_id = db.Column(db.Integer, db.ForeignKey('buchung.id'), nullable=False)  # vorhandene Buchung
+    erstellt_am = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<GmailDuplikat {self.gmail_message_id}/{self.gmail_anhang_nr} -> {self.buchung_id}>'
+
+
+class SyncJob(db.Model):
+    """Hintergrund-Job (Gmail-Synchronisation) mit Fortschritt
+
+    Je Postfach darf nur ein Job wartend oder laufend sein; das sichert ein
+    partieller eindeutiger Index auch über mehrere Prozesse hinweg ab.
+    """
+    __tablename__ = 'sync_job'
+    __table_args__ = (
+        db.Index('ix_sync_job_aktiv', 'postfach', unique=True,
+                 sqlite_where=db.text("status IN ('wartend', 'laeuft')"),
+                 postgresql_where=db.text("status IN ('wartend', 'laeuft')")),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    postfach = db.Column(db.String(200), nullable=False)
+    status = db.Column(db.String(20), default='wartend', nullable=False)  # wartend, laeuft, fertig, fehler
+    parameter = db.Column(db.Text, nullable=True)  # JSON, z.B. {"backfill": true, "seit": "2024-01-01"}
+    geprueft = db.Column(db.Integer, default=0, nullable=False)  # E-Mails geprüft
+    analysiert = db.Column(db.Integer, default=0, nullable=False)  # PDFs analysiert
+    importiert = db.Column(db.Integer, default=0, nullable=False)  # Buchungen angelegt
+    fehler = db.Column(db.Integer, default=0, nullable=False)
+    meldung = db.Column(db.String(500), nullable=True)
+    benutzer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    erstellt_am = db.Column(db.DateTime, default=datetime.utcnow)
+    gestartet_am = db.Column(db.DateTime, nullable=True)
+    aktualisiert_am = db.Column(db.DateTime, nullable=True)  # Lebenszeichen des laufenden Jobs
+    beendet_am = db.Column(db.DateTime, nullable=True)
+
+    def als_dict(self):
+        """Status und Fortschritt für die JSON-Abfrage"""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'geprueft': self.geprueft,
+            'analysiert': self.analysiert,
+            'importiert': self.importiert,
+            'fehler': self.fehler,
+            'meldung': self.meldung,
+            'gestartet_am': self.gestartet_am.isoformat() if self.gestartet_am else None,
+            'beendet_am': self.beendet_am.isoformat() if self.beendet_am else None,
+        }
+
+    def __repr__(self):
+        return f'<SyncJob {self.id} {self.postfach} {self.status}>'
+
+
+class SyncLauf(db.Model):
+    """Messwerte eines Gmail-Sync-Laufs: Zeiten und Zähler je Pipeline-Stufe, Quota"""
+    __tablename__ = 'sync_lauf'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('sync_job.id'), nullable=True)
+    status = db.Column(db.String(20), nullable=False)  # fertig, abgebrochen, fehler
+    gestartet_am = db.Column(db.DateTime, nullable=False, index=True)
+    beendet_am = db.Column(db.DateTime, nullable=True)
+    dauer_s = db.Column(db.Float, nullable=True)
+    geprueft = db.Column(db.Integer, default=0, nullable=False)
+    importiert = db.Column(db.Integer, default=0, nullable=False)
+    fehler = db.Column(db.Integer, default=0, nullable=False)
+    stufen = db.Column(db.Text, nullable=True)  # JSON: {stufe: {aufrufe, fehler, bytes, summe_s, p50_ms, ...}}
+    quota = db.Column(db.Text, nullable=True)  # JSON: Kennzahlen des QuotaLimiters
+    meldung = db.Column(db.String(500), nullable=True)
+
+    def stufen_dict(self):
+        import json
+        return json.loads(self.stufen) if self.stufen else {}
+
+    def quota_dict(self):
+        import json
+        return json.loads(self.quota) if self.quota else {}
+
+    def __repr__(self):
+        return f'<SyncLauf {self.id} {self.status}>'
+
+
+# ==================== Duplikaterkennung ====================
+
+def rechnungsnummer_normalisieren(rechnungsnummer):
+    """Nur Buchstaben/Ziffern in Großschrift (RE-2025/001 == re 2025 001)"""
+    return re.sub(r'[^0-9A-Z]', '', (rechnungsnummer or '').upper())
+
+
+def rechnungs_fingerprint(typ, lieferant_id, rechnungsnummer, betrag):
+    """Fingerprint einer Rechnung, None ohne verwertbare Rechnungsnummer"""
+    nummer = rechnungsnummer_normalisieren(rechnungsnummer)
+    if not nummer:
+        return None
+    schluessel = f"{typ}|{lieferant_id or ''}|{nummer}|{betrag_in_cent(betrag)}"
+    return hashlib.sha256(schluessel.encode('utf-8')).hexdigest()
+
+
+@event.listens_for(Buchung, 'before_insert')
+@event.listens_for(Buchung, 'before_update')
+def _fingerprint_setzen(mapper, connection, target):
+    target.fingerprint = rechnungs_fingerprint(target.typ, target.lieferant_id, target.rechnungsnummer, target.betrag)
+
+
+# ==================== Rollup-Pflege über Mapper-Events ====================
+# Hinweis: Bulk-Operationen (query.update()/query.delete()) lösen keine Events aus.
+# Danach muss das Rollup mit scripts/monatssummen.py --rebuild neu aufgebaut werden.
+
+def betrag_in_cent(betrag):
+    """Betrag (Decimal/float/str) in ganze Cent umrechnen"""
+    if betrag is None:
+        return 0
+    return int((Decimal(str(betrag)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def _rollup_schluessel(jahr, datum, typ, lieferant_id):
+    return (jahr, datum.month, typ, lieferant_id)
+
+
+def _monatssumme_anpassen(connection, schluessel, delta_cent, delta_anzahl):
+    """Rollup-Zeile fortschreiben (UPDATE, bei fehlender Zeile INSERT, leere Zeile löschen)"""
+    jahr, monat, typ, lieferant_id = schluessel
+    tabelle = BuchungMonatsSumme.__table__
+    ergebnis = connection.execute(
+        tabelle.update().where(
+            tabelle.c.jahr == jahr,
+            tabelle.c.monat == monat,
+            tabelle.c.typ == typ,
+            tabelle.c.lieferant_id == lieferant_id  # None wird zu IS NULL
+        ).values(
+            summe_cent=tabelle.c.summe_cent + delta_cent,
+            anzahl=tabelle.c.anzahl + delta_anzahl
+        )
+    )
+    if ergebnis.rowcount == 0:
+        connection.execute(
+            tabelle.insert().values(
+                jahr=jahr,
+                monat=monat,
+                typ=typ,
+                lieferant_id=lieferant_id,
+                summe_cent=delta_cent,
+                anzahl=delta_anzahl
+            )
+        )
+    elif delta_anzahl < 0:
+        # Letzte Buchung der Gruppe verschoben/gelöscht: leere Zeile entfernen
+        connection.execute(
+            tabelle.delete().where(
+                tabelle.c.jahr == jahr,
+                tabelle.c.monat == monat,
+                tabelle.c.typ == typ,
+                tabelle.c.lieferant_id == lieferant_id,
+                tabelle.c.anzahl == 0,
+                tabelle.c.summe_cent == 0
+            )
+        )
+
+
+def _alter_wert(target, attribut):
+    """Wert eines Attributs vor der aktuellen Änderung"""
+    historie = db.inspect(target).attrs[attribut].history
+    if historie.deleted:
+        return historie.deleted[0]
+    return getattr(target, attribut)
+
+
+_ROLLUP_ATTRIBUTE = ('jahr', 'datum', 'typ', 'lieferant_id', 'betrag')
+
+
+def _alten_wert_mitnehmen(target, value, oldvalue, initiator):
+    """Nur für active_history: alter Wert wird auch bei abgelaufenen Objekten geladen"""
+    pass
+
+
+for _attribut in _ROLLUP_ATTRIBUTE:
+    event.listen(getattr(Buchung, _attribut), 'set', _alten_wert_mitnehmen, active_history=True)
+
+
+@event.listens_for(Buchung, 'after_insert')
+def _buchung_eingefuegt(mapper, connection, target):
+    schluessel = _rollup_schluessel(target.jahr, target.datum, target.typ, target.lieferant_id)
+    _monatssumme_anpassen(connection, schluessel, betrag_in_cent(target.betrag), 1)
+
+
+@event.listens_for(Buchung, 'after_update')
+def _buchung_geaendert(mapper, connection, target):
+    alt_schluessel = _rollup_schluessel(
+        _alter_wert(target, 'jahr'),
+        _alter_wert(target, 'datum'),
+        _alter_wert(target, 'typ'),
+        _alter_wert(target, 'lieferant_id')
+    )
+    neu_schluessel = _rollup_schluessel(target.jahr, target.datum, target.typ, target.lieferant_id)
+    alt_cent = betrag_in_cent(_alter_wert(target, 'betrag'))
+    neu_cent = betrag_in_cent(target.betrag)
+
+    if alt_schluessel == neu_schluessel:
+        if alt_cent != neu_cent:
+            _monatssumme_anpassen(connection, neu_schluessel, neu_cent - alt_cent, 0)
+    else:
+        # Buchung ist in einen anderen Monat/Typ/Lieferanten gewandert
+        _monatssumme_anpassen(connection, alt_schluessel, -alt_cent, -1)
+        _monatssumme_anpassen(connection, neu_schluessel, neu_cent, 1)
+
+
+@event.listens_for(Buchung, 'after_delete')
+def _buchung_geloescht(mapper, connection, target):
+    schluessel = _rollup_schluessel(
+        _alter_wert(target, 'jahr'),
+        _alter_wert(target, 'datum'),
+        _alter_wert(target, 'typ'),
+        _alter_wert(target, 'lieferant_id')
+    )
+    _monatssumme_anpassen(connection, schluessel, -betrag_in_cent(_alter_wert(target, 'betrag')), -1)
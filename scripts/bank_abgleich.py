@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Bankumsätze mit offenen Buchungen abgleichen
+
+Sichere Zuordnungen (ab ABGLEICH_SCHWELLE) werden direkt verbucht, die
+übrigen Kandidaten landen in der Prüfliste unter Buchhaltung → Bankumsätze.
+
+Verwendung:
+    python scripts/bank_abgleich.py
+    python scripts/bank_abgleich.py --schwelle 0.95
+"""
+
+import sys
+import os
+import time
+import argparse
+
+# Pfad zum Projekt hinzufügen
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from services.abgleich_service import AbgleichService
+
+def main():
+    """Abgleich ausführen"""
+    parser = argparse.ArgumentParser(description='Bankumsätze mit offenen Buchungen abgleichen')
+    parser.add_argument('--schwelle', type=float, help='Konfidenz für automatische Zuordnung (Standard: ABGLEICH_SCHWELLE)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        schwelle = args.schwelle if args.schwelle is not None else app.config['ABGLEICH_SCHWELLE']
+        start = time.perf_counter()
+        try:
+            ergebnis = AbgleichService(schwelle).abgleichen()
+        except Exception as e:
+            print(f"❌ Fehler beim Abgleich: {e}")
+            return 1
+        dauer = time.perf_counter() - start
+
+    print(f"✅ {ergebnis['zugeordnet']} von {ergebnis['umsaetze']} Umsätzen zugeordnet, "
+          f"{ergebnis['vorschlaege']} Vorschläge zur Prüfung ({dauer:.1f}s)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Kontoauszug (CSV bzw. CAMT-CSV der Bank) in die Bankumsätze importieren
+
+Bereits importierte Umsätze (gleiches Datum, Betrag und Verwendungszweck)
+werden übersprungen, die Datei kann also gefahrlos erneut importiert werden.
+
+Verwendung:
+    python scripts/bank_import.py kontoauszug_2025.csv
+"""
+
+import sys
+import os
+import time
+import argparse
+
+# Pfad zum Projekt hinzufügen
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from services.bankimport_service import BankimportService
+
+def main():
+    """Kontoauszug importieren"""
+    parser = argparse.ArgumentParser(description='Kontoauszug (CSV) importieren')
+    parser.add_argument('datei', help='CSV-Export der Bank')
+    args = parser.parse_args()
+
+    with open(args.datei, 'rb') as f:
+        inhalt = f.read()
+
+    with app.app_context():
+        start = time.perf_counter()
+        try:
+            ergebnis = BankimportService().importieren(inhalt)
+        except Exception as e:
+            print(f"❌ Fehler beim Import: {e}")
+            return 1
+        dauer = time.perf_counter() - start
+
+    print(f"✅ {ergebnis['importiert']} Umsätze importiert, {ergebnis['duplikate']} bereits vorhanden "
+          f"({ergebnis['gelesen']} gelesen in {dauer:.1f}s)")
+    if ergebnis['fehler']:
+        print(f"⚠️  {len(ergebnis['fehler'])} Zeilen übersprungen:")
+        for zeilennummer, meldung in ergebnis['fehler'][:20]:
+            print(f"  Zeile {zeilennummer}: {meldung}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Listenansichten über ORM-Objekte vs. Spalten-Projektion
+
+Legt eine temporäre SQLite-Datenbank mit Testdaten an und misst für die
+Einnahmen- und Ausgabenliste Laufzeit und Speicher (tracemalloc) der
+bisherigen ORM-Abfrage (vollständige Buchung-Objekte in der Identity Map)
+gegen die schreibgeschützten BuchungZeile-Tupel des BuchungenService.
+
+Verwendung:
+    python scripts/benchmark_listen.py
+    python scripts/benchmark_listen.py --anzahl 50000 --wiederholungen 5
+"""
+
+import sys
+import os
+import argparse
+import random
+import tempfile
+import timeit
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+# Pfad zum Projekt hinzufügen
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Eigene Datenbank, bevor die App die Konfiguration liest
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'benchmark_listen.db')
+
+from app import app
+from models import db, Buchung, Lieferant
+from services.buchungen_service import BuchungenService
+from services.listen_service import BUCHUNG_SPALTEN, buchung_zeilen
+
+JAHR = 2025
+
+
+def testdaten_anlegen(anzahl):
+    """Lieferanten und zufällige Buchungen eines Jahres anlegen"""
+    lieferanten = [Lieferant(name=f'Lieferant {i}', typ='Ausgabe', aktiv=True) for i in range(10)]
+    db.session.add_all(lieferanten)
+    db.session.commit()
+
+    zufall = random.Random(42)
+    zeilen = []
+    for i in range(anzahl):
+        datum = date(JAHR, 1, 1) + timedelta(days=zufall.randrange(365))
+        typ = zufall.choice(('Einnahme', 'Ausgabe'))
+        zeilen.append({
+            'typ': typ,
+            'lieferant_id': zufall.choice(lieferanten).id if typ == 'Ausgabe' else None,
+            'betrag': Decimal(zufall.randrange(100, 500000)) / 100,
+            'datum': datum,
+            'jahr': JAHR,
+            'rechnungsnummer': f'RE-{i:06d}',
+            'titel': f'Rechnung {i}',
+            'pdf_pfad': f'uploads/rechnung_{i:06d}.pdf',
+            'quelle': 'Manuell',
+        })
+    # Core-Insert: umgeht die Rollup-Events, das Rollup wird danach neu aufgebaut
+    db.session.execute(db.insert(Buchung), zeilen)
+    db.session.commit()
+
+    from services.monatssummen_service import MonatssummenService
+    MonatssummenService().rebuild()
+
+
+def _orm_liste(typ):
+    """Bisheriger Weg: ganze Buchung-Objekte laden"""
+    buchungen = Buchung.query.filter_by(typ=typ, jahr=JAHR).order_by(
+        Buchung.datum.desc(), Buchung.id.desc()
+    ).all()
+    db.session.expunge_all()
+    return buchungen
+
+
+def _projektion_liste(typ):
+    """Neuer Weg: nur die angezeigten Spalten als Tupel"""
+    return buchung_zeilen(db.select(*BUCHUNG_SPALTEN).where(
+        Buchung.typ == typ, Buchung.jahr == JAHR
+    ).order_by(Buchung.datum.desc(), Buchung.id.desc()))
+
+
+def _orm_seite(seitengroesse):
+    buchungen = Buchung.query.filter_by(typ='Einnahme', jahr=JAHR).order_by(
+        Buchung.datum.desc(), Buchung.id.desc()
+    ).limit(seitengroesse + 1).all()
+    db.session.expunge_all()
+    return buchungen
+
+
+def _projektion_seite(seitengroesse):
+    return BuchungenService(seitengroesse).get_seite('Einnahme', JAHR)
+
+
+def messen(name, funktion, wiederholungen):
+    """Beste Laufzeit (ms) und Spitzenspeicher (KiB) einer Variante"""
+    laufzeit = min(timeit.repeat(funktion, number=1, repeat=wiederholungen)) * 1000
+
+    tracemalloc.start()
+    ergebnis = funktion()
+    _, spitze = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del ergebnis
+
+    print(f"  {name:<28} {laufzeit:9.1f} ms {spitze / 1024:10.0f} KiB")
+    return laufzeit, spitze
+
+
+def main():
+    """Testdaten anlegen und beide Varianten vergleichen"""
+    parser = argparse.ArgumentParser(description='Listenabfragen ORM vs. Projektion vergleichen')
+    parser.add_argument('--anzahl', type=int, default=20000, help='Anzahl Buchungen (Standard: 20000)')
+    parser.add_argument('--wiederholungen', type=int, default=3, help='Messläufe je Variante (Standard: 3)')
+    parser.add_argument('--seitengroesse', type=int, default=50, help='Seitengröße (Standard: 50)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        print(f"📦 Lege {args.anzahl} Buchungen an...")
+        testdaten_anlegen(args.anzahl)
+
+        vergleiche = [
+            ('Einnahmen (ganzes Jahr)', lambda: _orm_liste('Einnahme'), lambda: _projektion_liste('Einnahme')),
+            ('Ausgaben (ganzes Jahr)', lambda: _orm_liste('Ausgabe'), lambda: _projektion_liste('Ausgabe')),
+            (f'Einnahmen (Seite à {args.seitengroesse})',
+             lambda: _orm_seite(args.seitengroesse), lambda: _projektion_seite(args.seitengroesse)),
+            ('Ausgaben je Lieferant', None,
+             lambda: BuchungenService(args.seitengroesse).get_ausgaben_nach_lieferant(JAHR)),
+        ]
+
+        for titel, orm, projektion in vergleiche:
+            print(f"\n📊 {titel}")
+            if orm is None:
+                messen('Projektion', projektion, args.wiederholungen)
+                continue
+            orm_zeit, orm_speicher = messen('ORM', orm, args.wiederholungen)
+            proj_zeit, proj_speicher = messen('Projektion', projektion, args.wiederholungen)
+            print(f"  → {orm_zeit / proj_zeit:.1f}x schneller, "
+                  f"{orm_speicher / max(proj_speicher, 1):.1f}x weniger Speicher")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Text-Backends des PDFService (PyMuPDF vs. pdfplumber)
+
+Erzeugt einen Korpus von Rechnungs-PDFs (Rechnungstexte wie in
+benchmark_pdf_muster.py, lange Rechnungen über mehrere Seiten, danach
+AGB-Seiten) sowie zweiseitige Rechnungen mit einer Seiten-, Netto- oder
+Teilsumme auf Seite 1 und dem Endbetrag auf Seite 2, und analysiert jedes
+PDF mit
+  - der bisherigen Analyse (pdfplumber, alle Seiten),
+  - PDFService('pdfplumber') und
+  - PDFService('pymupdf'), jeweils mit Abbruch nach der Summenzeile.
+Ausgegeben werden die Laufzeit je Dokument und die Übereinstimmung der
+Ergebnisse (Betrag, Datum, Rechnungsnummer) beider Backends. Die bisherige
+Analyse übernimmt als größten Betrag auch Zahlen aus den AGB-Seiten, daher
+weicht sie bei PDFs mit AGB-Seiten ab. Bei den zweiseitigen Rechnungen
+muss jedes Backend den Endbetrag erkennen, sonst endet der Benchmark mit
+Fehler.
+
+Verwendung:
+    python scripts/benchmark_pdf_backends.py
+    python scripts/benchmark_pdf_backends.py --anzahl 100 --agb-seiten 4 --seitensummen 20
+    python scripts/benchmark_pdf_backends.py --pdf-verzeichnis data/rechnungen
+"""
+
+import sys
+import os
+import argparse
+import logging
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Pfad zum Projekt hinzufügen
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+import pdfplumber
+from services.pdf_service import PDFService
+from services.gmail_fake import rechnung_pdf
+from benchmark_pdf_muster import rechnungstext
+
+# Zeilen je Seite in rechnung_pdf() (14 pt Zeilenabstand ab y=780)
+ZEILEN_JE_SEITE = 50
+
+AGB_ABSATZ = [
+    'Allgemeine Geschäftsbedingungen',
+    '§ 1 Geltungsbereich: Diese Bedingungen gelten für alle Lieferungen und Leistungen.',
+    '§ 2 Zahlung: Rechnungen sind innerhalb von 14 Tagen ohne Abzug zahlbar.',
+    '§ 3 Haftung: Die Haftung ist je Schadensfall auf 25.000,00 EUR begrenzt.',
+    '§ 4 Mahngebühren: Je Mahnung werden 5,00 € berechnet.',
+    '§ 5 Gerichtsstand ist Musterstadt, Stand 01.01.2024.',
+]
+
+# Summen auf Seite 1 einer mehrseitigen Rechnung, die nicht der Endbetrag sind
+TEILSUMMEN = ['Seitensumme:', 'Nettosumme', 'Teilsumme', 'Summe Positionen', 'Zwischensumme:', 'Übertrag:']
+
+
+def _deutsch(wert):
+    """1785.0 -> '1.785,00'"""
+    return f'{wert:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def seitensummen_rechnung(zufall):
+    """Zweiseitige Rechnung, Seite 1 endet mit einer Teilsumme: (Seiten, erwarteter Endbetrag)"""
+    rechnungsdatum = date(2024, 1, 1) + timedelta(days=zufall.randrange(700))
+    positionen = [zufall.randrange(1000, 40000) / 100 for _ in range(zufall.randrange(10, 40))]
+    teil = zufall.randrange(2, len(positionen))
+    seite1 = [
+        'Musterfirma GmbH', 'Rechnung',
+        f'Rechnungsnummer: RE-{zufall.randrange(10 ** 5):05d}',
+        f'Rechnungsdatum: {rechnungsdatum.strftime("%d.%m.%Y")}',
+        'Pos. Bezeichnung Betrag',
+    ] + [f'{nr} Artikel {nr} {_deutsch(wert)} €' for nr, wert in enumerate(positionen[:teil], start=1)]
+    seite1.append(f'{zufall.choice(TEILSUMMEN)} {_deutsch(sum(positionen[:teil]))} EUR')
+    netto = sum(positionen)
+    brutto = round(netto * 1.19, 2)
+    seite2 = [f'Übertrag: {_deutsch(sum(positionen[:teil]))} EUR'] + [
+        f'{nr} Artikel {nr} {_deutsch(wert)} €' for nr, wert in enumerate(positionen[teil:], start=teil + 1)
+    ] + [
+        f'Summe netto {_deutsch(netto)} EUR',
+        f'zzgl. 19% MwSt {_deutsch(brutto - netto)} EUR',
+        f'Gesamtbetrag: {_deutsch(brutto)} EUR',
+    ]
+    return [seite1, seite2], brutto
+
+
+def rechnung_speichern(pfad, text, agb_seiten):
+    """PDF aus Rechnungstext (auf Seiten verteilt) und AGB-Seiten schreiben"""
+    zeilen = text.split('\n')
+    seiten_speichern(pfad, [zeilen[i:i + ZEILEN_JE_SEITE] for i in range(0, len(zeilen), ZEILEN_JE_SEITE)],
+                     agb_seiten)
+
+
+def seiten_speichern(pfad, seiten, agb_seiten):
+    """PDF aus Seiten (Zeilenlisten) und AGB-Seiten schreiben"""
+    seiten = seiten + [AGB_ABSATZ * 6] * agb_seiten
+    with fitz.open() as pdf:
+        for seite in seiten:
+            with fitz.open(stream=rechnung_pdf('\n'.join(seite)), filetype='pdf') as einzeln:
+                pdf.insert_pdf(einzeln)
+        pdf.save(pfad)
+
+
+def korpus_erzeugen(verzeichnis, anzahl, seitensummen, agb_seiten, zufall):
+    """
+    Rechnungs-PDFs mit 0 bis agb_seiten AGB-Seiten anlegen
+
+    Returns:
+        (Pfade, {Pfad: erwarteter Endbetrag} der zweiseitigen Rechnungen)
+    """
+    pfade, endbetraege = [], {}
+    for nummer in range(anzahl):
+        pfad = os.path.join(verzeichnis, f'rechnung_{nummer:05d}.pdf')
+        rechnung_speichern(pfad, rechnungstext(zufall), zufall.randint(0, agb_seiten))
+        pfade.append(pfad)
+    for nummer in range(seitensummen):
+        pfad = os.path.join(verzeichnis, f'seitensumme_{nummer:05d}.pdf')
+        seiten, endbetraege[pfad] = seitensummen_rechnung(zufall)
+        seiten_speichern(pfad, seiten, zufall.randint(0, agb_seiten))
+        pfade.append(pfad)
+    return pfade, endbetraege
+
+
+def pdf_dateien(verzeichnis):
+    """Alle PDFs eines Verzeichnisses (rekursiv)"""
+    pfade = []
+    for wurzel, _, dateien in os.walk(verzeichnis):
+        pfade += [os.path.join(wurzel, datei) for datei in sorted(dateien) if datei.lower().endswith('.pdf')]
+    return pfade
+
+
+def bisherige_analyse(service, pfad):
+    """Analyse vor den Text-Backends: pdfplumber, Text aller Seiten"""
+    try:
+        with pdfplumber.open(pfad) as pdf:
+            text = ''
+            for page in pdf.pages:
+                text += page.extract_text() or ''
+    except Exception:
+        return None
+    if len(text.strip()) < 10:
+        return None
+    betrag = service._extract_amount(text)
+    if not betrag:
+        return None
+    return {'betrag': betrag, 'datum': service._extract_date(text),
+            'rechnungsnummer': service._extract_invoice_number(text)}
+
+
+def kern(daten):
+    """Vergleichbare Felder eines Ergebnisses (der Titel hängt am Dateinamen)"""
+    if not daten:
+        return None
+    return daten['betrag'], daten['datum'], daten['rechnungsnummer']
+
+
+def messen(name, analyse, pfade, wiederholungen):
+    """Beste Laufzeit je Dokument (ms) und Ergebnisse des letzten Durchlaufs"""
+    beste = None
+    for _ in range(wiederholungen):
+        start = time.perf_counter()
+        ergebnisse = [kern(analyse(pfad)) for pfad in pfade]
+        dauer = time.perf_counter() - start
+        beste = dauer if beste is None else min(beste, dauer)
+    je_dokument = beste / len(pfade) * 1000
+    print(f"  {name:<22} {je_dokument:8.2f} ms/Dokument")
+    return je_dokument, ergebnisse
+
+
+def main():
+    """Korpus erzeugen bzw. einlesen, beide Backends messen und Ergebnisse vergleichen"""
+    parser = argparse.ArgumentParser(description='Text-Backends der PDF-Analyse vergleichen (PyMuPDF vs. pdfplumber)')
+    parser.add_argument('--anzahl', type=int, default=50, help='Anzahl erzeugter Rechnungs-PDFs (Standard: 50)')
+    parser.add_argument('--seitensummen', type=int, default=10,
+                        help='Zweiseitige Rechnungen mit Teilsumme auf Seite 1 (Standard: 10)')
+    parser.add_argument('--agb-seiten', type=int, default=3, help='Höchstens so viele AGB-Seiten je PDF (Standard: 3)')
+    parser.add_argument('--pdf-verzeichnis', help='Zusätzlich die PDFs dieses Verzeichnisses verwenden')
+    parser.add_argument('--wiederholungen', type=int, default=2, help='Messläufe je Variante (Standard: 2)')
+    args = parser.parse_args()
+
+    # Meldungen der Analyse (Betrag nicht gefunden, Rückfall auf pdfplumber) nicht ausgeben
+    logging.getLogger('services.pdf_service').setLevel(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as verzeichnis:
+        pfade, endbetraege = korpus_erzeugen(verzeichnis, args.anzahl, args.seitensummen, args.agb_seiten,
+                                             random.Random(42))
+        if args.pdf_verzeichnis:
+            vorhandene = pdf_dateien(args.pdf_verzeichnis)
+            print(f"📄 {len(vorhandene)} PDFs aus {args.pdf_verzeichnis}")
+            pfade += vorhandene
+        if not pfade:
+            print("❌ Keine PDFs zum Messen")
+            return 1
+
+        seiten = 0
+        for pfad in pfade:
+            try:
+                with fitz.open(pfad) as pdf:
+                    seiten += pdf.page_count
+            except Exception:
+                pass
+        print(f"📊 Laufzeit ({len(pfade)} PDFs, {seiten} Seiten)")
+
+        plumber, pymupdf = PDFService('pdfplumber'), PDFService('pymupdf')
+        bisher, erwartet = messen('Bisher (pdfplumber)', lambda pfad: bisherige_analyse(plumber, pfad),
+                                  pfade, args.wiederholungen)
+        ergebnisse = {}
+        for name, service in (('pdfplumber', plumber), ('pymupdf', pymupdf)):
+            dauer, ergebnisse[name] = messen(f'PDFService({name})', service.extract_invoice_data,
+                                             pfade, args.wiederholungen)
+            print(f"  {'':<22} → {bisher / dauer:.1f}x schneller als bisher")
+
+    print("\n🔍 Übereinstimmung (Betrag, Datum, Rechnungsnummer)")
+    gleich = sum(1 for a, b in zip(ergebnisse['pdfplumber'], ergebnisse['pymupdf']) if a == b)
+    print(f"  pymupdf = pdfplumber:  {gleich}/{len(pfade)}")
+    abweichend = [(pfad, a, b) for pfad, a, b in zip(pfade, ergebnisse['pdfplumber'], ergebnisse['pymupdf']) if a != b]
+    for pfad, a, b in abweichend[:5]:
+        print(f"    {os.path.basename(pfad)}: pdfplumber {a}, pymupdf {b}")
+    # Abweichungen zur bisherigen Analyse entstehen vor allem durch Beträge auf AGB-Seiten
+    gleich = sum(1 for a, b in zip(erwartet, ergebnisse['pymupdf']) if a == b)
+    print(f"  pymupdf = bisher:      {gleich}/{len(pfade)} (Rest: u.a. Beträge nach der Summenzeile)")
+
+    if endbetraege:
+        print(f"\n🔍 Endbetrag auf Seite 2 ({len(endbetraege)} Rechnungen mit Teilsumme auf Seite 1)")
+        falsch = 0
+        for name, liste in ergebnisse.items():
+            for pfad, ergebnis in zip(pfade, liste):
+                if pfad in endbetraege and (not ergebnis or ergebnis[0] != endbetraege[pfad]):
+                    falsch += 1
+                    print(f"  ❌ {name} {os.path.basename(pfad)}: {ergebnis}, erwartet {endbetraege[pfad]}")
+        if falsch:
+            return 1
+        print("  ✅ Beide Backends erkennen den Endbetrag")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
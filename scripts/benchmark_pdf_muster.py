@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Rechnungsdaten-Erkennung des PDFService (Muster je Aufruf vs. vorkompiliert)
+
+Vergleicht die bisherige Erkennung von Betrag, Datum und Rechnungsnummer
+(jedes Muster einzeln per re.findall über den ganzen Text) mit der
+vorkompilierten Erkennung des PDFService (ein Durchlauf über die
+Zahlenfolgen für den Betrag, Datum/Nummer bis zum ersten Treffer) auf einem
+Korpus typischer Rechnungstexte. Bricht mit Fehler ab, wenn sich ein
+Ergebnis unterscheidet.
+
+Verwendung:
+    python scripts/benchmark_pdf_muster.py
+    python scripts/benchmark_pdf_muster.py --anzahl 2000 --zufallstexte 20000
+    python scripts/benchmark_pdf_muster.py --pdf-verzeichnis data/rechnungen
+"""
+
+import sys
+import os
+import argparse
+import random
+import re
+import timeit
+from datetime import datetime, date, timedelta
+from decimal import InvalidOperation
+
+# Pfad zum Projekt hinzufügen
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.pdf_service import PDFService
+
+
+class BisherigeErkennung:
+    """Erkennung vor der Vorkompilierung (Referenz für den Ergebnisvergleich)"""
+
+    def _extract_amount(self, text):
+        patterns = [
+            r'##BETRAGBRUTTO=([\d.,]+)##',
+            r'##BETRAGNETTO=([\d.,]+)##',
+            r'(?:Summe|Gesamt|Total|Betrag|Endbetrag|Zu zahlen|Brutto|Netto|Totaal|Totaalbedrag)[\s:]*([\d.,]+)\s*€',
+            r'([\d.,]+)\s*€\s*(?:inkl|MwSt|inkl\.|MwSt\.|BTW)',
+            r'([\d.,]+)\s*EUR',
+            r'([\d.,]+)\s*€',
+            r'€\s*([\d.,]+)',
+            r'(?:Amount|Total|Sum|Price|Totaal)[\s:]*([\d.,]+)',
+            r'([\d.,]+)\s*(?:EUR|€|Euro)',
+            r'(?:Gesamt|Total|Summe|Totaal|Endbetrag|Zu zahlen)[\s:]*([\d]{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})?)',
+            r'([\d]{1,3}(?:[.,]\d{3})*[.,]\d{2})\s*(?:€|EUR|Euro|BTW|inkl\.|MwSt)',
+        ]
+        amounts = []
+        for pattern in patterns:
+            for match in re.findall(pattern, text, re.IGNORECASE | re.MULTILINE):
+                try:
+                    if ',' in match and '.' in match:
+                        amount_str = match.replace('.', '').replace(',', '.')
+                    elif ',' in match:
+                        amount_str = match.replace(',', '.')
+                    else:
+                        amount_str = match
+                    amount = float(amount_str)
+                    if 0 < amount < 1000000:
+                        amounts.append(amount)
+                except (ValueError, InvalidOperation):
+                    continue
+        if amounts:
+            return max(amounts)
+
+        fallback_patterns = [
+            r'([\d]{1,3}(?:[.,]\d{3})*[.,]\d{2})\s*$',
+            r'([\d]{1,3}(?:[.,]\d{3})*[.,]\d{2})\s*\n',
+        ]
+        for pattern in fallback_patterns:
+            for match in re.findall(pattern, text, re.MULTILINE):
+                try:
+                    if ',' in match and '.' in match:
+                        amount_str = match.replace('.', '').replace(',', '.')
+                    elif ',' in match:
+                        amount_str = match.replace(',', '.')
+                    else:
+                        amount_str = match
+                    amount = float(amount_str)
+                    if 1 <= amount < 1000000:
+                        amounts.append(amount)
+                except (ValueError, InvalidOperation):
+                    continue
+        if amounts:
+            return max(amounts)
+        return None
+
+    def _extract_date(self, text):
+        patterns = [
+            r'(?:Rechnungsdatum|Datum|Date)[\s:]*(\d{1,2})[./-](\d{1,2})[./-](\d{2,4})',
+            r'(\d{1,2})[./-](\d{1,2})[./-](\d{2,4})',
+            r'(\d{4})[./-](\d{1,2})[./-](\d{1,2})',
+        ]
+        for pattern in patterns:
+            for match in re.findall(pattern, text):
+                try:
+                    if len(match) == 3:
+                        if len(match[2]) == 4:
+                            if int(match[0]) > 31:
+                                year, month, day = int(match[0]), int(match[1]), int(match[2])
+                            else:
+                                day, month, year = int(match[0]), int(match[1]), int(match[2])
+                        else:
+                            day, month, year = int(match[0]), int(match[1]), int(match[2])
+                            year = 2000 + year if year < 100 else year
+                        if 1 <= month <= 12 and 1 <= day <= 31:
+                            return datetime(year, month, day).date()
+                except (ValueError, IndexError):
+                    continue
+        return None
+
+    def _extract_invoice_number(self, text):
+        patterns = [
+            r'Belegnummer\s+Datum\s+Seite\s*\n\s*(\d+)',
+            r'Belegnummer\s+(\d+)',
+            r'Rechnungsnummer\s+Rechnungsdatum\s+Zahlungsziel\s*\n\s*(\d+)',
+            r'Rechnungsnummer\s*[:]?\s+([A-Z0-9][A-Z0-9\-/]*)',
+            r'Rechnungsnummer\s*:\s*([A-Z0-9][A-Z0-9\-/]*)',
+            r'Rechnungsnummer\s+([A-Z0-9][A-Z0-9\-/]+)',
+            r'INVOICE[-/](\d+)',
+            r'OP[/]?([A-Z0-9\-/]+)',
+            r'(?:Invoice|Nr\.?|No\.?)[\s:]*([A-Z0-9][A-Z0-9\-/]*)',
+            r'#\s*([A-Z0-9][A-Z0-9\-/]*)',
+            r'INV[-/]?([A-Z0-9][A-Z0-9\-/]*)',
+        ]
+        for pattern in patterns:
+            matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
+            if matches:
+                result = matches[0].strip()
+                invalid = ['belegnummer', 'rechnung', 'rechnungsnummer', 'rechnungsdatum', 'zahlungsziel', 'datum',
+                           'invoice', 'nr', 'no', 'template', 'debitoren', 'xml', 'nummer', 'seite']
+                if result.lower() not in invalid and len(result) > 2:
+                    if not result.lower().startswith('rechnungs'):
+                        if any(char.isdigit() for char in result):
+                            return result
+                        if '/' in result and any(char.isdigit() for char in result):
+                            return result
+        return None
+
+
+def _betrag(zufall, maximum=5000):
+    """Betrag in einem der üblichen Formate (1.234,56 / 1234,56 / 1,234.56 / 1234.56)"""
+    wert = zufall.randrange(100, maximum * 100) / 100
+    deutsch = f'{wert:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+    return zufall.choice([deutsch, deutsch.replace('.', ''), f'{wert:,.2f}', f'{wert:.2f}'])
+
+
+def rechnungstext(zufall):
+    """Text einer Rechnung wie aus pdfplumber: Kopf, Adressen, Positionen, Summenblock, Fußzeile"""
+    rechnungsdatum = date(2024, 1, 1) + timedelta(days=zufall.randrange(700))
+    datum = zufall.choice([
+        rechnungsdatum.strftime('%d.%m.%Y'), rechnungsdatum.strftime('%d.%m.%y'),
+        rechnungsdatum.strftime('%Y-%m-%d'), rechnungsdatum.strftime('%d/%m/%Y'),
+    ])
+    nummer = zufall.choice([
+        f'RE-{zufall.randrange(10 ** 5):05d}', f'{zufall.randrange(10 ** 8, 10 ** 9)}',
+        f'OP/I{zufall.randrange(10 ** 6):06d}', f'INV-{zufall.randrange(10 ** 6)}', f'2025/{zufall.randrange(1000):04d}',
+    ])
+    kopf = zufall.choice([
+        [f'Rechnung {nummer}', f'Rechnungsdatum: {datum}'],
+        ['Rechnung', f'Rechnungsnummer: {nummer}', f'Datum {datum}'],
+        ['Rechnungsnummer Rechnungsdatum Zahlungsziel', f'{nummer} {datum} 14 Tage'],
+        ['Belegnummer Datum Seite', f'{zufall.randrange(10 ** 7)} {datum} 1'],
+        [f'INVOICE-{zufall.randrange(10 ** 7)}', f'Invoice date: {datum}', f'Invoice No. {nummer}'],
+        [f'Factuur {nummer}', f'Factuurdatum {datum}'],
+    ])
+    zeilen = ['Musterfirma GmbH · Industriestraße 12 · 12345 Musterstadt'] + kopf + [
+        'Kunde GmbH', 'Hauptstraße 1', '54321 Beispielstadt',
+        f'Kundennummer: {zufall.randrange(10 ** 6)}', f'Lieferdatum: {datum}',
+        'Pos. Menge Bezeichnung Einzelpreis Gesamtpreis',
+    ]
+    for position in range(1, zufall.randrange(2, 40)):
+        menge = zufall.randrange(1, 20)
+        zeilen.append(zufall.choice([
+            f'{position} {menge} Stk Artikel {zufall.randrange(10 ** 5)} {_betrag(zufall, 200)} € {_betrag(zufall, 2000)} €',
+            f'{position} {menge} x Versand DE Paket {_betrag(zufall, 50)} EUR',
+            f'{position} Dienstleistung {menge} h {_betrag(zufall, 150)} {_betrag(zufall, 3000)}',
+        ]))
+    zeilen += zufall.choice([
+        [f'Summe netto {_betrag(zufall)} €', f'zzgl. 19% MwSt {_betrag(zufall, 900)} €', f'Gesamtbetrag {_betrag(zufall)} €'],
+        [f'Zwischensumme: {_betrag(zufall)} EUR', f'Total: {_betrag(zufall)} EUR', f'{_betrag(zufall)} € inkl. MwSt'],
+        [f'Totaal excl. BTW € {_betrag(zufall)}', f'BTW 21% € {_betrag(zufall, 900)}', f'Totaalbedrag € {_betrag(zufall)}'],
+        [f'Subtotal {_betrag(zufall)}', f'Total amount {_betrag(zufall)}', f'Amount due: {_betrag(zufall)}'],
+        [f'Zu zahlen {_betrag(zufall)}', f'##BETRAGBRUTTO={_betrag(zufall)}##', f'##BETRAGNETTO={_betrag(zufall)}##'],
+    ])
+    zeilen += [
+        f'Zahlbar bis {(rechnungsdatum + timedelta(days=14)).strftime("%d.%m.%Y")} ohne Abzug.',
+        'Bankverbindung: Musterbank · IBAN DE12 3456 7890 1234 5678 90 · BIC MUSTDEFFXXX',
+        'Geschäftsführer: Max Mustermann · Amtsgericht Musterstadt HRB 12345 · USt-IdNr. DE123456789',
+        f'Seite 1/1 · Tel. +49 (0) 123 456-78 · Stand {datum}',
+    ]
+    return '\n'.join(zeilen)
+
+
+# Bausteine für Zufallstexte mit Grenzfällen (Zahlen direkt an Schlüsselwörtern, Trennzeichen, Unicode)
+BAUSTEINE = [
+    '€', 'EUR', 'eur', 'Euro', 'BTW', 'inkl.', 'inkl', 'MwSt', 'Summe', 'Gesamt', 'Total', 'Subtotal', 'TOTAAL',
+    'Totaalbedrag', 'Endbetrag', 'Zu zahlen', 'Amount', 'Sum', 'Price', 'Betrag', 'Netto', 'Brutto', '##',
+    '##BETRAGBRUTTO=', '##BETRAGNETTO=', 'Datum', 'Date', 'Rechnungsdatum', 'Rechnungsnummer', 'Belegnummer',
+    'INVOICE', 'INV', 'OP/', 'Nr.', 'No', '#', ':', ' ', '  ', '\n', '\t', '\xa0', '.', ',', '-', '/', '=',
+    '1', '12', '123', '1234', '1.234', '1,234', '12,50', '1.234,56', '1,234.56', '0,00', '999999,99', '1.000.000',
+    '31.12.2024', '2024-02-30', '07/03/25', '0012-05-07', '1.2.3', '..', ',,', '٣', '１２', 'ſum', 'K', 'İnkl.',
+]
+
+
+def zufallstext(zufall):
+    """Zufällige Folge von Bausteinen (für den Ergebnisvergleich, nicht für die Laufzeit)"""
+    return ''.join(zufall.choice(BAUSTEINE) for _ in range(zufall.randrange(1, 60)))
+
+
+def pdf_texte(verzeichnis):
+    """Text aller PDFs eines Verzeichnisses (rekursiv) wie in extract_invoice_data()"""
+    import pdfplumber
+    texte = []
+    for wurzel, _, dateien in os.walk(verzeichnis):
+        for datei in sorted(dateien):
+            if not datei.lower().endswith('.pdf'):
+                continue
+            try:
+                with pdfplumber.open(os.path.join(wurzel, datei)) as pdf:
+                    texte.append(''.join(page.extract_text() or '' for page in pdf.pages))
+            except Exception as e:
+                print(f"⚠️  {datei}: {e}")
+    return texte
+
+
+def erkennen(erkennung, text):
+    return (erkennung._extract_amount(text), erkennung._extract_date(text), erkennung._extract_invoice_number(text))
+
+
+def vergleichen(texte, bisher, neu):
+    """Anzahl der Texte mit abweichendem Ergebnis (die ersten werden ausgegeben)"""
+    abweichungen = 0
+    for text in texte:
+        erwartet, ergebnis = erkennen(bisher, text), erkennen(neu, text)
+        if erwartet != ergebnis:
+            abweichungen += 1
+            if abweichungen <= 5:
+                print(f"❌ Abweichung: bisher {erwartet}, neu {ergebnis}\n   Text: {text[:300]!r}")
+    return abweichungen
+
+
+def messen(name, erkennung, texte, wiederholungen):
+    """Beste Laufzeit je Dokument (µs)"""
+    laufzeit = min(timeit.repeat(lambda: [erkennen(erkennung, text) for text in texte],
+                                 number=1, repeat=wiederholungen))
+    je_dokument = laufzeit / len(texte) * 1e6
+    print(f"  {name:<16} {je_dokument:9.1f} µs/Dokument")
+    return je_dokument
+
+
+def main():
+    """Korpus erzeugen, Ergebnisse vergleichen und Laufzeiten messen"""
+    parser = argparse.ArgumentParser(description='Rechnungsdaten-Erkennung bisher vs. vorkompiliert vergleichen')
+    parser.add_argument('--anzahl', type=int, default=500, help='Anzahl Rechnungstexte (Standard: 500)')
+    parser.add_argument('--zufallstexte', type=int, default=5000,
+                        help='Zusätzliche Zufallstexte nur für den Ergebnisvergleich (Standard: 5000)')
+    parser.add_argument('--pdf-verzeichnis', help='Zusätzlich die PDFs dieses Verzeichnisses verwenden')
+    parser.add_argument('--wiederholungen', type=int, default=3, help='Messläufe je Variante (Standard: 3)')
+    args = parser.parse_args()
+
+    zufall = random.Random(42)
+    texte = [rechnungstext(zufall) for _ in range(args.anzahl)]
+    if args.pdf_verzeichnis:
+        pdfs = pdf_texte(args.pdf_verzeichnis)
+        print(f"📄 {len(pdfs)} PDFs aus {args.pdf_verzeichnis}")
+        texte += pdfs
+    bisher, neu = BisherigeErkennung(), PDFService()
+
+    print(f"🔍 Vergleiche Ergebnisse ({len(texte)} Rechnungen, {args.zufallstexte} Zufallstexte)...")
+    abweichungen = vergleichen(texte + [zufallstext(zufall) for _ in range(args.zufallstexte)], bisher, neu)
+    if abweichungen:
+        print(f"❌ {abweichungen} Texte mit abweichendem Ergebnis")
+        return 1
+    print("✅ Alle Ergebnisse identisch")
+
+    print(f"\n📊 Laufzeit ({len(texte)} Rechnungen, Ø {sum(map(len, texte)) // len(texte)} Zeichen)")
+    alt = messen('Bisher', bisher, texte, args.wiederholungen)
+    vorkompiliert = messen('Vorkompiliert', neu, texte, args.wiederholungen)
+    print(f"  → {alt / vorkompiliert:.1f}x schneller")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
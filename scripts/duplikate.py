@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Doppelt erfasste Rechnungen auflisten
+
+Gruppiert Buchungen mit gleicher Rechnung (Typ, Lieferant, Rechnungsnummer,
+Betrag) bzw. gleichem PDF-Inhalt. Exit-Code 1, wenn Duplikate existieren.
+
+Mit --aufraeumen werden stattdessen PDFs der Ablage gelöscht, die keine
+Buchung verwendet (abgewiesene Duplikate, gelöschte Buchungen). Dateien der
+letzten Stunde bleiben liegen, da ihre Buchung noch im Entstehen sein kann.
+
+Verwendung:
+    python scripts/duplikate.py
+    python scripts/duplikate.py --aufraeumen
+"""
+
+import sys
+import os
+import argparse
+
+# Pfad zum Projekt hinzufügen
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from services.duplikat_service import DuplikatService
+from services.pdf_ablage import PDFAblage
+
+def aufraeumen():
+    """Verwaiste PDFs der Ablage löschen"""
+    with app.app_context():
+        geloescht = PDFAblage().aufraeumen()
+    for pfad in geloescht:
+        print(f"  🗑️  {pfad}")
+    print(f"✅ {len(geloescht)} verwaiste PDFs gelöscht")
+    return 0
+
+def main():
+    """Duplikat-Bericht ausgeben"""
+    parser = argparse.ArgumentParser(description='Doppelt erfasste Rechnungen auflisten')
+    parser.add_argument('--aufraeumen', action='store_true',
+                        help='PDFs der Ablage löschen, die keine Buchung verwendet')
+    args = parser.parse_args()
+    if args.aufraeumen:
+        return aufraeumen()
+
+    with app.app_context():
+        gruppen = DuplikatService().bericht()
+
+    if not gruppen:
+        print("✅ Keine doppelt erfassten Rechnungen")
+        return 0
+
+    print(f"⚠️  {len(gruppen)} Gruppen doppelt erfasster Rechnungen:")
+    for gruppe in gruppen:
+        art = 'Gleiches PDF' if gruppe['art'] == 'PDF' else 'Gleiche Rechnung'
+        print(f"\n  {art} - {gruppe['lieferant'] or 'Ohne Lieferant'}")
+        for b in gruppe['buchungen']:
+            print(f"    #{b.id} {b.typ} {b.datum.strftime('%d.%m.%Y')} {b.betrag:.2f} € "
+                  f"{b.rechnungsnummer or '-'} ({b.quelle})")
+    return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Buchungen eines Jahres als CSV oder DATEV-CSV (ASCII-Import) exportieren
+
+Die Datei wird blockweise geschrieben, der Speicherbedarf bleibt auch bei
+sehr vielen Buchungen konstant.
+
+Verwendung:
+    python scripts/export_buchungen.py 2025                          # CSV nach stdout
+    python scripts/export_buchungen.py 2025 --format datev -o DATEV_Buchungen_2025.csv
+"""
+
+import sys
+import os
+import argparse
+
+# Pfad zum Projekt hinzufügen
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from services.export_service import ExportService, EXPORT_FORMATE
+
+def main():
+    """Export schreiben"""
+    parser = argparse.ArgumentParser(description='Buchungen eines Jahres exportieren')
+    parser.add_argument('jahr', type=int, help='Jahr der Buchungen')
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATE), default='csv', help='Exportformat (Standard: csv)')
+    parser.add_argument('-o', '--ausgabe', help='Zieldatei (Standard: stdout)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        service = ExportService(
+            bankkonto=app.config['DATEV_BANKKONTO'],
+            erloeskonto=app.config['DATEV_ERLOESKONTO'],
+            aufwandskonto=app.config['DATEV_AUFWANDSKONTO']
+        )
+        ziel = open(args.ausgabe, 'wb') if args.ausgabe else sys.stdout.buffer
+        try:
+            groesse = 0
+            for block in service.exportieren(args.jahr, args.format):
+                ziel.write(block)
+                groesse += len(block)
+        except Exception as e:
+            print(f"❌ Fehler beim Export: {e}", file=sys.stderr)
+            return 1
+        finally:
+            if args.ausgabe:
+                ziel.close()
+
+        if args.ausgabe:
+            print(f"✅ Export geschrieben: {args.ausgabe} ({groesse / 1024:.0f} KiB)")
+        return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
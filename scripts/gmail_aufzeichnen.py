@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Gmail-Antworten für Offline-Tests aufzeichnen
+
+Lädt die neuesten E-Mails (mit PDF-Anhang) eines oder aller Lieferanten-
+Labels im Format 'full' samt Anhängen aus Gmail und speichert sie als JSON.
+Die Aufzeichnung lässt sich mit FakeGmailService.aufzeichnung_laden()
+abspielen, z.B. um Batch-Abrufe und fields-Masken ohne Gmail-Zugang zu prüfen.
+
+Achtung: Die Datei enthält echte Rechnungen, nicht einchecken.
+
+Verwendung:
+    python scripts/gmail_aufzeichnen.py -o aufzeichnung.json
+    python scripts/gmail_aufzeichnen.py --label "Rechnungen/DPD" --anzahl 50 -o dpd.json
+"""
+
+import sys
+import os
+import base64
+import argparse
+from itertools import islice
+
+# Pfad zum Projekt hinzufügen
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import Lieferant
+from services.gmail_service import GmailService
+from services.gmail_fake import FakeGmailService
+
+def main():
+    """Aufzeichnung erstellen"""
+    parser = argparse.ArgumentParser(description='Gmail-Antworten für Offline-Tests aufzeichnen')
+    parser.add_argument('--label', help='nur dieses Label (Standard: alle Lieferanten-Labels)')
+    parser.add_argument('--anzahl', type=int, default=20, help='E-Mails je Label (Standard: 20)')
+    parser.add_argument('-o', '--ausgabe', required=True, help='Zieldatei (JSON)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        gmail = GmailService()
+        gmail._ensure_authenticated()
+        if not gmail.service:
+            print("❌ Gmail-Service konnte nicht initialisiert werden")
+            return 1
+
+        if args.label:
+            labels = [args.label]
+        else:
+            labels = sorted({
+                l.gmail_label for l in Lieferant.query.filter(Lieferant.gmail_label.isnot(None)).all()
+                if l.gmail_label
+            })
+
+        aufzeichnung = FakeGmailService()
+        aufzeichnung.history_id = int(gmail.get_history_id())
+        for label in labels:
+            label_id = gmail.get_label_id(label)
+            if not label_id:
+                print(f"⚠️  Label '{label}' nicht gefunden")
+                continue
+            aufzeichnung.labels[label_id] = label
+            anzahl = 0
+            for msg in islice(gmail.messages_auflisten(label_id), args.anzahl):
+                nachricht = gmail.get_message_details(msg['id'])
+                if not nachricht:
+                    continue
+                aufzeichnung.nachrichten[nachricht['id']] = nachricht
+                for anhang in gmail.extract_pdf_attachments(nachricht):
+                    daten = gmail.limiter.ausfuehren(gmail.service.users().messages().attachments().get(
+                        userId='me', messageId=nachricht['id'], id=anhang['attachment_id']
+                    ))['data']
+                    aufzeichnung.anhaenge[(nachricht['id'], anhang['attachment_id'])] = base64.urlsafe_b64decode(daten)
+                anzahl += 1
+            print(f"  {label}: {anzahl} E-Mails")
+
+    aufzeichnung.aufzeichnung_speichern(args.ausgabe)
+    print(f"✅ {len(aufzeichnung.nachrichten)} E-Mails, {len(aufzeichnung.anhaenge)} Anhänge gespeichert: {args.ausgabe}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
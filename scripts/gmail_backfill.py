@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Gmail-Backfill: alle E-Mails der Lieferanten-Labels importieren
+
+Für neu angelegte Lieferanten mit mehreren Jahren Rechnungshistorie. Die
+E-Mails werden seitenweise abgerufen, alle COMMIT_INTERVALL Rechnungen wird
+committet. Ein abgebrochener Lauf kann einfach erneut gestartet werden,
+bereits importierte E-Mails werden übersprungen.
+
+Der Backfill läuft als Sync-Job (Tabelle sync_job) wie der Cron-Job und der
+Sync-Button: Läuft für das Postfach bereits eine Synchronisation, startet er nicht.
+
+Verwendung:
+    python scripts/gmail_backfill.py
+    python scripts/gmail_backfill.py --lieferant DPD --seit 2023-01-01
+"""
+
+import sys
+import os
+import time
+import argparse
+from datetime import datetime
+
+# Pfad zum Projekt hinzufügen
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import Lieferant
+from services.gmail_service import COMMIT_INTERVALL
+from services.job_service import JobService
+
+def main():
+    """Backfill ausführen"""
+    parser = argparse.ArgumentParser(description='Alle E-Mails der Gmail-Labels importieren')
+    parser.add_argument('--lieferant', help='nur diesen Lieferanten (Name)')
+    parser.add_argument('--seit', type=lambda wert: datetime.strptime(wert, '%Y-%m-%d').date(),
+                        help='nur E-Mails ab diesem Datum (JJJJ-MM-TT)')
+    parser.add_argument('--commit-intervall', type=int, default=COMMIT_INTERVALL,
+                        help=f'Commit nach so vielen Rechnungen (Standard: {COMMIT_INTERVALL})')
+    args = parser.parse_args()
+
+    with app.app_context():
+        lieferant_id = None
+        if args.lieferant:
+            lieferant = Lieferant.query.filter_by(name=args.lieferant).first()
+            if not lieferant or not lieferant.gmail_label:
+                print(f"❌ Lieferant '{args.lieferant}' mit Gmail-Label nicht gefunden")
+                return 1
+            lieferant_id = lieferant.id
+
+        parameter = {'backfill': True, 'commit_intervall': args.commit_intervall}
+        if args.seit:
+            parameter['seit'] = args.seit.isoformat()
+        if lieferant_id:
+            parameter['lieferant_id'] = lieferant_id
+
+        # Über die Job-Tabelle ausführen, damit nie zwei Syncs parallel laufen
+        job_service = JobService()
+        job, neu = job_service.einreihen(parameter=parameter)
+        if not neu:
+            print(f"❌ Gmail-Synchronisation läuft bereits (Job {job.id}), Backfill nicht gestartet")
+            return 1
+
+        start = time.perf_counter()
+        if not job_service.ausfuehren(job):
+            print(f"❌ Job {job.id} wurde von einem anderen Worker übernommen")
+            return 1
+        dauer = time.perf_counter() - start
+
+        if job.status == 'fehler':
+            print(f"❌ Fehler beim Backfill: {job.meldung}")
+            return 1
+        print(f"✅ {job.meldung} ({dauer:.1f}s)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Monats-Rollup (BuchungMonatsSumme) neu aufbauen oder prüfen
+
+Verwendung:
+    python scripts/monatssummen.py --rebuild   # Rollup komplett neu berechnen
+    python scripts/monatssummen.py --pruefen   # Rollup gegen buchung prüfen (Standard)
+"""
+
+import sys
+import os
+import argparse
+
+# Pfad zum Projekt hinzufügen
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from services.monatssummen_service import MonatssummenService
+
+def main():
+    """Rollup neu aufbauen bzw. prüfen"""
+    parser = argparse.ArgumentParser(description='Monats-Rollup der Buchungen pflegen')
+    parser.add_argument('--rebuild', action='store_true', help='Rollup vollständig neu berechnen')
+    parser.add_argument('--pruefen', action='store_true', help='Rollup gegen die Buchungen prüfen')
+    args = parser.parse_args()
+
+    with app.app_context():
+        service = MonatssummenService()
+
+        if args.rebuild:
+            try:
+                anzahl = service.rebuild()
+                print(f"✅ Monatssummen neu aufgebaut ({anzahl} Zeilen)")
+            except Exception as e:
+                print(f"❌ Fehler beim Neuaufbau: {e}")
+                return 1
+
+        if args.pruefen or not args.rebuild:
+            abweichungen = service.pruefen()
+            if not abweichungen:
+                print("✅ Monatssummen sind konsistent")
+                return 0
+
+            print(f"❌ {len(abweichungen)} Abweichungen gefunden:")
+            for a in abweichungen:
+                print(f"  {a['jahr']}-{a['monat']:02d} {a['typ']} Lieferant={a['lieferant_id']}: "
+                      f"Soll {a['soll_cent'] / 100:.2f} € ({a['soll_anzahl']}), "
+                      f"Ist {a['ist_cent'] / 100:.2f} € ({a['ist_anzahl']})")
+            print("Neuaufbau mit: python scripts/monatssummen.py --rebuild")
+            return 1
+
+        return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
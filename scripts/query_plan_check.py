@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Query-Plan-Prüfung für die häufigsten Buchungs-Abfragen (SQLite)
+
+Führt die Abfragen der Listen, des Dashboards und des Gmail-Syncs aus, lässt
+sich von SQLite den Plan erklären (EXPLAIN QUERY PLAN) und schlägt fehl, wenn
+buchung oder buchung_monats_summe vollständig gescannt statt per Index gesucht
+werden.
+
+Verwendung:
+    python scripts/query_plan_check.py
+    DATABASE_URL=sqlite:////tmp/test.db python scripts/query_plan_check.py
+"""
+
+import sys
+import os
+from contextlib import contextmanager
+
+# Pfad zum Projekt hinzufügen
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from app import app
+from models import db, Buchung
+from services.buchungen_service import BuchungenService
+from services.dashboard_service import DashboardService
+from services.duplikat_service import DuplikatService
+
+# Tabellen, die nie vollständig gescannt werden dürfen
+GEPRUEFTE_TABELLEN = ('buchung', 'buchung_monats_summe')
+
+JAHR = 2025
+
+
+def _einnahmen_liste():
+    service = BuchungenService()
+    service.get_seite('Einnahme', JAHR)
+    service.get_seite('Einnahme', JAHR, cursor=f'{JAHR}-06-30|1000000')
+
+
+def _ausgaben_liste():
+    BuchungenService().get_ausgaben_nach_lieferant(JAHR)
+
+
+def _ausgaben_seite():
+    BuchungenService().get_seite('Ausgabe', JAHR, cursor=f'{JAHR}-06-30|1000000', lieferant_id=1)
+
+
+def _dashboard():
+    DashboardService().get_jahresuebersicht(JAHR)
+
+
+def _lieferant_hat_buchungen():
+    Buchung.query.filter_by(lieferant_id=1).count()
+
+
+def _gmail_duplikatcheck():
+    Buchung.query.filter_by(gmail_message_id='query-plan-check').first()
+
+
+def _rechnung_duplikatcheck():
+    DuplikatService().finden('Ausgabe', 1, 'RE-query-plan-check', 1, pdf_hash='0' * 64)
+
+
+def _offene_einnahmen():
+    Buchung.query.filter(
+        Buchung.typ == 'Einnahme',
+        Buchung.ueberwiesen_am.is_(None)
+    ).order_by(Buchung.datum).all()
+
+
+HOT_QUERIES = [
+    ('Einnahmen-Liste', _einnahmen_liste),
+    ('Ausgaben-Liste', _ausgaben_liste),
+    ('Ausgaben "Mehr laden"', _ausgaben_seite),
+    ('Dashboard', _dashboard),
+    ('Lieferant löschen (Buchungen vorhanden?)', _lieferant_hat_buchungen),
+    ('Gmail-Sync Duplikatcheck', _gmail_duplikatcheck),
+    ('Rechnungs-Duplikatcheck (Fingerprint/PDF)', _rechnung_duplikatcheck),
+    ('Offene Forderungen', _offene_einnahmen),
+]
+
+
+@contextmanager
+def _statements_mitschneiden():
+    """Alle SELECT-Statements (mit Parametern) während des Blocks sammeln"""
+    statements = []
+
+    def mitschneiden(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', mitschneiden)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', mitschneiden)
+
+
+def _full_scans(plan_zeilen):
+    """Plan-Zeilen, die eine geprüfte Tabelle vollständig scannen"""
+    scans = []
+    for detail in plan_zeilen:
+        teile = detail.split()
+        if not teile or teile[0] != 'SCAN':
+            continue
+        # "SCAN buchung" bzw. ältere SQLite-Versionen: "SCAN TABLE buchung"
+        tabelle = teile[2] if len(teile) > 2 and teile[1] == 'TABLE' else (teile[1] if len(teile) > 1 else '')
+        if tabelle in GEPRUEFTE_TABELLEN:
+            scans.append(detail)
+    return scans
+
+
+def check_query_plans():
+    """Alle Hot-Queries prüfen, gibt die Anzahl der Fehler zurück"""
+    if db.engine.dialect.name != 'sqlite':
+        print(f"⚠️  Query-Plan-Prüfung unterstützt nur SQLite (aktuell: {db.engine.dialect.name})")
+        return 0
+
+    fehler = 0
+    for name, abfrage in HOT_QUERIES:
+        with _statements_mitschneiden() as statements:
+            abfrage()
+        db.session.rollback()
+
+        name_ok = True
+        for statement, parameters in statements:
+            plan = db.session.connection().exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters
+            ).fetchall()
+            plan_zeilen = [zeile[-1] for zeile in plan]
+            scans = _full_scans(plan_zeilen)
+            if scans:
+                name_ok = False
+                print(f"❌ {name}: Full Scan")
+                print(f"   SQL: {' '.join(statement.split())}")
+                for detail in plan_zeilen:
+                    print(f"   Plan: {detail}")
+        db.session.rollback()
+
+        if name_ok:
+            print(f"✅ {name}")
+        else:
+            fehler += 1
+
+    return fehler
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        sys.exit(1 if check_query_plans() else 0)
@@ -0,0 +1,226 @@
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+from models import db, Buchung, Banktransaktion, AbgleichVorschlag, betrag_in_cent, rechnungsnummer_normalisieren
+
+# Zahlungseingang/-ausgang relativ zum Rechnungsdatum
+TAGE_VORHER = 7     # Zahlung bis zu 7 Tage vor dem Rechnungsdatum (z.B. Vorkasse)
+TAGE_NACHHER = 90   # Zahlung bis zu 90 Tage nach dem Rechnungsdatum
+
+# Gewichte der Konfidenz (Betrag ist Voraussetzung)
+GEWICHT_BETRAG = 0.5
+GEWICHT_RECHNUNGSNUMMER = 0.4
+GEWICHT_EINDEUTIG = 0.15
+GEWICHT_DATUM = 0.1
+
+# Kürzere Rechnungsnummern ("1", "12") treffen zufällig
+MIN_RECHNUNGSNUMMER_LAENGE = 3
+
+# Höchstens so viele Vorschläge je Bankumsatz in der Prüfliste
+MAX_VORSCHLAEGE = 3
+
+
+class AbgleichService:
+    """Abgleich der Bankumsätze mit offenen Buchungen
+
+    Offen sind Einnahmen ohne ueberwiesen_am und Ausgaben, die noch nicht
+    vom Zielkonto abgebucht sind. Die Buchungen werden einmal nach
+    (Typ, Betrag in Cent) in ein Dict gehasht und je Schlüssel nach Datum
+    sortiert; je Bankumsatz werden nur die Kandidaten im Datumsfenster per
+    Bisektion betrachtet statt aller Buchungen.
+    """
+
+    def __init__(self, schwelle=0.9):
+        self.schwelle = schwelle
+
+    # ---------- Laden ----------
+
+    def _offene_buchungen(self):
+        """{(typ, cent): [(datum, id, rechnungsnummer_normalisiert)]} nach Datum sortiert"""
+        stmt = db.select(
+            Buchung.id, Buchung.typ, Buchung.betrag, Buchung.datum, Buchung.rechnungsnummer
+        ).where(
+            db.or_(
+                db.and_(Buchung.typ == 'Einnahme', Buchung.ueberwiesen_am.is_(None)),
+                db.and_(Buchung.typ == 'Ausgabe', Buchung.von_zielkonto_abgebucht == False)
+            )
+        ).order_by(Buchung.datum, Buchung.id)
+
+        index = {}
+        for buchung_id, typ, betrag, datum, rechnungsnummer in db.session.execute(stmt):
+            index.setdefault((typ, betrag_in_cent(betrag)), []).append(
+                (datum, buchung_id, rechnungsnummer_normalisieren(rechnungsnummer))
+            )
+        return index
+
+    def _offene_umsaetze(self):
+        return db.session.execute(
+            db.select(
+                Banktransaktion.id,
+                Banktransaktion.buchungsdatum,
+                Banktransaktion.betrag,
+                Banktransaktion.verwendungszweck
+            ).where(Banktransaktion.buchung_id.is_(None))
+        ).all()
+
+    def _abgelehnte_paare(self):
+        return set(db.session.execute(
+            db.select(AbgleichVorschlag.banktransaktion_id, AbgleichVorschlag.buchung_id)
+            .where(AbgleichVorschlag.abgelehnt == True)
+        ).all())
+
+    # ---------- Bewertung ----------
+
+    def kandidaten(self, index, umsatz, abgelehnt=frozenset()):
+        """Bewertete Kandidaten eines Bankumsatzes als [(konfidenz, buchung_id, typ)]"""
+        umsatz_id, buchungsdatum, betrag, verwendungszweck = umsatz
+        cent = betrag_in_cent(betrag)
+        if cent == 0:
+            return []
+        # Eingang (positiv) gegen Einnahmen, Abgang (negativ) gegen Ausgaben
+        typ = 'Einnahme' if cent > 0 else 'Ausgabe'
+        liste = index.get((typ, abs(cent)))
+        if not liste:
+            return []
+
+        # Datumsfenster: Rechnungsdatum in [Zahlung - TAGE_NACHHER, Zahlung + TAGE_VORHER]
+        von = bisect_left(liste, (buchungsdatum - timedelta(days=TAGE_NACHHER),))
+        bis = bisect_right(liste, (buchungsdatum + timedelta(days=TAGE_VORHER + 1),))
+        fenster = [eintrag for eintrag in liste[von:bis] if (umsatz_id, eintrag[1]) not in abgelehnt]
+        if not fenster:
+            return []
+
+        zweck = rechnungsnummer_normalisieren(verwendungszweck)
+        eindeutig = len(fenster) == 1
+        bewertet = []
+        for datum, buchung_id, rechnungsnummer in fenster:
+            konfidenz = GEWICHT_BETRAG
+            if len(rechnungsnummer) >= MIN_RECHNUNGSNUMMER_LAENGE and rechnungsnummer in zweck:
+                konfidenz += GEWICHT_RECHNUNGSNUMMER
+            if eindeutig:
+                konfidenz += GEWICHT_EINDEUTIG
+            abstand = abs((buchungsdatum - datum).days)
+            konfidenz += GEWICHT_DATUM * max(0.0, 1 - abstand / TAGE_NACHHER)
+            bewertet.append((min(konfidenz, 1.0), buchung_id, typ))
+        return bewertet
+
+    # ---------- Abgleich ----------
+
+    def abgleichen(self):
+        """Alle offenen Bankumsätze abgleichen
+
+        Paare ab der Schwelle werden direkt verbucht (Bulk-Update), die übrigen
+        besten Kandidaten ersetzen die offenen Vorschläge der Prüfliste.
+
+        Returns:
+            dict mit umsaetze, zugeordnet und vorschlaege
+        """
+        index = self._offene_buchungen()
+        umsaetze = self._offene_umsaetze()
+        abgelehnt = self._abgelehnte_paare()
+        umsatz_datum = {umsatz[0]: umsatz[1] for umsatz in umsaetze}
+
+        paare = []
+        for umsatz in umsaetze:
+            for konfidenz, buchung_id, typ in self.kandidaten(index, umsatz, abgelehnt):
+                paare.append((konfidenz, umsatz[0], buchung_id, typ))
+
+        # Greedy nach Konfidenz: jeder Umsatz und jede Buchung höchstens einmal
+        paare.sort(key=lambda paar: (-paar[0], paar[1], paar[2]))
+        vergebene_umsaetze = set()
+        vergebene_buchungen = set()
+        zuordnungen = []
+        vorschlaege = {}
+        for konfidenz, umsatz_id, buchung_id, typ in paare:
+            if (konfidenz >= self.schwelle and umsatz_id not in vergebene_umsaetze
+                    and buchung_id not in vergebene_buchungen):
+                vergebene_umsaetze.add(umsatz_id)
+                vergebene_buchungen.add(buchung_id)
+                zuordnungen.append((umsatz_id, buchung_id, typ))
+            else:
+                # Unter der Schwelle oder Konflikt mit einer sichereren Zuordnung
+                vorschlaege.setdefault(umsatz_id, []).append((konfidenz, buchung_id))
+
+        try:
+            self._zuordnungen_speichern(zuordnungen, umsatz_datum)
+            anzahl_vorschlaege = self._vorschlaege_speichern(vorschlaege, vergebene_umsaetze, vergebene_buchungen)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return {
+            'umsaetze': len(umsaetze),
+            'zugeordnet': len(zuordnungen),
+            'vorschlaege': anzahl_vorschlaege
+        }
+
+    def _zuordnungen_speichern(self, zuordnungen, umsatz_datum):
+        """Bulk-Update nach Primärschlüssel (executemany) auf buchung und banktransaktion"""
+        if not zuordnungen:
+            return
+        einnahmen = [
+            {'id': buchung_id, 'ueberwiesen_am': umsatz_datum[umsatz_id]}
+            for umsatz_id, buchung_id, typ in zuordnungen if typ == 'Einnahme'
+        ]
+        ausgaben = [
+            {'id': buchung_id, 'von_zielkonto_abgebucht': True}
+            for _, buchung_id, typ in zuordnungen if typ == 'Ausgabe'
+        ]
+        if einnahmen:
+            db.session.execute(db.update(Buchung), einnahmen)
+        if ausgaben:
+            db.session.execute(db.update(Buchung), ausgaben)
+        db.session.execute(db.update(Banktransaktion), [
+            {'id': umsatz_id, 'buchung_id': buchung_id} for umsatz_id, buchung_id, _ in zuordnungen
+        ])
+
+    def _vorschlaege_speichern(self, vorschlaege, vergebene_umsaetze, vergebene_buchungen):
+        """Offene Vorschläge ersetzen (abgelehnte bleiben stehen)"""
+        db.session.execute(db.delete(AbgleichVorschlag).where(AbgleichVorschlag.abgelehnt == False))
+        zeilen = []
+        for umsatz_id, kandidaten in vorschlaege.items():
+            if umsatz_id in vergebene_umsaetze:
+                continue
+            kandidaten = [k for k in kandidaten if k[1] not in vergebene_buchungen]
+            for konfidenz, buchung_id in kandidaten[:MAX_VORSCHLAEGE]:
+                zeilen.append({
+                    'banktransaktion_id': umsatz_id,
+                    'buchung_id': buchung_id,
+                    'konfidenz': round(konfidenz, 3)
+                })
+        if zeilen:
+            db.session.execute(db.insert(AbgleichVorschlag), zeilen)
+        return len(zeilen)
+
+    # ---------- Prüfliste ----------
+
+    def get_pruefliste(self):
+        """Offene Vorschläge, je Umsatz der beste zuerst"""
+        return AbgleichVorschlag.query.filter_by(abgelehnt=False).order_by(
+            AbgleichVorschlag.banktransaktion_id, AbgleichVorschlag.konfidenz.desc()
+        ).all()
+
+    def bestaetigen(self, vorschlag_id):
+        """Vorschlag übernehmen; weitere Vorschläge zu Umsatz bzw. Buchung entfallen"""
+        vorschlag = db.get_or_404(AbgleichVorschlag, vorschlag_id)
+        umsatz, buchung = vorschlag.banktransaktion, vorschlag.buchung
+        umsatz.buchung_id = buchung.id
+        if buchung.typ == 'Einnahme':
+            buchung.ueberwiesen_am = umsatz.buchungsdatum
+        else:
+            buchung.von_zielkonto_abgebucht = True
+        db.session.execute(db.delete(AbgleichVorschlag).where(
+            AbgleichVorschlag.abgelehnt == False,
+            db.or_(
+                AbgleichVorschlag.banktransaktion_id == umsatz.id,
+                AbgleichVorschlag.buchung_id == buchung.id
+            )
+        ))
+        db.session.commit()
+        return buchung
+
+    def ablehnen(self, vorschlag_id):
+        """Vorschlag ablehnen (wird nicht erneut vorgeschlagen)"""
+        vorschlag = db.get_or_404(AbgleichVorschlag, vorschlag_id)
+        vorschlag.abgelehnt = True
+        db.session.commit()
@@ -0,0 +1,233 @@
+import csv
+import hashlib
+import io
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from models import db, Banktransaktion, betrag_in_cent
+
+# Spaltennamen der gängigen Bank-Exporte (CSV bzw. CAMT-CSV), in Prioritätsreihenfolge
+SPALTEN_ALIASE = {
+    'buchungsdatum': ('buchungstag', 'buchungsdatum', 'datum', 'valutadatum', 'wertstellung', 'booking date'),
+    'betrag': ('betrag', 'betrag (eur)', 'betrag (€)', 'umsatz', 'amount'),
+    'verwendungszweck': ('verwendungszweck', 'vorgang/verwendungszweck', 'buchungstext', 'purpose'),
+    'gegenpartei': ('beguenstigter/zahlungspflichtiger', 'begünstigter/zahlungspflichtiger',
+                    'name zahlungsbeteiligter', 'auftraggeber/empfänger', 'auftraggeber / begünstigter',
+                    'zahlungsempfänger', 'empfänger', 'auftraggeber', 'name'),
+    'iban': ('kontonummer/iban', 'iban zahlungsbeteiligter', 'iban', 'kontonummer'),
+}
+
+DATUMSFORMATE = ('%d.%m.%Y', '%d.%m.%y', '%Y-%m-%d')
+
+# Betrag mit Tausender- und Dezimaltrenner ('.' oder ','): das letzte Trennzeichen vor 1-2 Ziffern ist der
+# Dezimaltrenner, das andere trennt Dreiergruppen (1.234,56 / 1,234.56 / 1.234 / 12,5). Kontoauszüge haben
+# höchstens zwei Nachkommastellen, drei Ziffern nach einem Trennzeichen sind daher immer eine Tausendergruppe.
+BETRAG_MUSTER = re.compile(
+    r'(?P<vorzeichen>[+-]?)(?:'
+    r'(?P<ganz>\d+)'
+    r'|(?P<gruppen>\d{1,3}(?P<tausender>[.,])\d{3}(?:(?P=tausender)\d{3})*)(?:(?P<dezimal>[.,])(?P<nachkomma>\d{1,2}))?'
+    r'|(?P<vorkomma>\d+)(?P<trenner>[.,])(?P<stellen>\d{1,2})'
+    r')'
+)
+
+# Zeilen vor der Kopfzeile (Kontoinformationen im Export mancher Banken)
+MAX_VORSPANN_ZEILEN = 30
+
+
+def transaktion_hash(buchungsdatum, betrag, verwendungszweck):
+    """Duplikat-Schlüssel aus (Datum, Betrag in Cent, normalisiertem Verwendungszweck)"""
+    zweck = ' '.join((verwendungszweck or '').split()).lower()
+    schluessel = f"{buchungsdatum.isoformat()}|{betrag_in_cent(betrag)}|{zweck}"
+    return hashlib.sha256(schluessel.encode('utf-8')).hexdigest()
+
+
+class BankimportService:
+    """Import von Kontoauszügen (CSV) in Banktransaktion
+
+    Die Datei wird lokal geparst; neue Umsätze werden in Batches per
+    executemany eingefügt, bereits vorhandene über den Hash übersprungen.
+    """
+
+    def __init__(self, batch_groesse=500):
+        # <= 999 wegen der Parametergrenze älterer SQLite-Versionen (IN-Abfrage)
+        self.batch_groesse = batch_groesse
+
+    # ---------- Parsen ----------
+
+    def _dekodieren(self, inhalt):
+        """Bytes als UTF-8 (mit/ohne BOM), sonst als Windows-1252 lesen"""
+        if isinstance(inhalt, str):
+            return inhalt
+        try:
+            return inhalt.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            return inhalt.decode('cp1252')
+
+    def _spalten_zuordnen(self, kopf):
+        """Kopfzeile auf Feldnamen abbilden, None wenn Datum oder Betrag fehlen"""
+        normalisiert = [spalte.strip().strip('"').lower() for spalte in kopf]
+        zuordnung = {}
+        for feld, aliase in SPALTEN_ALIASE.items():
+            for alias in aliase:
+                if alias in normalisiert:
+                    zuordnung[feld] = normalisiert.index(alias)
+                    break
+        if 'buchungsdatum' not in zuordnung or 'betrag' not in zuordnung:
+            return None
+        return zuordnung
+
+    def _datum(self, wert):
+        wert = wert.strip()
+        for format in DATUMSFORMATE:
+            try:
+                return datetime.strptime(wert, format).date()
+            except ValueError:
+                continue
+        raise ValueError(f"Ungültiges Datum: {wert}")
+
+    def _betrag(self, wert):
+        """Betrag im deutschen (1.234,56) oder englischen (1,234.56) Format
+
+        Beispiele: '1,234.56' -> 1234.56, '-1.234,56' -> -1234.56, '1.234' -> 1234.00,
+        '12,5' -> 12.50; '1.234.56' und '1,2345' sind ungültig.
+
+        Raises:
+            ValueError: bei mehrdeutigen oder ungültigen Beträgen (z.B. 1.234.56, 1,2345)
+        """
+        wert = wert.replace('€', '').replace('EUR', '').replace(' ', '').replace('\xa0', '').strip()
+        treffer = BETRAG_MUSTER.fullmatch(wert)
+        if not treffer or (treffer['dezimal'] and treffer['dezimal'] == treffer['tausender']):
+            raise ValueError(f"Ungültiger Betrag: {wert}")
+        if treffer['ganz']:
+            zahl = treffer['ganz']
+        elif treffer['gruppen']:
+            zahl = treffer['gruppen'].replace(treffer['tausender'], '') + '.' + (treffer['nachkomma'] or '0')
+        else:
+            zahl = f"{treffer['vorkomma']}.{treffer['stellen']}"
+        try:
+            return Decimal(treffer['vorzeichen'] + zahl).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            raise ValueError(f"Ungültiger Betrag: {wert}")
+
+    def umsaetze_lesen(self, inhalt):
+        """Umsätze einer CSV-Datei als Generator von (Zeilennummer, dict | ValueError)
+
+        Raises:
+            ValueError: wenn keine Kopfzeile mit Datum und Betrag gefunden wird
+        """
+        text = self._dekodieren(inhalt)
+        probe = text[:4096]
+        try:
+            trennzeichen = csv.Sniffer().sniff(probe, delimiters=';,\t').delimiter
+        except csv.Error:
+            # z.B. bei Vorspann-Zeilen: häufigstes Trennzeichen nehmen
+            trennzeichen = max(';,\t', key=probe.count)
+
+        reader = csv.reader(io.StringIO(text), delimiter=trennzeichen)
+        zuordnung = None
+        for zeile in reader:
+            zuordnung = self._spalten_zuordnen(zeile)
+            if zuordnung or reader.line_num >= MAX_VORSPANN_ZEILEN:
+                break
+        if not zuordnung:
+            raise ValueError("Keine Kopfzeile mit Buchungsdatum und Betrag gefunden")
+
+        letzte_spalte = max(zuordnung.values())
+        for zeile in reader:
+            if not any(feld.strip() for feld in zeile):
+                continue
+            if len(zeile) <= letzte_spalte:
+                yield reader.line_num, ValueError(f"Zu wenige Spalten ({len(zeile)})")
+                continue
+            try:
+                umsatz = {
+                    feld: zeile[index].strip() or None
+                    for feld, index in zuordnung.items()
+                }
+                umsatz['buchungsdatum'] = self._datum(umsatz['buchungsdatum'] or '')
+                umsatz['betrag'] = self._betrag(umsatz['betrag'] or '')
+            except ValueError as e:
+                yield reader.line_num, e
+                continue
+            if umsatz.get('verwendungszweck'):
+                umsatz['verwendungszweck'] = umsatz['verwendungszweck'][:500]
+            if umsatz.get('gegenpartei'):
+                umsatz['gegenpartei'] = umsatz['gegenpartei'][:200]
+            if umsatz.get('iban'):
+                umsatz['iban'] = umsatz['iban'].replace(' ', '')[:34]
+            umsatz['hash'] = transaktion_hash(umsatz['buchungsdatum'], umsatz['betrag'], umsatz.get('verwendungszweck'))
+            yield reader.line_num, umsatz
+
+    # ---------- Import ----------
+
+    def _batch_einfuegen(self, batch):
+        """Bereits importierte Hashes aussortieren, Rest per executemany einfügen"""
+        vorhanden = set(db.session.scalars(
+            db.select(Banktransaktion.hash).where(Banktransaktion.hash.in_([u['hash'] for u in batch]))
+        ))
+        neue = [u for u in batch if u['hash'] not in vorhanden]
+        if neue:
+            db.session.execute(db.insert(Banktransaktion), neue)
+        return len(neue)
+
+    def importieren(self, inhalt):
+        """Kontoauszug importieren (eine Transaktion, Rollback bei Fehler)
+
+        Args:
+            inhalt: Dateiinhalt als bytes oder str
+
+        Returns:
+            dict mit gelesen, importiert, duplikate und fehler [(Zeile, Meldung)]
+        """
+        ergebnis = {'gelesen': 0, 'importiert': 0, 'duplikate': 0, 'fehler': []}
+        gesehen = set()
+        batch = []
+        try:
+            for zeilennummer, umsatz in self.umsaetze_lesen(inhalt):
+                if isinstance(umsatz, ValueError):
+                    ergebnis['fehler'].append((zeilennummer, str(umsatz)))
+                    continue
+                ergebnis['gelesen'] += 1
+                # Duplikate innerhalb derselben Datei
+                if umsatz['hash'] in gesehen:
+                    continue
+                gesehen.add(umsatz['hash'])
+                batch.append(umsatz)
+                if len(batch) >= self.batch_groesse:
+                    ergebnis['importiert'] += self._batch_einfuegen(batch)
+                    batch = []
+            if batch:
+                ergebnis['importiert'] += self._batch_einfuegen(batch)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        ergebnis['duplikate'] = ergebnis['gelesen'] - ergebnis['importiert']
+        return ergebnis
+
+    # ---------- Übersicht ----------
+
+    def get_letzte_umsaetze(self, anzahl=100):
+        """Neueste Umsätze (schreibgeschützte Zeilen) für die Übersicht"""
+        return db.session.execute(
+            db.select(
+                Banktransaktion.id,
+                Banktransaktion.buchungsdatum,
+                Banktransaktion.betrag,
+                Banktransaktion.verwendungszweck,
+                Banktransaktion.gegenpartei,
+                Banktransaktion.buchung_id
+            ).order_by(
+                Banktransaktion.buchungsdatum.desc(), Banktransaktion.id.desc()
+            ).limit(anzahl)
+        ).all()
+
+    def get_anzahl(self):
+        """(gesamt, ohne zugeordnete Buchung)"""
+        return db.session.execute(
+            db.select(
+                db.func.count(Banktransaktion.id),
+                db.func.coalesce(db.func.sum(db.case((Banktransaktion.buchung_id.is_(None), 1), else_=0)), 0)
+            )
+        ).one()
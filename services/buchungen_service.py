@@ -0,0 +1,190 @@
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from models import db, Buchung, Lieferant
+from services.monatssummen_service import MonatssummenService
+from services.listen_service import BUCHUNG_SPALTEN, BuchungZeile, LieferantZeile, buchung_zeilen
+
+# Erlaubte Sortierspalten der Listen (Keyset immer auf (Spalte, id))
+SORTIERUNGEN = {
+    'datum': Buchung.datum,
+    'betrag': Buchung.betrag,
+}
+
+# Platzhalter: Ausgaben aller Lieferanten (statt eines bestimmten/ohne Lieferant)
+ALLE_LIEFERANTEN = object()
+
+
+class BuchungenService:
+    """Abfragen für die Buchungslisten (Einnahmen/Ausgaben)
+
+    Die Listen werden seitenweise per Keyset-Pagination auf (Sortierspalte, id)
+    geladen: Folgeseiten setzen hinter dem letzten Eintrag der Vorseite auf
+    statt mit OFFSET zu zählen, die Kosten pro Seite bleiben damit konstant.
+    Geliefert werden schreibgeschützte BuchungZeile-Tupel statt ORM-Objekten.
+    """
+
+    def __init__(self, seitengroesse=50):
+        self.seitengroesse = seitengroesse
+
+    # ---------- Sortierung und Cursor ----------
+
+    def sortierung_pruefen(self, sortierung, richtung):
+        """Ungültige Werte auf die Standardsortierung (Datum absteigend) zurücksetzen"""
+        if sortierung not in SORTIERUNGEN:
+            sortierung = 'datum'
+        if richtung not in ('asc', 'desc'):
+            richtung = 'desc'
+        return sortierung, richtung
+
+    def cursor_kodieren(self, buchung, sortierung):
+        """Cursor für die Folgeseite hinter dieser Buchung"""
+        wert = getattr(buchung, sortierung)
+        if isinstance(wert, date):
+            wert = wert.isoformat()
+        return f"{wert}|{buchung.id}"
+
+    def cursor_dekodieren(self, cursor, sortierung):
+        """Cursor in (Wert, id) zerlegen, ValueError bei ungültigem Cursor"""
+        try:
+            wert, buchung_id = cursor.rsplit('|', 1)
+            if sortierung == 'datum':
+                wert = date.fromisoformat(wert)
+            else:
+                wert = Decimal(wert)
+            return wert, int(buchung_id)
+        except (AttributeError, ValueError, InvalidOperation):
+            raise ValueError(f"Ungültiger Cursor: {cursor}")
+
+    def _reihenfolge(self, sortierung, richtung):
+        spalte = SORTIERUNGEN[sortierung]
+        if richtung == 'desc':
+            return [spalte.desc(), Buchung.id.desc()]
+        return [spalte.asc(), Buchung.id.asc()]
+
+    def _hinter_cursor(self, sortierung, richtung, cursor):
+        """WHERE-Bedingung: alle Einträge hinter dem Cursor (Row-Value-Vergleich)"""
+        wert, buchung_id = self.cursor_dekodieren(cursor, sortierung)
+        schluessel = db.tuple_(SORTIERUNGEN[sortierung], Buchung.id)
+        if richtung == 'desc':
+            return schluessel < db.tuple_(wert, buchung_id)
+        return schluessel > db.tuple_(wert, buchung_id)
+
+    def _seite_abschneiden(self, buchungen, seitengroesse, sortierung):
+        """Eine Zeile mehr als nötig wird geladen, um das Ende zu erkennen"""
+        if len(buchungen) > seitengroesse:
+            buchungen = buchungen[:seitengroesse]
+            return buchungen, self.cursor_kodieren(buchungen[-1], sortierung)
+        return buchungen, None
+
+    def _aktive_ausgaben_lieferanten(self):
+        """Filter: Buchung ohne Lieferant oder mit aktivem Ausgaben-Lieferanten (erfordert Join)"""
+        return db.or_(
+            Buchung.lieferant_id.is_(None),
+            db.and_(Lieferant.typ == 'Ausgabe', Lieferant.aktiv == True)
+        )
+
+    # ---------- Seiten ----------
+
+    def get_seite(self, typ, jahr, cursor=None, sortierung='datum', richtung='desc',
+                  lieferant_id=ALLE_LIEFERANTEN, seitengroesse=None):
+        """Eine Seite Buchungen eines Typs und Jahres
+
+        Args:
+            cursor: Cursor der Vorseite (None = erste Seite)
+            lieferant_id: nur Buchungen dieses Lieferanten (None = ohne Lieferant)
+
+        Returns:
+            (buchungen, naechster_cursor) - naechster_cursor ist None auf der letzten Seite
+        """
+        seitengroesse = seitengroesse or self.seitengroesse
+        sortierung, richtung = self.sortierung_pruefen(sortierung, richtung)
+
+        stmt = db.select(*BUCHUNG_SPALTEN).where(
+            Buchung.typ == typ,
+            Buchung.jahr == jahr
+        )
+        if lieferant_id is not ALLE_LIEFERANTEN:
+            stmt = stmt.where(Buchung.lieferant_id == lieferant_id)  # None wird zu IS NULL
+        if cursor:
+            stmt = stmt.where(self._hinter_cursor(sortierung, richtung, cursor))
+
+        stmt = stmt.order_by(*self._reihenfolge(sortierung, richtung)).limit(seitengroesse + 1)
+        return self._seite_abschneiden(buchung_zeilen(stmt), seitengroesse, sortierung)
+
+    def get_ausgaben_nach_lieferant(self, jahr, sortierung='datum', richtung='desc', seitengroesse=None):
+        """Erste Seite der Ausgaben eines Jahres je Lieferant
+
+        Eine Abfrage lädt je Lieferant die ersten Einträge (ROW_NUMBER() über
+        lieferant_id) samt Lieferantenname und wird in einem Durchlauf gruppiert;
+        Gesamtbeträge und Anzahl kommen exakt aus dem Monats-Rollup. Berücksichtigt
+        werden aktive Ausgaben-Lieferanten sowie Buchungen ohne Lieferant
+        (Schlüssel None, immer zuletzt).
+
+        Returns:
+            dict mit ausgaben_dict {LieferantZeile|None: [BuchungZeile]}, ausgaben_summens
+            {LieferantZeile|None: Decimal}, ausgaben_anzahl {LieferantZeile|None: int} und
+            naechste_cursor {LieferantZeile|None: str|None}
+        """
+        seitengroesse = seitengroesse or self.seitengroesse
+        sortierung, richtung = self.sortierung_pruefen(sortierung, richtung)
+
+        rang = db.func.row_number().over(
+            partition_by=Buchung.lieferant_id,
+            order_by=self._reihenfolge(sortierung, richtung)
+        ).label('rang')
+        erste_seiten = db.select(
+            Buchung.id.label('id'),
+            rang
+        ).outerjoin(
+            Lieferant, Buchung.lieferant_id == Lieferant.id
+        ).where(
+            Buchung.typ == 'Ausgabe',
+            Buchung.jahr == jahr,
+            self._aktive_ausgaben_lieferanten()
+        ).subquery()
+
+        stmt = db.select(
+            *BUCHUNG_SPALTEN,
+            Lieferant.name
+        ).join(
+            erste_seiten, Buchung.id == erste_seiten.c.id
+        ).outerjoin(
+            Lieferant, Buchung.lieferant_id == Lieferant.id
+        ).where(
+            erste_seiten.c.rang <= seitengroesse + 1
+        ).order_by(
+            Buchung.lieferant_id.is_(None),
+            Lieferant.name,
+            Lieferant.id,
+            erste_seiten.c.rang
+        )
+
+        lieferanten_summen = MonatssummenService().get_lieferanten_summen(jahr, 'Ausgabe')
+
+        ausgaben_dict = {}
+        lieferanten = {None: None}
+        for zeile in db.session.execute(stmt):
+            buchung = BuchungZeile._make(zeile[:-1])
+            lieferant = lieferanten.get(buchung.lieferant_id)
+            if lieferant is None and buchung.lieferant_id is not None:
+                lieferant = lieferanten[buchung.lieferant_id] = LieferantZeile(buchung.lieferant_id, zeile[-1])
+            ausgaben_dict.setdefault(lieferant, []).append(buchung)
+
+        ausgaben_summens = {}
+        ausgaben_anzahl = {}
+        naechste_cursor = {}
+        for lieferant, gruppe in ausgaben_dict.items():
+            lieferant_id = lieferant.id if lieferant else None
+            ausgaben_dict[lieferant], naechste_cursor[lieferant] = self._seite_abschneiden(
+                gruppe, seitengroesse, sortierung
+            )
+            summe, anzahl = lieferanten_summen.get(lieferant_id, (Decimal('0.00'), len(gruppe)))
+            ausgaben_summens[lieferant] = summe
+            ausgaben_anzahl[lieferant] = anzahl
+
+        return {
+            'ausgaben_dict': ausgaben_dict,
+            'ausgaben_summens': ausgaben_summens,
+            'ausgaben_anzahl': ausgaben_anzahl,
+            'naechste_cursor': naechste_cursor
+        }
@@ -0,0 +1,37 @@
+from decimal import Decimal
+from services.monatssummen_service import MonatssummenService
+
+
+class DashboardService:
+    """Kennzahlen für das Dashboard"""
+
+    def __init__(self):
+        self.monatssummen_service = MonatssummenService()
+
+    def get_jahresuebersicht(self, jahr):
+        """Einnahmen/Ausgaben pro Monat, Jahressummen und Gewinn für ein Jahr
+
+        Liest aus dem Monats-Rollup (BuchungMonatsSumme): eine gruppierte Abfrage
+        mit höchstens 24 Zeilen, es werden keine Buchung-Objekte geladen.
+        """
+        monats_einnahmen = {}
+        monats_ausgaben = {}
+
+        for (typ, monat), betrag in self.monatssummen_service.get_monatssummen(jahr).items():
+            # Schlüssel wie im Template erwartet: '01' bis '12'
+            monat_str = '%02d' % int(monat)
+            if typ == 'Einnahme':
+                monats_einnahmen[monat_str] = monats_einnahmen.get(monat_str, Decimal('0.00')) + betrag
+            else:
+                monats_ausgaben[monat_str] = monats_ausgaben.get(monat_str, Decimal('0.00')) + betrag
+
+        einnahmen = sum(monats_einnahmen.values(), Decimal('0.00'))
+        ausgaben = sum(monats_ausgaben.values(), Decimal('0.00'))
+
+        return {
+            'einnahmen': einnahmen,
+            'ausgaben': ausgaben,
+            'gewinn': einnahmen - ausgaben,
+            'monats_einnahmen': monats_einnahmen,
+            'monats_ausgaben': monats_ausgaben
+        }
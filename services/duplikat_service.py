@@ -0,0 +1,83 @@
+import hashlib
+from models import db, Buchung, Lieferant, rechnungs_fingerprint
+from services.listen_service import BUCHUNG_SPALTEN, BuchungZeile
+
+
+def datei_hash(pfad):
+    """SHA-256 einer Datei (blockweise gelesen)"""
+    sha = hashlib.sha256()
+    with open(pfad, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class DuplikatService:
+    """Erkennung doppelt erfasster Rechnungen
+
+    Eine Rechnung gilt als doppelt, wenn Fingerprint (Typ, Lieferant,
+    normalisierte Rechnungsnummer, Betrag in Cent) oder PDF-Inhalt bereits
+    vorhanden sind. Beide Spalten sind indiziert, die Prüfung beim Anlegen
+    ist damit ein einzelner Index-Lookup.
+    """
+
+    def finden(self, typ, lieferant_id, rechnungsnummer, betrag, pdf_hash=None):
+        """Bereits erfasste Buchung zur selben Rechnung oder None"""
+        bedingungen = []
+        fingerprint = rechnungs_fingerprint(typ, lieferant_id, rechnungsnummer, betrag)
+        if fingerprint:
+            bedingungen.append(Buchung.fingerprint == fingerprint)
+        if pdf_hash:
+            bedingungen.append(Buchung.pdf_hash == pdf_hash)
+        if not bedingungen:
+            return None
+        return Buchung.query.filter(db.or_(*bedingungen)).first()
+
+    def beschreiben(self, buchung):
+        """Kurzbeschreibung für Meldungen"""
+        return (f"{buchung.typ} vom {buchung.datum.strftime('%d.%m.%Y')}, "
+                f"{buchung.betrag:.2f} €, Rechnungsnummer {buchung.rechnungsnummer or '-'}")
+
+    def bericht(self):
+        """Vorhandene Duplikate als Gruppen [{'art', 'buchungen': [BuchungZeile]}]
+
+        Die doppelten Schlüssel liefert eine gruppierte Abfrage (UNION ALL über
+        Fingerprint und PDF-Hash), die zugehörigen Buchungen eine zweite.
+        """
+        gruppen_fingerprint = db.select(
+            db.literal('Rechnung').label('art'),
+            Buchung.fingerprint.label('schluessel')
+        ).where(
+            Buchung.fingerprint.isnot(None)
+        ).group_by(Buchung.fingerprint).having(db.func.count() > 1)
+        gruppen_pdf = db.select(
+            db.literal('PDF').label('art'),
+            Buchung.pdf_hash.label('schluessel')
+        ).where(
+            Buchung.pdf_hash.isnot(None)
+        ).group_by(Buchung.pdf_hash).having(db.func.count() > 1)
+
+        schluessel = db.session.execute(db.union_all(gruppen_fingerprint, gruppen_pdf)).all()
+        if not schluessel:
+            return []
+
+        fingerprints = [s for art, s in schluessel if art == 'Rechnung']
+        pdf_hashes = [s for art, s in schluessel if art == 'PDF']
+        stmt = db.select(
+            *BUCHUNG_SPALTEN, Lieferant.name, Buchung.fingerprint, Buchung.pdf_hash
+        ).outerjoin(
+            Lieferant, Buchung.lieferant_id == Lieferant.id
+        ).where(
+            db.or_(Buchung.fingerprint.in_(fingerprints), Buchung.pdf_hash.in_(pdf_hashes))
+        ).order_by(Buchung.datum, Buchung.id)
+
+        gruppen = {(art, s): {'art': art, 'lieferant': None, 'buchungen': []} for art, s in schluessel}
+        for zeile in db.session.execute(stmt):
+            buchung = BuchungZeile._make(zeile[:len(BUCHUNG_SPALTEN)])
+            lieferant_name, fingerprint, pdf_hash = zeile[len(BUCHUNG_SPALTEN):]
+            for schluessel_art, wert in (('Rechnung', fingerprint), ('PDF', pdf_hash)):
+                gruppe = gruppen.get((schluessel_art, wert))
+                if gruppe is not None:
+                    gruppe['lieferant'] = lieferant_name
+                    gruppe['buchungen'].append(buchung)
+        return list(gruppen.values())
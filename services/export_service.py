@@ -0,0 +1,135 @@
+import codecs
+import csv
+import io
+import os
+from models import db, Buchung, Lieferant
+
+# Unterstützte Exportformate: (Trennzeichen, Zeichensatz, Dateiendung)
+EXPORT_FORMATE = {
+    'csv': (';', 'utf-8-sig', 'csv'),
+    'datev': (';', 'cp1252', 'csv'),
+}
+
+CSV_KOPF = ['Typ', 'Lieferant', 'Betrag', 'Datum', 'Rechnungsnummer', 'Titel', 'Überwiesen am', 'PDF']
+
+# DATEV-Export als einfache CSV-Datei mit Spalten und Bezeichnungen des Buchungsstapels (Auszug). Ohne
+# EXTF-Vorlaufsatz ist sie kein DATEV-Buchungsstapel, sondern für den ASCII-Import von DATEV Rechnungswesen
+# (Spaltenzuordnung beim Import) gedacht; das Belegdatum steht daher mit Jahr (TT.MM.JJJJ) in der Datei.
+DATEV_KOPF = ['Umsatz (ohne Soll/Haben-Kz)', 'Soll/Haben-Kennzeichen', 'WKZ Umsatz', 'Konto',
+              'Gegenkonto (ohne BU-Schlüssel)', 'Belegdatum', 'Belegfeld 1', 'Buchungstext']
+
+
+def _betrag_de(betrag):
+    """Decimal mit Dezimalkomma (1234,56)"""
+    return f"{betrag:.2f}".replace('.', ',')
+
+
+class ExportService:
+    """Jahresexport aller Buchungen als CSV oder DATEV-CSV (ASCII-Import)
+
+    Die Buchungen werden mit yield_per/stream_results (serverseitiger Cursor
+    bzw. schrittweises Fetchen) gelesen und als Generator in Blöcken
+    ausgegeben; die komplette Datei liegt nie im Speicher.
+    """
+
+    def __init__(self, batch_groesse=1000, block_groesse=64 * 1024,
+                 bankkonto='1200', erloeskonto='8400', aufwandskonto='3400'):
+        self.batch_groesse = batch_groesse
+        self.block_groesse = block_groesse
+        self.bankkonto = bankkonto
+        self.erloeskonto = erloeskonto
+        self.aufwandskonto = aufwandskonto
+
+    def dateiname(self, jahr, exportformat='csv'):
+        """Dateiname für den Download (ohne 'EXTF_', die Datei hat keinen EXTF-Vorlaufsatz)"""
+        endung = EXPORT_FORMATE[exportformat][2]
+        praefix = 'DATEV_Buchungen' if exportformat == 'datev' else 'buchungen'
+        return f"{praefix}_{jahr}.{endung}"
+
+    def buchungen(self, jahr):
+        """Alle Buchungen eines Jahres (nach Datum), gestreamt in Batches"""
+        stmt = db.select(
+            Buchung.typ,
+            Lieferant.name,
+            Buchung.betrag,
+            Buchung.datum,
+            Buchung.rechnungsnummer,
+            Buchung.titel,
+            Buchung.ueberwiesen_am,
+            Buchung.pdf_pfad
+        ).outerjoin(
+            Lieferant, Buchung.lieferant_id == Lieferant.id
+        ).where(
+            Buchung.jahr == jahr
+        ).order_by(
+            Buchung.datum, Buchung.id
+        ).execution_options(yield_per=self.batch_groesse)
+
+        ergebnis = db.session.execute(stmt)
+        try:
+            for zeile in ergebnis:
+                yield zeile
+        finally:
+            ergebnis.close()
+
+    def _csv_zeile(self, zeile):
+        typ, lieferant, betrag, datum, rechnungsnummer, titel, ueberwiesen_am, pdf_pfad = zeile
+        return [
+            typ,
+            lieferant or '',
+            _betrag_de(betrag),
+            datum.strftime('%d.%m.%Y'),
+            rechnungsnummer or '',
+            titel or '',
+            ueberwiesen_am.strftime('%d.%m.%Y') if ueberwiesen_am else '',
+            os.path.basename(pdf_pfad) if pdf_pfad else ''
+        ]
+
+    def _datev_zeile(self, zeile):
+        typ, lieferant, betrag, datum, rechnungsnummer, titel, _, _ = zeile
+        # Aus Sicht des Bankkontos: Einnahme im Soll, Ausgabe im Haben
+        einnahme = typ == 'Einnahme'
+        buchungstext = titel or lieferant or ''
+        return [
+            _betrag_de(abs(betrag)),
+            'S' if einnahme else 'H',
+            'EUR',
+            self.bankkonto,
+            self.erloeskonto if einnahme else self.aufwandskonto,
+            datum.strftime('%d.%m.%Y'),
+            (rechnungsnummer or '')[:36],
+            buchungstext[:60]
+        ]
+
+    def exportieren(self, jahr, exportformat='csv'):
+        """Export als Generator von Byte-Blöcken (für Streaming-Response und CLI)
+
+        Raises:
+            ValueError: bei unbekanntem Format
+        """
+        if exportformat not in EXPORT_FORMATE:
+            raise ValueError(f"Unbekanntes Exportformat: {exportformat}")
+        trennzeichen, zeichensatz, _ = EXPORT_FORMATE[exportformat]
+        kopf, umwandeln = (DATEV_KOPF, self._datev_zeile) if exportformat == 'datev' else (CSV_KOPF, self._csv_zeile)
+
+        # Inkrementeller Encoder: das BOM von utf-8-sig nur einmal am Anfang
+        encoder = codecs.getincrementalencoder(zeichensatz)(errors='replace')
+        puffer = io.StringIO()
+        writer = csv.writer(puffer, delimiter=trennzeichen, lineterminator='\r\n')
+        writer.writerow(kopf)
+
+        # Kopfzeile sofort senden, danach in Blöcken von block_groesse
+        yield encoder.encode(puffer.getvalue())
+        puffer.seek(0)
+        puffer.truncate()
+
+        for zeile in self.buchungen(jahr):
+            writer.writerow(umwandeln(zeile))
+            if puffer.tell() >= self.block_groesse:
+                yield encoder.encode(puffer.getvalue())
+                puffer.seek(0)
+                puffer.truncate()
+
+        rest = puffer.getvalue()
+        if rest:
+            yield encoder.encode(rest)
@@ -0,0 +1,520 @@
+"""
+Lokaler Ersatz für den Gmail-API-Client
+
+FakeGmailService bildet die vom GmailService genutzten Aufrufe des
+googleapiclient-Clients (users().labels/messages/attachments/history,
+getProfile, Batch-Requests, fields-Masken) über einem Postfach im Speicher
+nach. Damit lassen sich Synchronisation, Checkpoints und die Anzahl der
+API-Aufrufe ohne Zugang zu Gmail prüfen:
+
+    fake = FakeGmailService()
+    fake.nachricht_hinzufuegen('Rechnungen/DPD', [('rechnung.pdf', rechnung_pdf('...'))])
+    GmailService(service=fake).sync_rechnungen()
+    print(fake.aufrufe, fake.antwort_bytes)
+
+Echte Antworten lassen sich mit scripts/gmail_aufzeichnen.py aufzeichnen
+und mit FakeGmailService.aufzeichnung_laden() offline abspielen.
+"""
+
+import base64
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from services.gmail_quota import QUOTA_EINHEITEN
+
+
+# historyTypes der API -> Schlüssel im History-Eintrag
+HISTORY_TYPEN = {
+    'messageAdded': 'messagesAdded',
+    'messageDeleted': 'messagesDeleted',
+    'labelAdded': 'labelsAdded',
+    'labelRemoved': 'labelsRemoved',
+}
+
+
+def _alle_teile(payload):
+    """Alle MIME-Teile unterhalb von payload, auch verschachtelte"""
+    stapel = list(payload.get('parts', []))
+    while stapel:
+        teil = stapel.pop()
+        yield teil
+        stapel.extend(teil.get('parts', []))
+
+
+def _passt_zur_suche(nachricht, q):
+    """Teilmenge der Gmail-Suchsyntax: has:attachment, filename:<endung>, after:/before: (JJJJ/MM/TT)"""
+    parts = list(_alle_teile(nachricht['payload']))
+    for ausdruck in (q or '').split():
+        schluessel, _, wert = ausdruck.partition(':')
+        if schluessel == 'has' and wert == 'attachment':
+            if not any(part['body'].get('attachmentId') for part in parts):
+                return False
+        elif schluessel == 'filename':
+            if not any(part.get('filename', '').lower().endswith(wert.lower()) for part in parts):
+                return False
+        elif schluessel in ('after', 'before'):
+            grenze = datetime.strptime(wert, '%Y/%m/%d').timestamp() * 1000
+            zeitpunkt = int(nachricht['internalDate'])
+            if (schluessel == 'after' and zeitpunkt < grenze) or (schluessel == 'before' and zeitpunkt >= grenze):
+                return False
+    return True
+
+
+def _maske_parsen(fields):
+    """fields-Ausdruck der Partial Response ('id,payload(parts(filename,body/attachmentId))')
+    als Baum {Feld: Unterbaum oder None für alles}"""
+    pos = 0
+
+    def name():
+        nonlocal pos
+        start = pos
+        while pos < len(fields) and fields[pos] not in ',()/':
+            pos += 1
+        return fields[start:pos].strip()
+
+    def element():
+        nonlocal pos
+        feld = name()
+        if pos < len(fields) and fields[pos] == '/':
+            pos += 1
+            kind, unterbaum = element()
+            return feld, {kind: unterbaum}
+        if pos < len(fields) and fields[pos] == '(':
+            pos += 1
+            unterbaum = liste()
+            pos += 1  # ')'
+            return feld, unterbaum
+        return feld, None
+
+    def liste():
+        nonlocal pos
+        baum = {}
+        while True:
+            feld, unterbaum = element()
+            baum[feld] = _masken_vereinigen(baum[feld], unterbaum) if feld in baum else unterbaum
+            if pos < len(fields) and fields[pos] == ',':
+                pos += 1
+                continue
+            return baum
+
+    return liste()
+
+
+def _masken_vereinigen(a, b):
+    if a is None or b is None:
+        return None
+    ergebnis = dict(a)
+    for feld, unterbaum in b.items():
+        ergebnis[feld] = _masken_vereinigen(ergebnis[feld], unterbaum) if feld in ergebnis else unterbaum
+    return ergebnis
+
+
+def _maske_anwenden(wert, baum):
+    if baum is None:
+        return wert
+    if isinstance(wert, list):
+        return [_maske_anwenden(eintrag, baum) for eintrag in wert]
+    if isinstance(wert, dict):
+        return {feld: _maske_anwenden(wert[feld], unterbaum) for feld, unterbaum in baum.items() if feld in wert}
+    return wert
+
+
+def _http_fehler(status, meldung):
+    return HttpError(httplib2.Response({'status': str(status)}), meldung.encode('utf-8'))
+
+
+def rechnung_pdf(text):
+    """Minimales einseitiges PDF mit dem Text (Zeilen durch \\n getrennt)"""
+    zeilen = []
+    for zeile in text.split('\n'):
+        zeile = zeile.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+        zeilen.append(f'({zeile}) Tj T*')
+    inhalt = ('BT /F1 11 Tf 14 TL 50 780 Td ' + ' '.join(zeilen) + ' ET').encode('cp1252')
+
+    objekte = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+        b'/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Length ' + str(len(inhalt)).encode() + b' >>\nstream\n' + inhalt + b'\nendstream',
+    ]
+    pdf = b'%PDF-1.4\n'
+    positionen = []
+    for nummer, objekt in enumerate(objekte, start=1):
+        positionen.append(len(pdf))
+        pdf += f'{nummer} 0 obj\n'.encode() + objekt + b'\nendobj\n'
+    xref = len(pdf)
+    pdf += f'xref\n0 {len(objekte) + 1}\n0000000000 65535 f \n'.encode()
+    for position in positionen:
+        pdf += f'{position:010d} 00000 n \n'.encode()
+    pdf += f'trailer\n<< /Size {len(objekte) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    return pdf
+
+
+class SimulierteUhr:
+    """Uhr für Tests ohne echtes Warten: schlafen() stellt nur die Zeit vor
+
+    Für QuotaLimiter(uhr=uhr.jetzt, schlafen=uhr.schlafen) und FakeGmailService.uhr.
+    """
+
+    def __init__(self, start=0.0):
+        self.zeit = start
+        self._lock = threading.Lock()
+
+    def jetzt(self):
+        return self.zeit
+
+    def schlafen(self, sekunden):
+        with self._lock:
+            self.zeit += sekunden
+
+
+class _Anfrage:
+    """Entspricht HttpRequest: die Antwort entsteht erst bei execute()"""
+
+    def __init__(self, fake, methode, funktion):
+        self.fake = fake
+        self.methode = methode
+        self.funktion = funktion
+        # wie HttpRequest.methodId, z.B. 'gmail.users.messages.attachments.get'
+        self.methodId = 'gmail.users.' + ('messages.' if methode == 'attachments.get' else '') + methode
+
+    def execute(self, num_retries=0):
+        self.fake.zaehlen(self.methode)
+        return self.fake.antworten(self.funktion())
+
+
+class _Batch:
+    """Entspricht BatchHttpRequest: mehrere Anfragen in einem HTTP-Aufruf"""
+
+    def __init__(self, fake, callback=None):
+        self.fake = fake
+        self.callback = callback
+        self.anfragen = []
+
+    def add(self, request, callback=None, request_id=None):
+        request_id = request_id or str(len(self.anfragen) + 1)
+        self.anfragen.append((request_id, request, callback or self.callback))
+
+    def execute(self):
+        if len(self.anfragen) > 100:
+            raise ValueError('Gmail erlaubt höchstens 100 Anfragen je Batch')
+        self.fake.zaehlen('batch')
+        for request_id, anfrage, callback in self.anfragen:
+            try:
+                self.fake.zaehlen(anfrage.methode, latenz=False)
+                antwort, fehler = self.fake.antworten(anfrage.funktion()), None
+            except HttpError as e:
+                antwort, fehler = None, e
+            if callback:
+                callback(request_id, antwort, fehler)
+
+
+class _Ressource:
+    def __init__(self, fake):
+        self.fake = fake
+
+
+class _Labels(_Ressource):
+    def list(self, userId):
+        return _Anfrage(self.fake, 'labels.list', lambda: {
+            'labels': [{'id': label_id, 'name': name, 'type': 'user'}
+                       for label_id, name in self.fake.labels.items()]
+        })
+
+
+class _Attachments(_Ressource):
+    def get(self, userId, messageId, id):
+        def antwort():
+            daten = self.fake.anhaenge.get((messageId, id))
+            if daten is None:
+                raise _http_fehler(404, 'Requested entity was not found.')
+            return {'size': len(daten), 'data': base64.urlsafe_b64encode(daten).decode('ascii')}
+        return _Anfrage(self.fake, 'attachments.get', antwort)
+
+
+class _Messages(_Ressource):
+    def list(self, userId, labelIds=None, q=None, maxResults=100, pageToken=None):
+        def antwort():
+            treffer = [
+                nachricht for nachricht in self.fake.nachrichten_neueste_zuerst()
+                if (not labelIds or set(labelIds) <= set(nachricht['labelIds']))
+                and _passt_zur_suche(nachricht, q)
+            ]
+            start = int(pageToken or 0)
+            seite = treffer[start:start + maxResults]
+            ergebnis = {'resultSizeEstimate': len(treffer)}
+            if seite:
+                ergebnis['messages'] = [{'id': n['id'], 'threadId': n['threadId']} for n in seite]
+            if start + maxResults < len(treffer):
+                ergebnis['nextPageToken'] = str(start + maxResults)
+            return ergebnis
+        return _Anfrage(self.fake, 'messages.list', antwort)
+
+    def get(self, userId, id, format='full', fields=None):
+        def antwort():
+            nachricht = self.fake.nachrichten.get(id)
+            if nachricht is None:
+                raise _http_fehler(404, 'Requested entity was not found.')
+            return _maske_anwenden(nachricht, _maske_parsen(fields) if fields else None)
+        return _Anfrage(self.fake, 'messages.get', antwort)
+
+    def attachments(self):
+        return _Attachments(self.fake)
+
+
+class _History(_Ressource):
+    def list(self, userId, startHistoryId, labelId=None, historyTypes=None, maxResults=100, pageToken=None):
+        def antwort():
+            if int(startHistoryId) < self.fake.aelteste_history_id:
+                raise _http_fehler(404, 'Requested entity was not found.')
+            eintraege = []
+            for eintrag in self.fake.history:
+                if int(eintrag['id']) <= int(startHistoryId):
+                    continue
+                if historyTypes and not any(HISTORY_TYPEN[typ] in eintrag for typ in historyTypes):
+                    continue
+                if labelId and labelId not in eintrag['labelIds']:
+                    continue
+                eintraege.append({k: v for k, v in eintrag.items() if k != 'labelIds'})
+            start = int(pageToken or 0)
+            ergebnis = {'historyId': str(self.fake.history_id)}
+            if eintraege[start:start + maxResults]:
+                ergebnis['history'] = eintraege[start:start + maxResults]
+            if start + maxResults < len(eintraege):
+                ergebnis['nextPageToken'] = str(start + maxResults)
+            return ergebnis
+        return _Anfrage(self.fake, 'history.list', antwort)
+
+
+class _Users(_Ressource):
+    def labels(self):
+        return _Labels(self.fake)
+
+    def messages(self):
+        return _Messages(self.fake)
+
+    def history(self):
+        return _History(self.fake)
+
+    def getProfile(self, userId):
+        return _Anfrage(self.fake, 'getProfile', lambda: {
+            'emailAddress': 'rechnungen@example.com',
+            'messagesTotal': len(self.fake.nachrichten),
+            'historyId': str(self.fake.history_id)
+        })
+
+
+class FakeGmailService:
+    """Gmail-Postfach im Speicher mit der Schnittstelle des API-Clients
+
+    aufrufe zählt die ausgeführten Anfragen je Methode ('messages.list', ...),
+    latenz simuliert die Antwortzeit je HTTP-Aufruf in Sekunden. Mit
+    quota_pro_sekunde antwortet das Postfach wie Gmail mit 429, sobald in
+    einer Sekunde mehr Quota-Einheiten verbraucht werden; uhr (SimulierteUhr)
+    ersetzt dabei und für die Latenz die echte Zeit.
+    """
+
+    def __init__(self):
+        self.labels = {}            # label_id -> Name
+        self.nachrichten = {}       # message_id -> Nachricht im Format 'full'
+        self.anhaenge = {}          # (message_id, attachment_id) -> bytes
+        self.history = []           # History-Einträge aufsteigend nach id
+        self.history_id = 1000
+        self.aelteste_history_id = 1000
+        self.aufrufe = Counter()
+        self.antwort_bytes = 0      # Umfang aller Antworten als JSON
+        self.latenz = 0.0
+        self.quota_pro_sekunde = None
+        self.uhr = None
+        self.rate_limits = 0        # ausgelöste 429-Antworten
+        self._quota_fenster = (None, 0)  # (Sekunde, verbrauchte Einheiten)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def users(self):
+        return _Users(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self, callback)
+
+    def zaehlen(self, methode, latenz=True):
+        with self._lock:
+            self.aufrufe[methode] += 1
+            if self.quota_pro_sekunde and methode in QUOTA_EINHEITEN:
+                sekunde = int(self.uhr.jetzt() if self.uhr else time.monotonic())
+                fenster, verbraucht = self._quota_fenster
+                if fenster != sekunde:
+                    verbraucht = 0
+                verbraucht += QUOTA_EINHEITEN[methode]
+                self._quota_fenster = (sekunde, verbraucht)
+                if verbraucht > self.quota_pro_sekunde:
+                    self.rate_limits += 1
+                    raise _http_fehler(429, 'Too many concurrent requests for user (rateLimitExceeded)')
+        if latenz and self.latenz:
+            (self.uhr.schlafen if self.uhr else time.sleep)(self.latenz)
+
+    def antworten(self, antwort):
+        groesse = len(json.dumps(antwort))
+        with self._lock:
+            self.antwort_bytes += groesse
+        return antwort
+
+    def nachrichten_neueste_zuerst(self):
+        return sorted(self.nachrichten.values(), key=lambda n: (int(n['internalDate']), n['id']), reverse=True)
+
+    # ---------- Postfach füllen ----------
+
+    def label_id(self, name):
+        """ID des Labels, bei Bedarf angelegt"""
+        for label_id, label_name in self.labels.items():
+            if label_name == name:
+                return label_id
+        label_id = f'Label_{len(self.labels) + 1}'
+        self.labels[label_id] = name
+        return label_id
+
+    def nachricht_hinzufuegen(self, label, anhaenge=(), betreff='Rechnung', zeitpunkt=None, weitergeleitet=()):
+        """Nachricht mit Anhängen [(Dateiname, bytes)] unter dem Label ablegen
+
+        Args:
+            weitergeleitet: weitere Anhänge, die in einer angehängten E-Mail
+                (message/rfc822) liegen
+
+        Returns:
+            message_id
+        """
+        message_id = f'{next(self._ids):016x}'
+        label_ids = ['INBOX', self.label_id(label)]
+        parts = [{
+            'partId': '0',
+            'mimeType': 'text/plain',
+            'filename': '',
+            'body': {'size': len(betreff), 'data': base64.urlsafe_b64encode(betreff.encode()).decode()}
+        }]
+        for nummer, (dateiname, daten) in enumerate(anhaenge, start=1):
+            attachment_id = f'att_{message_id}_{nummer}'
+            self.anhaenge[(message_id, attachment_id)] = daten
+            parts.append({
+                'partId': str(nummer),
+                'mimeType': 'application/pdf' if dateiname.lower().endswith('.pdf') else 'application/octet-stream',
+                'filename': dateiname,
+                'body': {'attachmentId': attachment_id, 'size': len(daten)}
+            })
+        if weitergeleitet:
+            innere = []
+            for nummer, (dateiname, daten) in enumerate(weitergeleitet, start=1):
+                attachment_id = f'att_{message_id}_w{nummer}'
+                self.anhaenge[(message_id, attachment_id)] = daten
+                innere.append({
+                    'partId': f'{len(parts)}.0.{nummer}',
+                    'mimeType': 'application/pdf' if dateiname.lower().endswith('.pdf') else 'application/octet-stream',
+                    'filename': dateiname,
+                    'body': {'attachmentId': attachment_id, 'size': len(daten)}
+                })
+            parts.append({
+                'partId': str(len(parts)),
+                'mimeType': 'message/rfc822',
+                'filename': '',
+                'body': {'size': 0},
+                'parts': [{'partId': f'{len(parts)}.0', 'mimeType': 'multipart/mixed', 'filename': '',
+                           'body': {'size': 0}, 'parts': innere}]
+            })
+
+        self.history_id += 1
+        zeitpunkt = zeitpunkt or time.time()
+        self.nachrichten[message_id] = {
+            'id': message_id,
+            'threadId': message_id,
+            'labelIds': label_ids,
+            'historyId': str(self.history_id),
+            'internalDate': str(int(zeitpunkt * 1000)),
+            'snippet': betreff,
+            'payload': {
+                'mimeType': 'multipart/mixed',
+                'filename': '',
+                'headers': [{'name': 'Subject', 'value': betreff}],
+                'parts': parts
+            }
+        }
+        self.history.append({
+            'id': str(self.history_id),
+            'labelIds': label_ids,
+            'messages': [{'id': message_id, 'threadId': message_id}],
+            'messagesAdded': [{'message': {'id': message_id, 'threadId': message_id, 'labelIds': label_ids}}]
+        })
+        return message_id
+
+    def label_setzen(self, message_id, label):
+        """Label nachträglich an eine Nachricht hängen (History-Eintrag labelsAdded)"""
+        nachricht = self.nachrichten[message_id]
+        label_id = self.label_id(label)
+        if label_id not in nachricht['labelIds']:
+            nachricht['labelIds'].append(label_id)
+        self.history_id += 1
+        nachricht['historyId'] = str(self.history_id)
+        self.history.append({
+            'id': str(self.history_id),
+            'labelIds': list(nachricht['labelIds']),
+            'messages': [{'id': message_id, 'threadId': nachricht['threadId']}],
+            'labelsAdded': [{
+                'message': {'id': message_id, 'threadId': nachricht['threadId'], 'labelIds': list(nachricht['labelIds'])},
+                'labelIds': [label_id]
+            }]
+        })
+
+    def nachricht_loeschen(self, message_id):
+        """Nachricht endgültig löschen (messages.get -> 404, der History-Eintrag messagesAdded bleibt)"""
+        nachricht = self.nachrichten.pop(message_id)
+        for schluessel in [s for s in self.anhaenge if s[0] == message_id]:
+            del self.anhaenge[schluessel]
+        self.history_id += 1
+        self.history.append({
+            'id': str(self.history_id),
+            'messages': [{'id': message_id, 'threadId': nachricht['threadId']}],
+            'messagesDeleted': [{'message': {'id': message_id, 'threadId': nachricht['threadId']}}]
+        })
+
+    # ---------- Aufzeichnungen ----------
+
+    def aufzeichnung_speichern(self, pfad):
+        """Postfach als JSON speichern (Labels, Nachrichten im Format 'full', Anhänge)"""
+        with open(pfad, 'w', encoding='utf-8') as f:
+            json.dump({
+                'history_id': self.history_id,
+                'labels': self.labels,
+                'nachrichten': list(self.nachrichten.values()),
+                'anhaenge': [
+                    {'message_id': message_id, 'attachment_id': attachment_id,
+                     'data': base64.urlsafe_b64encode(daten).decode('ascii')}
+                    for (message_id, attachment_id), daten in self.anhaenge.items()
+                ]
+            }, f)
+
+    @classmethod
+    def aufzeichnung_laden(cls, pfad):
+        """Gespeichertes bzw. mit scripts/gmail_aufzeichnen.py aufgezeichnetes Postfach laden"""
+        with open(pfad, encoding='utf-8') as f:
+            daten = json.load(f)
+        fake = cls()
+        fake.history_id = fake.aelteste_history_id = int(daten['history_id'])
+        fake.labels = daten['labels']
+        fake.nachrichten = {nachricht['id']: nachricht for nachricht in daten['nachrichten']}
+        fake.anhaenge = {
+            (anhang['message_id'], anhang['attachment_id']): base64.urlsafe_b64decode(anhang['data'])
+            for anhang in daten['anhaenge']
+        }
+        return fake
+
+    def history_verwerfen(self):
+        """Ältere History verwerfen wie Gmail nach ca. einer Woche (startHistoryId -> 404)"""
+        self.aelteste_history_id = self.history_id
+        self.history = []
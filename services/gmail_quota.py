@@ -0,0 +1,194 @@
+"""
+Quota-Begrenzung für Gmail-API-Aufrufe
+
+Gmail berechnet jede Methode mit Quota-Einheiten (z.B. messages.get 5,
+labels.list 1) und begrenzt die Einheiten je Nutzer und Sekunde. Der
+QuotaLimiter bucht die Einheiten vor jedem Aufruf aus einem Token-Bucket ab
+und wartet, wenn er leer ist. Antwortet Gmail trotzdem mit 429 (Rate-Limit),
+halbiert er die Zahl gleichzeitiger Aufrufe, wartet exponentiell und
+wiederholt den Aufruf; nach einer Serie erfolgreicher Aufrufe erhöht er die
+Parallelität wieder schrittweise.
+
+Uhr und Warten sind austauschbar, damit sich das Verhalten mit einer
+simulierten Uhr (services/gmail_fake.py: SimulierteUhr) prüfen lässt.
+"""
+
+import threading
+import time
+from googleapiclient.errors import HttpError
+
+
+# Quota-Einheiten je Methode (https://developers.google.com/gmail/api/reference/quota)
+QUOTA_EINHEITEN = {
+    'getProfile': 1,
+    'labels.list': 1,
+    'history.list': 2,
+    'messages.list': 5,
+    'messages.get': 5,
+    'attachments.get': 5,
+}
+# Unbekannte Methoden vorsichtig bewerten
+QUOTA_STANDARD = 5
+
+# Gmail-Limit: 250 Einheiten je Nutzer und Sekunde
+EINHEITEN_PRO_SEKUNDE = 250
+MAX_VERSUCHE = 5
+MAX_WARTEZEIT = 32  # Sekunden zwischen zwei Versuchen
+# Nach so vielen erfolgreichen Aufrufen in Folge einen Aufruf mehr parallel zulassen
+ERHOLUNG_NACH = 20
+
+
+def methode(anfrage):
+    """Kurzname der API-Methode, z.B. 'gmail.users.messages.get' -> 'messages.get'"""
+    teile = anfrage.methodId.split('.')
+    if teile[-2] == 'users':
+        return teile[-1]
+    return '.'.join(teile[-2:])
+
+
+def quota_einheiten(anfrage):
+    """Quota-Einheiten einer einzelnen Anfrage"""
+    return QUOTA_EINHEITEN.get(methode(anfrage), QUOTA_STANDARD)
+
+
+def ist_rate_limit(fehler):
+    """429 bzw. 403 mit rateLimitExceeded/userRateLimitExceeded"""
+    if not isinstance(fehler, HttpError):
+        return False
+    status = fehler.resp.status
+    return status == 429 or (status == 403 and 'ratelimitexceeded' in str(fehler).lower())
+
+
+class TokenBucket:
+    """Token-Bucket über Quota-Einheiten (thread-sicher)
+
+    Einheiten werden sofort abgebucht, der Bestand darf negativ werden; der
+    Aufrufer wartet die zurückgegebene Zeit. So bleiben wartende Threads in
+    der Reihenfolge ihrer Anfrage.
+    """
+
+    def __init__(self, rate, kapazitaet=None, uhr=time.monotonic):
+        self.rate = rate
+        self.kapazitaet = kapazitaet or rate
+        self.uhr = uhr
+        self.bestand = self.kapazitaet
+        self.stand = uhr()
+        self._lock = threading.Lock()
+
+    def reservieren(self, einheiten):
+        """Einheiten abbuchen; Rückgabe: Sekunden, bis sie verfügbar sind"""
+        with self._lock:
+            jetzt = self.uhr()
+            self.bestand = min(self.kapazitaet, self.bestand + (jetzt - self.stand) * self.rate)
+            self.stand = jetzt
+            self.bestand -= einheiten
+            return max(0.0, -self.bestand / self.rate)
+
+
+class QuotaLimiter:
+    """Token-Bucket und adaptive Parallelität für alle Aufrufe eines GmailService"""
+
+    def __init__(self, einheiten_pro_sekunde=EINHEITEN_PRO_SEKUNDE, max_parallel=5,
+                 uhr=time.monotonic, schlafen=time.sleep, max_versuche=MAX_VERSUCHE):
+        self.bucket = TokenBucket(einheiten_pro_sekunde, uhr=uhr)
+        self.uhr = uhr
+        self.schlafen = schlafen
+        self.max_versuche = max_versuche
+        self.max_parallel = max(1, max_parallel)
+        self.parallel = self.max_parallel  # derzeit erlaubte gleichzeitige Aufrufe
+        self._aktiv = 0
+        self._erfolge = 0
+        self._bedingung = threading.Condition()
+        # Metriken
+        self.aufrufe = 0
+        self.einheiten = 0
+        self.rate_limits = 0
+        self.wiederholungen = 0
+        self.gedrosselt_sekunden = 0.0
+        self.min_parallel = self.parallel
+
+    def ausfuehren(self, anfrage, einheiten=None):
+        """
+        Anfrage (HttpRequest/BatchHttpRequest) gedrosselt ausführen, bei
+        Rate-Limit bis zu max_versuche Mal
+
+        Args:
+            einheiten: Quota-Einheiten, bei Batch-Anfragen die Summe der Teilanfragen
+        """
+        if einheiten is None:
+            einheiten = quota_einheiten(anfrage)
+        for versuch in range(1, self.max_versuche + 1):
+            self._belegen()
+            try:
+                self._warten(self.bucket.reservieren(einheiten))
+                with self._bedingung:
+                    self.aufrufe += 1
+                    self.einheiten += einheiten
+                try:
+                    ergebnis = anfrage.execute()
+                except HttpError as fehler:
+                    if not ist_rate_limit(fehler) or versuch == self.max_versuche:
+                        raise
+                    self.rate_limit()
+                else:
+                    self.erfolg()
+                    return ergebnis
+            finally:
+                self._freigeben()
+            self.zurueckhalten(versuch)
+
+    def rate_limit(self):
+        """429 erhalten: gleichzeitige Aufrufe halbieren"""
+        with self._bedingung:
+            self.rate_limits += 1
+            self._erfolge = 0
+            self.parallel = max(1, self.parallel // 2)
+            self.min_parallel = min(self.min_parallel, self.parallel)
+
+    def erfolg(self):
+        """Erfolgreicher Aufruf: nach ERHOLUNG_NACH in Folge wieder einen mehr zulassen"""
+        with self._bedingung:
+            self._erfolge += 1
+            if self._erfolge >= ERHOLUNG_NACH and self.parallel < self.max_parallel:
+                self.parallel += 1
+                self._erfolge = 0
+                self._bedingung.notify()
+
+    def zurueckhalten(self, versuch):
+        """Exponentiell warten vor dem nächsten Versuch (1, 2, 4, ... Sekunden)"""
+        with self._bedingung:
+            self.wiederholungen += 1
+        self._warten(min(MAX_WARTEZEIT, 2 ** (versuch - 1)))
+
+    def _warten(self, sekunden):
+        if sekunden <= 0:
+            return
+        with self._bedingung:
+            self.gedrosselt_sekunden += sekunden
+        self.schlafen(sekunden)
+
+    def _belegen(self):
+        with self._bedingung:
+            start = self.uhr()
+            while self._aktiv >= self.parallel:
+                self._bedingung.wait()
+            self._aktiv += 1
+            self.gedrosselt_sekunden += self.uhr() - start
+
+    def _freigeben(self):
+        with self._bedingung:
+            self._aktiv -= 1
+            self._bedingung.notify()
+
+    def metriken(self):
+        """Kennzahlen für Log und Auswertung"""
+        with self._bedingung:
+            return {
+                'aufrufe': self.aufrufe,
+                'einheiten': self.einheiten,
+                'rate_limits': self.rate_limits,
+                'wiederholungen': self.wiederholungen,
+                'gedrosselt_sekunden': round(self.gedrosselt_sekunden, 3),
+                'parallel': self.parallel,
+                'min_parallel': self.min_parallel,
+            }
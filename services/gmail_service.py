@@ -1,5 +1,15 @@
 import os
+import json
+import time
 import base64
+import multiprocessing
+import signal
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from itertools import islice
 import email
 from email.mime.text import MIMEText
 from google.auth.transport.requests import Request
@@ -7,26 +17,202 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from flask import current_app
-from models import db, Buchung, Lieferant
-from datetime import datetime
+from googleapiclient.http import HttpRequest
+import google_auth_httplib2
+import httplib2
+from flask import current_app, has_app_context
+from models import db, Buchung, Lieferant, GmailCheckpoint, GmailDuplikat, SyncLauf
+from datetime import datetime, date, timedelta
 from decimal import Decimal
 from services.pdf_service import PDFService
+from services.duplikat_service import DuplikatService
+from services.gmail_quota import QuotaLimiter, QUOTA_EINHEITEN, ist_rate_limit
+from services.pdf_ablage import PDFAblage
+from services.sync_messung import SyncMessung
 
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
+# Ergebnis je E-Mail beim Import
+IMPORTIERT = 'importiert'
+UEBERSPRUNGEN = 'uebersprungen'
+FEHLER = 'fehler'
+
+# Details einer endgültig gelöschten E-Mail (404); History-Einträge messagesAdded bleiben nach dem Löschen bestehen
+NICHT_GEFUNDEN = 'nicht_gefunden'
+
+# Zwischen-Commits beim Sync (Backfill über tausende E-Mails)
+COMMIT_INTERVALL = 100
+
+# Gmail-Suchausdruck: E-Mails ohne PDF-Anhang gar nicht erst auflisten
+SUCHE_RECHNUNGEN = 'has:attachment filename:pdf'
+
+# Bereits importierte E-Mails blockweise per IN-Abfrage prüfen
+# (<= 999 wegen der Parametergrenze älterer SQLite-Versionen)
+PRUEF_BLOCKGROESSE = 500
+
+# Nachrichtendetails per HTTP-Batch (Gmail erlaubt höchstens 100 Anfragen je Batch)
+DETAIL_BATCHGROESSE = 100
+
+
+# Stufen der Import-Pipeline: Downloads (Threads), PDF-Analyse (Prozesse), Zielverzeichnis
+Pipeline = namedtuple('Pipeline', ['downloads', 'analysen', 'upload_folder'])
+
+
+def _teile_maske(tiefe):
+    """fields-Maske für den MIME-Baum bis zur angegebenen Verschachtelungstiefe"""
+    felder = 'partId,mimeType,filename,body/attachmentId'
+    if tiefe > 0:
+        felder += f',parts({_teile_maske(tiefe - 1)})'
+    return felder
+
+
+# Verschachtelungstiefe der abgerufenen MIME-Teile (weitergeleitete E-Mails liegen
+# als message/rfc822 mit eigenem multipart-Baum im Anhang)
+MIME_TIEFE = 8
+# Nur was für die Suche nach PDF-Anhängen nötig ist (statt Header, Text und Inline-Daten)
+DETAIL_FELDER = f'id,payload({_teile_maske(MIME_TIEFE)})'
+
+
+def _mime_teile(payload):
+    """Alle Teile eines MIME-Baums in Dokumentreihenfolge (iterativ, ohne Rekursion)"""
+    stapel = [payload]
+    while stapel:
+        teil = stapel.pop()
+        yield teil
+        stapel.extend(reversed(teil.get('parts') or []))
+
+
+def _bloecke(iterable, groesse):
+    """Iterable in Listen mit höchstens groesse Elementen aufteilen"""
+    iterator = iter(iterable)
+    while True:
+        block = list(islice(iterator, groesse))
+        if not block:
+            return
+        yield block
+
+
+def _pdf_analysieren(pdf_service, pfad):
+    """Analyse-Stufe (PDF-Prozess): (Rechnungsdaten, Dauer in Sekunden)"""
+    start = time.perf_counter()
+    daten = pdf_service.extract_invoice_data(pfad)
+    return daten, time.perf_counter() - start
+
+
+def _signale_ignorieren():
+    """PDF-Prozesse: SIGTERM/SIGINT dem Sync-Prozess überlassen, der den Lauf nach dem Block beendet"""
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class SyncFortschritt:
+    """Zähler eines Sync-Laufs
+    
+    melden() wird nach jedem Block aufgerufen, z.B. um den Stand eines
+    Hintergrund-Jobs zu speichern.
+    """
+    
+    def __init__(self):
+        self.geprueft = 0     # E-Mails geprüft
+        self.analysiert = 0   # PDFs analysiert
+        self.importiert = 0   # Buchungen angelegt
+        self.fehler = 0
+        self.http_fehler = {}  # Lieferant-ID -> HTTP-Status des abgebrochenen Labels
+        self.job_id = None  # zugehöriger SyncJob (für die Messwerte des Laufs)
+    
+    def melden(self):
+        pass
+    
+    def abgebrochen(self):
+        """True beendet den Lauf nach dem aktuellen Block (z.B. SIGTERM im Daemon)"""
+        return False
+
+
+# Prozessweiter API-Client: Token laden, Pfade auflösen und build() nur beim
+# ersten Sync je Prozess (Web-Worker, Job-Worker, Cron)
+_client = None  # (service, creds, token_path)
+_client_lock = threading.Lock()
+
+
+def _token_speichern(creds, token_path):
+    """Aktualisiertes Token schreiben, damit andere Prozesse nicht erneut refreshen müssen"""
+    os.makedirs(os.path.dirname(token_path), exist_ok=True)
+    with open(token_path, 'w') as token:
+        token.write(creds.to_json())
+
+
+def _token_aktualisieren(creds, token_path):
+    """Abgelaufenes Token des zwischengespeicherten Clients aktualisieren
+    
+    Returns:
+        False wenn der Refresh fehlschlägt (dann komplett neu authentifizieren)
+    """
+    if creds.valid:
+        return True
+    try:
+        creds.refresh(Request())
+        _token_speichern(creds, token_path)
+        return True
+    except Exception as e:
+        import logging
+        logging.getLogger(__name__).error(f"Fehler beim Token-Refresh: {e}")
+        return False
+
+
+def client_zuruecksetzen():
+    """Zwischengespeicherten API-Client verwerfen (z.B. nach neuem Token)"""
+    global _client
+    with _client_lock:
+        _client = None
+
+
+class HistoryAbgelaufen(Exception):
+    """startHistoryId ist Gmail nicht mehr bekannt (History wird nur begrenzt aufbewahrt)"""
+
+
 class GmailService:
     """Gmail-Integration für automatische Rechnungserfassung"""
     
-    def __init__(self):
-        self.service = None
+    def __init__(self, service=None, limiter=None):
+        """
+        Args:
+            service: fertiger API-Client (z.B. FakeGmailService), sonst OAuth-Authentifizierung
+            limiter: QuotaLimiter für alle API-Aufrufe, sonst aus der Konfiguration
+        """
+        self.service = service
+        self.limiter = limiter or self._limiter_erstellen()
         self.pdf_service = PDFService()
-        self._authenticated = False
+        self._authenticated = service is not None
+        self._label_ids = None  # Name -> ID, einmal je Sync-Lauf geladen
+        self._history_id = None  # historyId zu Beginn des Sync-Laufs
+        self.fortschritt = SyncFortschritt()
+        self.messung = SyncMessung(aktiv=False)  # je Sync-Lauf neu
+        self._analyse_im_prozess = False  # nach Absturz eines PDF-Prozesses: im Sync-Prozess analysieren
+    
+    def _limiter_erstellen(self):
+        """QuotaLimiter nach GMAIL_QUOTA_EINHEITEN_PRO_SEKUNDE; parallel: Downloads plus Sync-Thread"""
+        config = current_app.config if has_app_context() else {}
+        return QuotaLimiter(
+            einheiten_pro_sekunde=config.get('GMAIL_QUOTA_EINHEITEN_PRO_SEKUNDE', 200),
+            max_parallel=config.get('GMAIL_DOWNLOAD_THREADS', 4) + 1
+        )
     
     def _ensure_authenticated(self):
-        """Stelle sicher, dass Authentifizierung durchgeführt wurde"""
+        """Stelle sicher, dass Authentifizierung durchgeführt wurde
+        
+        Der API-Client wird prozessweit wiederverwendet; ein abgelaufenes
+        Access-Token wird dabei einmal (unter Lock) aktualisiert.
+        """
+        global _client
         if not self._authenticated:
-            self._authenticate()
+            with _client_lock:
+                if _client is not None and not _token_aktualisieren(*_client[1:]):
+                    _client = None
+                if _client is not None:
+                    self.service = _client[0]
+                    self._authenticated = True
+                else:
+                    self._authenticate()
             # Prüfe ob Service initialisiert wurde
             if not self.service:
                 print("Warnung: Service wurde nach _authenticate() nicht initialisiert")
@@ -34,7 +220,8 @@ class GmailService:
                 print(f"  service: {self.service}")
     
     def _authenticate(self):
-        """Gmail API authentifizieren"""
+        """Gmail API authentifizieren (Aufruf unter _client_lock)"""
+        global _client
         creds = None
         
         if not hasattr(current_app, 'config'):
@@ -124,9 +311,7 @@ class GmailService:
                     creds.refresh(Request())
                     logger.info("Token erfolgreich aktualisiert")
                     # Aktualisiertes Token speichern
-                    os.makedirs(os.path.dirname(token_path), exist_ok=True)
-                    with open(token_path, 'w') as token:
-                        token.write(creds.to_json())
+                    _token_speichern(creds, token_path)
                 except Exception as e:
                     logger.error(f"Fehler beim Token-Refresh: {e}")
                     print(f"Fehler beim Token-Refresh: {e}")
@@ -189,20 +374,48 @@ class GmailService:
                     raise Exception("OAuth-Authentifizierung fehlgeschlagen. Bitte führen Sie 'python scripts/setup_gmail_auth.py' aus.")
             
             # Token speichern
-            os.makedirs(os.path.dirname(token_path), exist_ok=True)
-            with open(token_path, 'w') as token:
-                token.write(creds.to_json())
+            _token_speichern(creds, token_path)
+        
+        # Eigene HTTP-Verbindung je Thread: httplib2 ist nicht threadsicher (parallele Downloads)
+        lokal = threading.local()
+        
+        def request_builder(http, *args, **kwargs):
+            if not hasattr(lokal, 'http'):
+                lokal.http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http())
+            return HttpRequest(lokal.http, *args, **kwargs)
         
         try:
-            self.service = build('gmail', 'v1', credentials=creds)
+            # Mitgeliefertes Discovery-Dokument statt Abruf von googleapis.com
+            self.service = build('gmail', 'v1', credentials=creds, requestBuilder=request_builder,
+                                 static_discovery=True, cache_discovery=False)
+            _client = (self.service, creds, token_path)
         except Exception as e:
             print(f"Fehler bei Gmail-Authentifizierung: {e}")
             self.service = None
         finally:
             self._authenticated = True
     
-    def get_messages_by_label(self, label_name):
-        """E-Mails nach Label abrufen"""
+    def get_label_id(self, label_name):
+        """ID eines Labels anhand des Namens, None wenn nicht vorhanden
+        
+        Alle Labels werden mit einem Aufruf geladen und zwischengespeichert.
+        """
+        self._ensure_authenticated()
+        if not self.service:
+            return None
+        
+        if self._label_ids is None:
+            try:
+                with self.messung.messen('auflisten'):
+                    labels = self.limiter.ausfuehren(self.service.users().labels().list(userId='me'))
+            except HttpError as error:
+                print(f'Fehler beim Abrufen der Labels: {error}')
+                return None
+            self._label_ids = {label['name']: label['id'] for label in labels.get('labels', [])}
+        return self._label_ids.get(label_name)
+    
+    def get_messages_by_label(self, label_name, label_id=None, seit=None):
+        """E-Mails nach Label abrufen (alle Seiten)"""
         self._ensure_authenticated()
         if not self.service:
             print("Warnung: Gmail-Service konnte nicht initialisiert werden")
@@ -210,30 +423,134 @@ class GmailService:
         
         try:
             # Label-ID finden
-            labels = self.service.users().labels().list(userId='me').execute()
-            label_id = None
-            for label in labels.get('labels', []):
-                if label['name'] == label_name:
-                    label_id = label['id']
-                    break
-            
+            label_id = label_id or self.get_label_id(label_name)
             if not label_id:
                 return []
             
-            # Nachrichten abrufen
-            results = self.service.users().messages().list(
-                userId='me',
-                labelIds=[label_id],
-                maxResults=50
-            ).execute()
-            
-            messages = results.get('messages', [])
-            return messages
+            return list(self.messages_auflisten(label_id, seit))
             
         except HttpError as error:
             print(f'Fehler beim Abrufen der E-Mails: {error}')
             return []
     
+    def messages_auflisten(self, label_id, seit=None, seitengroesse=500):
+        """E-Mails eines Labels mit PDF-Anhang seitenweise über nextPageToken (Generator)
+        
+        Gefiltert wird serverseitig (SUCHE_RECHNUNGEN, Datum). Es liegt immer
+        nur eine Seite im Speicher, auch bei Labels mit mehreren tausend E-Mails.
+        
+        Args:
+            label_id: Gmail-Label-ID
+            seit: optional, nur E-Mails ab diesem Datum (Suchausdruck after:)
+            seitengroesse: maxResults je Seite (Gmail erlaubt höchstens 500)
+        """
+        self._ensure_authenticated()
+        query = SUCHE_RECHNUNGEN
+        if seit:
+            query += f" after:{seit.strftime('%Y/%m/%d')}"
+        page_token = None
+        while True:
+            with self.messung.messen('auflisten'):
+                results = self.limiter.ausfuehren(self.service.users().messages().list(
+                    userId='me',
+                    labelIds=[label_id],
+                    q=query,
+                    maxResults=seitengroesse,
+                    pageToken=page_token
+                ))
+            
+            yield from results.get('messages', [])
+            
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+    
+    def get_history_id(self):
+        """Aktuelle historyId des Postfachs"""
+        self._ensure_authenticated()
+        with self.messung.messen('auflisten'):
+            return self.limiter.ausfuehren(self.service.users().getProfile(userId='me'))['historyId']
+    
+    def get_neue_messages(self, label_id, start_history_id):
+        """Seit start_history_id unter dem Label hinzugekommene E-Mails (History-API)
+        
+        Berücksichtigt neue Nachrichten und nachträglich gesetzte Labels.
+        
+        Returns:
+            (Liste von {'id': ...}, neue historyId)
+        
+        Raises:
+            HistoryAbgelaufen: wenn Gmail die History ab start_history_id nicht mehr kennt
+        """
+        self._ensure_authenticated()
+        message_ids = {}
+        history_id = start_history_id
+        page_token = None
+        while True:
+            try:
+                with self.messung.messen('auflisten'):
+                    results = self.limiter.ausfuehren(self.service.users().history().list(
+                        userId='me',
+                        startHistoryId=start_history_id,
+                        labelId=label_id,
+                        historyTypes=['messageAdded', 'labelAdded'],
+                        pageToken=page_token
+                    ))
+            except HttpError as error:
+                if error.resp.status == 404:
+                    raise HistoryAbgelaufen(start_history_id)
+                raise
+            
+            for eintrag in results.get('history', []):
+                for hinzugefuegt in eintrag.get('messagesAdded', []):
+                    message = hinzugefuegt['message']
+                    if label_id in message.get('labelIds', [label_id]):
+                        message_ids.setdefault(message['id'], None)
+                for hinzugefuegt in eintrag.get('labelsAdded', []):
+                    if label_id in hinzugefuegt.get('labelIds', []):
+                        message_ids.setdefault(hinzugefuegt['message']['id'], None)
+            
+            history_id = results.get('historyId', history_id)
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        
+        return [{'id': message_id} for message_id in message_ids], history_id
+    
+    def _messages_seit_checkpoint(self, label_name, backfill=False, seit=None):
+        """Zu prüfende E-Mails eines Labels und die danach zu speichernde historyId
+        
+        Mit Checkpoint nur die seitdem hinzugekommenen E-Mails, beim ersten Lauf,
+        abgelaufenem Checkpoint oder im Backfill alle E-Mails (ggf. ab seit).
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        label_id = self.get_label_id(label_name)
+        if not label_id:
+            logger.warning(f"Sync: Label '{label_name}' nicht gefunden")
+            return [], None
+        
+        checkpoint = GmailCheckpoint.query.filter_by(label=label_name).first()
+        if checkpoint and not backfill:
+            try:
+                return self.get_neue_messages(label_id, checkpoint.history_id)
+            except HistoryAbgelaufen:
+                logger.info(f"Sync: Checkpoint für Label '{label_name}' abgelaufen, vollständige Liste")
+        
+        # historyId vor dem Auflisten merken (einmal je Lauf), damit
+        # währenddessen eingehende E-Mails beim nächsten Lauf nicht fehlen
+        if self._history_id is None:
+            self._history_id = self.get_history_id()
+        return self.messages_auflisten(label_id, seit), self._history_id
+    
+    def _checkpoint_setzen(self, label_name, history_id):
+        checkpoint = GmailCheckpoint.query.filter_by(label=label_name).first()
+        if checkpoint:
+            checkpoint.history_id = str(history_id)
+        else:
+            db.session.add(GmailCheckpoint(label=label_name, history_id=str(history_id)))
+    
     def get_message_details(self, message_id):
         """Details einer E-Mail abrufen"""
         self._ensure_authenticated()
@@ -241,97 +558,446 @@ class GmailService:
             return None
         
         try:
-            message = self.service.users().messages().get(
+            message = self.limiter.ausfuehren(self.service.users().messages().get(
                 userId='me',
                 id=message_id,
                 format='full'
-            ).execute()
+            ))
             
             return message
         except HttpError as error:
             print(f'Fehler beim Abrufen der E-Mail-Details: {error}')
             return None
     
-    def download_attachment(self, message_id, attachment_id, filename):
-        """PDF-Anhang herunterladen"""
+    def get_message_details_batch(self, message_ids):
+        """Details mehrerer E-Mails per HTTP-Batch, beschränkt auf DETAIL_FELDER
+        
+        Returns:
+            {message_id: Nachricht, NICHT_GEFUNDEN (gelöscht) oder None bei vorübergehendem Fehler}
+        """
         self._ensure_authenticated()
-        if not self.service:
-            return None
+        ergebnisse = {}
+        gedrosselt = []
         
-        if hasattr(current_app, 'config'):
-            upload_folder = current_app.config['UPLOAD_FOLDER']
-        else:
-            upload_folder = os.environ.get('UPLOAD_FOLDER', 'data/rechnungen')
+        def antwort(request_id, response, exception):
+            if ist_rate_limit(exception):
+                # Gmail lehnt bei zu vielen Anfragen einzelne Teile des Batches ab
+                gedrosselt.append(request_id)
+                return
+            if isinstance(exception, HttpError) and exception.resp.status == 404:
+                ergebnisse[request_id] = NICHT_GEFUNDEN
+                return
+            if exception is not None:
+                print(f'Fehler beim Abrufen der E-Mail-Details ({request_id}): {exception}')
+            ergebnisse[request_id] = response
         
-        try:
-            attachment = self.service.users().messages().attachments().get(
-                userId='me',
-                messageId=message_id,
-                id=attachment_id
-            ).execute()
-            
-            file_data = base64.urlsafe_b64decode(attachment['data'])
-            
-            # Datei speichern
-            os.makedirs(upload_folder, exist_ok=True)
-            filepath = os.path.join(upload_folder, filename)
-            
-            with open(filepath, 'wb') as f:
-                f.write(file_data)
-            
-            return filepath
-        except HttpError as error:
-            print(f'Fehler beim Herunterladen des Anhangs: {error}')
+        # Ein Batch geht in derselben Sekunde ein: nicht mehr Einheiten als das Quota je Sekunde
+        einheiten = QUOTA_EINHEITEN['messages.get']
+        groesse = max(1, min(DETAIL_BATCHGROESSE, int(self.limiter.bucket.kapazitaet // einheiten)))
+        for block in _bloecke(message_ids, groesse):
+            offen = list(block)
+            for versuch in range(1, self.limiter.max_versuche + 1):
+                batch = self.service.new_batch_http_request(callback=antwort)
+                for message_id in offen:
+                    batch.add(
+                        self.service.users().messages().get(
+                            userId='me',
+                            id=message_id,
+                            format='full',
+                            fields=DETAIL_FELDER
+                        ),
+                        request_id=message_id
+                    )
+                gedrosselt.clear()
+                with self.messung.messen('details'):
+                    self.limiter.ausfuehren(batch, einheiten=einheiten * len(offen))
+                if not gedrosselt:
+                    break
+                # Abgelehnte Teile nach Wartezeit mit geringerer Parallelität erneut abrufen
+                offen = list(gedrosselt)
+                self.limiter.rate_limit()
+                if versuch < self.limiter.max_versuche:
+                    self.limiter.zurueckhalten(versuch)
+            for message_id in gedrosselt:
+                print(f'Fehler beim Abrufen der E-Mail-Details ({message_id}): Rate-Limit')
+                ergebnisse[message_id] = None
+        return ergebnisse
+    
+    def download_attachment(self, message_id, attachment_id, filename, upload_folder=None):
+        """PDF-Anhang herunterladen und in der PDF-Ablage speichern
+        
+        Args:
+            filename: Name des Anhangs (für Meldungen; abgelegt wird nach Inhalt)
+            upload_folder: Zielverzeichnis; in Worker-Threads ohne App-Kontext angeben
+        
+        Returns:
+            Pfad der Datei oder None
+        """
+        self._ensure_authenticated()
+        if not self.service:
             return None
+        
+        with self.messung.messen('download') as punkt:
+            try:
+                attachment = self.limiter.ausfuehren(self.service.users().messages().attachments().get(
+                    userId='me',
+                    messageId=message_id,
+                    id=attachment_id
+                ))
+                
+                file_data = base64.urlsafe_b64decode(attachment['data'])
+                punkt.bytes = len(file_data)
+                
+                filepath, _ = PDFAblage(upload_folder).speichern(file_data)
+                return filepath
+            except HttpError as error:
+                punkt.fehler = True
+                print(f'Fehler beim Herunterladen des Anhangs {filename}: {error}')
+                return None
     
     def extract_pdf_attachments(self, message):
-        """PDF-Anhänge aus E-Mail extrahieren"""
+        """PDF-Anhänge aus E-Mail extrahieren, auch aus verschachtelten Parts
+        
+        Returns:
+            [{'filename', 'attachment_id'}] in Dokumentreihenfolge; die Position
+            ist die Anhang-Nummer der Buchung (gmail_anhang_nr)
+        """
         attachments = []
         
         if 'payload' not in message:
             return attachments
         
-        payload = message['payload']
-        
-        # Prüfen ob Anhänge vorhanden
-        if 'parts' in payload:
-            for part in payload['parts']:
-                if part.get('filename', '').lower().endswith('.pdf'):
-                    attachments.append({
-                        'filename': part['filename'],
-                        'attachment_id': part['body']['attachmentId']
-                    })
-                # Rekursive Suche in verschachtelten Parts
-                if 'parts' in part:
-                    for subpart in part['parts']:
-                        if subpart.get('filename', '').lower().endswith('.pdf'):
-                            attachments.append({
-                                'filename': subpart['filename'],
-                                'attachment_id': subpart['body']['attachmentId']
-                            })
-        elif payload.get('filename', '').lower().endswith('.pdf'):
-            attachments.append({
-                'filename': payload['filename'],
-                'attachment_id': payload['body']['attachmentId']
-            })
+        for part in _mime_teile(message['payload']):
+            attachment_id = part.get('body', {}).get('attachmentId')
+            filename = part.get('filename', '')
+            if attachment_id and (filename.lower().endswith('.pdf') or part.get('mimeType') == 'application/pdf'):
+                attachments.append({
+                    'filename': filename or f'anhang_{len(attachments) + 1}.pdf',
+                    'attachment_id': attachment_id
+                })
         
         return attachments
     
-    def sync_rechnungen(self):
-        """Rechnungen aus Gmail synchronisieren"""
+    def _bereits_importiert(self, message_ids):
+        """Teilmenge der message_ids, die schon importiert oder als Duplikat übersprungen sind (eine Abfrage)
+        
+        Eine E-Mail wird mit allen PDFs in einer Transaktion angelegt, eine
+        Buchung oder ein Duplikat-Vermerk genügt daher als Nachweis für die
+        ganze E-Mail. Ein Vermerk zählt nur, solange die Buchung, deren
+        Duplikat der Anhang war, noch existiert.
+        """
+        importiert = db.select(Buchung.gmail_message_id).where(Buchung.gmail_message_id.in_(message_ids))
+        duplikate = db.select(GmailDuplikat.gmail_message_id).join(
+            Buchung, Buchung.id == GmailDuplikat.buchung_id
+        ).where(GmailDuplikat.gmail_message_id.in_(message_ids))
+        return set(db.session.scalars(db.union(importiert, duplikate)))
+    
+    def _anhang_laden(self, message_id, pdf_attachment, upload_folder):
+        """Download-Stufe der Pipeline (Worker-Thread): Pfad der Datei oder None"""
+        return self.download_attachment(message_id, pdf_attachment['attachment_id'], pdf_attachment['filename'], upload_folder)
+    
+    @contextmanager
+    def pipeline_starten(self):
+        """Pools der Import-Pipeline für einen Sync-Lauf (Größen aus der Konfiguration)
+        
+        GMAIL_DOWNLOAD_THREADS Threads laden Anhänge herunter, GMAIL_PDF_PROZESSE
+        Prozesse analysieren die PDFs (0: im Sync-Prozess). Die Prozesse werden
+        erst beim ersten PDF gestartet.
+        """
+        download_threads = max(1, current_app.config.get('GMAIL_DOWNLOAD_THREADS', 4))
+        pdf_prozesse = current_app.config.get('GMAIL_PDF_PROZESSE', 0)
+        if pdf_prozesse > 0:
+            # spawn statt fork: der Sync-Prozess hat bereits Threads und DB-Verbindungen
+            analysen = ProcessPoolExecutor(max_workers=pdf_prozesse, mp_context=multiprocessing.get_context('spawn'),
+                                           initializer=_signale_ignorieren)
+        else:
+            analysen = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gmail-pdf')
+        self._analyse_im_prozess = False
+        with ThreadPoolExecutor(max_workers=download_threads, thread_name_prefix='gmail-download') as downloads, analysen:
+            yield Pipeline(downloads, analysen, current_app.config['UPLOAD_FOLDER'])
+    
+    def _block_importieren(self, lieferant, message_ids, pipeline, duplikat_service):
+        """Noch nicht importierte E-Mails eines Blocks durch die Pipeline schicken
+        
+        Details werden gebündelt abgerufen, alle PDF-Anhänge aller E-Mails
+        parallel geladen; jede fertig geladene Datei geht sofort in die
+        PDF-Analyse. Die Buchungen (eine je PDF) legt danach nur dieser Thread
+        an, in der Reihenfolge der E-Mails und Anhänge (Duplikate innerhalb des
+        Blocks werden so wie bisher erkannt).
+        
+        Eine E-Mail wird ganz oder gar nicht importiert: fehlt ein Anhang,
+        liefert sie FEHLER und wird im nächsten Lauf vollständig wiederholt.
+        Endgültig gelöschte E-Mails (404) gelten als übersprungen.
+        
+        Yields:
+            Liste der Status je E-Mail, ein Eintrag je PDF (IMPORTIERT,
+            UEBERSPRUNGEN) bzw. [FEHLER] / [UEBERSPRUNGEN] ohne PDF
+        """
+        if not message_ids:
+            return
+        details = self.get_message_details_batch(message_ids)
+        
+        anhaenge = {}  # message_id -> PDF-Anhänge in Dokumentreihenfolge
+        downloads = {}
+        for message_id in message_ids:
+            if not details.get(message_id) or details[message_id] == NICHT_GEFUNDEN:
+                continue
+            anhaenge[message_id] = self.extract_pdf_attachments(details[message_id])
+            for anhang_nr, pdf_attachment in enumerate(anhaenge[message_id]):
+                future = pipeline.downloads.submit(self._anhang_laden, message_id, pdf_attachment, pipeline.upload_folder)
+                downloads[future] = (message_id, anhang_nr)
+        
+        pfade = {}  # (message_id, anhang_nr) -> Pfad oder None
+        analysen = {}
+        for future in as_completed(downloads):
+            teil = downloads[future]
+            try:
+                pfade[teil] = future.result()
+            except Exception as e:
+                # z.B. Timeout, SSL-Fehler oder Limiter nach der letzten Wiederholung:
+                # nur diese E-Mail scheitert, nicht der ganze Sync
+                import logging
+                logging.getLogger(__name__).warning(f"Sync: Download von Anhang {teil[1]} der E-Mail {teil[0]} fehlgeschlagen: {e!r}")
+                pfade[teil] = None
+            if pfade[teil]:
+                analysen[teil] = self._analyse_starten(pipeline, pfade[teil])
+        
+        for message_id in message_ids:
+            if details.get(message_id) == NICHT_GEFUNDEN:
+                # Inzwischen gelöscht: nichts zu importieren, der Checkpoint darf weiter
+                yield [UEBERSPRUNGEN]
+            elif not details.get(message_id):
+                yield [FEHLER]
+            elif not anhaenge[message_id]:
+                yield [UEBERSPRUNGEN]
+            elif not all(pfade[(message_id, nr)] for nr in range(len(anhaenge[message_id]))):
+                yield [FEHLER]
+            else:
+                ergebnisse = [
+                    self._analyse_abwarten(message_id, anhang_nr, pfade[(message_id, anhang_nr)],
+                                           analysen[(message_id, anhang_nr)])
+                    for anhang_nr in range(len(anhaenge[message_id]))
+                ]
+                if not all(ergebnisse):
+                    # Analyse eines Anhangs gescheitert: keine Buchung, E-Mail im nächsten Lauf wiederholen
+                    yield [FEHLER]
+                    continue
+                yield [
+                    self._anhang_buchen(lieferant, message_id, anhang_nr, pdf_attachment['filename'],
+                                        pfade[(message_id, anhang_nr)], ergebnisse[anhang_nr],
+                                        pipeline, duplikat_service)
+                    for anhang_nr, pdf_attachment in enumerate(anhaenge[message_id])
+                ]
+    
+    def _analyse_starten(self, pipeline, pfad):
+        """Analyse an die PDF-Prozesse übergeben; None = später im Sync-Prozess analysieren"""
+        if self._analyse_im_prozess:
+            return None
+        try:
+            return pipeline.analysen.submit(_pdf_analysieren, self.pdf_service, pfad)
+        except BrokenProcessPool:
+            self._analyse_im_prozess = True
+            return None
+    
+    def _analyse_abwarten(self, message_id, anhang_nr, pdf_path, analyse):
+        """Analyse-Stufe: (Rechnungsdaten, Dauer) oder None, wenn die Analyse selbst gescheitert ist
+        
+        Stürzt ein PDF-Prozess ab (z.B. nativer Fehler in PyMuPDF), sind alle
+        Analysen des Pools verloren. Die gerade erwartete E-Mail scheitert,
+        alle weiteren PDFs des Laufs analysiert der Sync-Prozess selbst.
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        if analyse is None:
+            return _pdf_analysieren(self.pdf_service, pdf_path)
+        try:
+            return analyse.result()
+        except BrokenProcessPool as e:
+            if self._analyse_im_prozess:
+                # Folge des bereits gemeldeten Absturzes
+                return _pdf_analysieren(self.pdf_service, pdf_path)
+            self._analyse_im_prozess = True
+            logger.error(f"Sync: PDF-Prozess abgestürzt bei Anhang {anhang_nr} der E-Mail {message_id} ({e!r}), "
+                         f"weitere PDFs werden im Sync-Prozess analysiert")
+        except Exception as e:
+            logger.error(f"Sync: PDF-Analyse von Anhang {anhang_nr} der E-Mail {message_id} fehlgeschlagen: {e!r}")
+        self.messung.erfassen('analyse', 0.0, fehler=True)
+        return None
+    
+    def _anhang_buchen(self, lieferant, message_id, anhang_nr, filename, pdf_path, ergebnis, pipeline, duplikat_service):
+        """Buchung zum Analyseergebnis (Rechnungsdaten, Dauer) eines Anhangs anlegen"""
+        pdf_data, dauer = ergebnis
+        self.messung.erfassen('analyse', dauer, os.path.getsize(pdf_path), fehler=not pdf_data)
+        self.fortschritt.analysiert += 1
+        with self.messung.messen('buchung'):
+            return self._buchung_anlegen(
+                lieferant, message_id, filename, pdf_path,
+                pdf_data, PDFAblage(pipeline.upload_folder).hash_von(pdf_path), duplikat_service,
+                anhang_nr=anhang_nr
+            )
+    
+    def _buchung_anlegen(self, lieferant, message_id, filename, pdf_path, pdf_data, pdf_hash, duplikat_service,
+                         anhang_nr=0):
+        """Schreib-Stufe der Pipeline: Buchung zur analysierten Rechnung anlegen
+        
+        Läuft nur im aufrufenden Thread (einziger Schreiber der Session); die
+        Buchung wird der Session hinzugefügt.
+        
+        Args:
+            anhang_nr: Position des PDFs in der E-Mail (eindeutig mit message_id)
+        
+        Returns:
+            IMPORTIERT oder UEBERSPRUNGEN (PDF nicht auswertbar, Duplikat)
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        if not pdf_data:
+            logger.warning(f"Sync: PDF-Analyse fehlgeschlagen für {filename}")
+            return UEBERSPRUNGEN
+        
+        logger.info(f"Sync: PDF analysiert - Betrag: {pdf_data.get('betrag')}, Datum: {pdf_data.get('datum')}, Rechnungsnummer: {pdf_data.get('rechnungsnummer')}")
+        
+        # Rechnungsnummer aus Dateiname extrahieren falls nicht im PDF gefunden
+        rechnungsnummer = pdf_data.get('rechnungsnummer', '')
+        
+        # Prüfe ob Rechnungsnummer ungültig ist
+        def is_valid_date(date_str):
+            """Prüft ob eine 8-stellige Zahl ein gültiges Datum ist"""
+            if len(date_str) != 8 or not date_str.isdigit():
+                return False
+            try:
+                year = int(date_str[:4])
+                month = int(date_str[4:6])
+                day = int(date_str[6:8])
+                from datetime import datetime as dt
+                dt(year, month, day)
+                return 2000 <= year <= 2100 and 1 <= month <= 12 and 1 <= day <= 31
+            except:
+                return False
+        
+        if not rechnungsnummer or rechnungsnummer.lower() in ['template', 'belegnummer', 'rechnungsnummer', 'nummer'] or is_valid_date(rechnungsnummer):
+            # Versuche aus Dateiname zu extrahieren
+            import re as re_module
+            name_without_ext = filename.replace('.pdf', '').replace('.PDF', '')
+            parts = name_without_ext.split('_')
+        
+            # Verschiedene Formate im Dateinamen suchen
+            invoice_match = re_module.search(r'INVOICE[-/]?(\d+)', filename, re_module.IGNORECASE)
+            if invoice_match:
+                rechnungsnummer = invoice_match.group(1)
+            elif len(parts) >= 3:
+                # Format: 20251228_174528_45184639 - nimm letzten Teil
+                neue_nr = parts[-1]
+                if not is_valid_date(neue_nr):
+                    rechnungsnummer = neue_nr
+            elif len(parts) == 2:
+                # Format: 20251228_45184639
+                neue_nr = parts[-1]
+                if not is_valid_date(neue_nr):
+                    rechnungsnummer = neue_nr
+            else:
+                # Suche nach Zahlen im Dateinamen
+                number_match = re_module.search(r'(\d{6,})', filename)
+                if number_match:
+                    neue_nr = number_match.group(1)
+                    if not is_valid_date(neue_nr):
+                        rechnungsnummer = neue_nr
+        
+        # Dieselbe Rechnung bereits manuell oder aus einer anderen E-Mail erfasst?
+        betrag = Decimal(str(pdf_data.get('betrag', 0)))
+        lieferant_id = lieferant.id if lieferant.typ == 'Ausgabe' else None
+        duplikat = duplikat_service.finden(lieferant.typ, lieferant_id, rechnungsnummer, betrag, pdf_hash)
+        if duplikat:
+            logger.info(f"Sync: Duplikat übersprungen ({filename}) - {duplikat_service.beschreiben(duplikat)}")
+            # Vermerk, damit spätere Läufe (Backfill, Label-Liste) die E-Mail nicht erneut laden
+            self._duplikat_vermerken(message_id, anhang_nr, duplikat.id)
+            return UEBERSPRUNGEN
+        
+        # Ohne Rechnungstitel im PDF liefert die Analyse den Dateinamen der Ablage
+        # (SHA-256), als Titel dann den Namen des Anhangs verwenden
+        titel = pdf_data.get('titel') or filename
+        if titel == os.path.basename(pdf_path):
+            titel = filename
+        
+        # Prüfe ob DPD-Rechnung (für automatisches Abbuchen)
+        von_zielkonto_abgebucht = False
+        if lieferant and lieferant.name and 'DPD' in lieferant.name.upper():
+            von_zielkonto_abgebucht = True
+        
+        # Buchung erstellen
+        buchung = Buchung(
+            typ=lieferant.typ,
+            lieferant_id=lieferant_id,
+            betrag=betrag,
+            datum=pdf_data.get('datum') or datetime.now().date(),
+            rechnungsnummer=rechnungsnummer,
+            titel=titel,
+            pdf_pfad=pdf_path,
+            pdf_hash=pdf_hash,
+            jahr=(pdf_data.get('datum') or datetime.now().date()).year,
+            quelle='Gmail',
+            gmail_message_id=message_id,
+            gmail_anhang_nr=anhang_nr,
+            von_zielkonto_abgebucht=von_zielkonto_abgebucht
+        )
+        
+        db.session.add(buchung)
+        return IMPORTIERT
+    
+    def _duplikat_vermerken(self, message_id, anhang_nr, buchung_id):
+        """GmailDuplikat anlegen bzw. auf die aktuelle Buchung umhängen (wird mit dem Block committet)"""
+        vermerk = GmailDuplikat.query.filter_by(gmail_message_id=message_id, gmail_anhang_nr=anhang_nr).first()
+        if vermerk:
+            vermerk.buchung_id = buchung_id
+        else:
+            db.session.add(GmailDuplikat(gmail_message_id=message_id, gmail_anhang_nr=anhang_nr, buchung_id=buchung_id))
+    
+    def sync_rechnungen(self, backfill=False, seit=None, lieferant_id=None, commit_intervall=COMMIT_INTERVALL,
+                        fortschritt=None, lieferant_ids=None):
+        """Rechnungen aus Gmail synchronisieren
+        
+        Args:
+            backfill: alle E-Mails der Labels statt nur der seit dem letzten Lauf neuen prüfen
+            seit: optional, nur E-Mails ab diesem Datum; ohne Backfill gilt für Labels
+                ohne Checkpoint der Zeitraum GMAIL_SYNC_ZEITRAUM_TAGE
+            lieferant_id: optional, nur diesen Lieferanten synchronisieren
+            lieferant_ids: optional, nur diese Lieferanten synchronisieren
+            commit_intervall: Commit nach so vielen importierten Rechnungen; ein
+                abgebrochener Lauf setzt danach an (bereits importierte E-Mails
+                werden übersprungen)
+            fortschritt: optional SyncFortschritt, wird nach jedem Block gemeldet;
+                meldet er abgebrochen(), endet der Lauf nach dem Block (ohne Checkpoint)
+        
+        Returns:
+            Anzahl importierter Rechnungen
+        """
         self._ensure_authenticated()
         if not self.service:
             print("Warnung: Gmail-Service konnte nicht initialisiert werden")
             return 0
         
-        anzahl = 0
+        duplikat_service = DuplikatService()
+        # Labels und historyId einmal je Lauf abrufen
+        self._label_ids = None
+        self._history_id = None
+        self.fortschritt = fortschritt or SyncFortschritt()
+        if seit is None and not backfill:
+            # Ältere Rechnungen neuer Lieferanten importiert der Backfill
+            seit = date.today() - timedelta(days=current_app.config.get('GMAIL_SYNC_ZEITRAUM_TAGE', 90))
         
         # Alle aktiven Lieferanten mit Gmail-Labels abrufen
-        lieferanten = Lieferant.query.filter(
+        query = Lieferant.query.filter(
             Lieferant.aktiv == True,
             Lieferant.gmail_label.isnot(None),
             Lieferant.gmail_label != ''
-        ).all()
+        )
+        if lieferant_id:
+            query = query.filter(Lieferant.id == lieferant_id)
+        if lieferant_ids is not None:
+            query = query.filter(Lieferant.id.in_(lieferant_ids))
+        lieferanten = query.all()
         
         import logging
         logger = logging.getLogger(__name__)
@@ -339,120 +1005,93 @@ class GmailService:
         for lieferant in lieferanten:
             logger.info(f"Sync: Prüfe Lieferant '{lieferant.name}' mit Label '{lieferant.gmail_label}'")
         
-        for lieferant in lieferanten:
-            # Nachrichten für dieses Label abrufen
-            messages = self.get_messages_by_label(lieferant.gmail_label)
-            logger.info(f"Sync: Lieferant '{lieferant.name}' - {len(messages)} E-Mails gefunden")
-            
-            for msg in messages:
-                message_id = msg['id']
-                
-                # Prüfen ob bereits importiert
-                if Buchung.query.filter_by(gmail_message_id=message_id).first():
-                    continue
-                
-                # Nachrichtendetails abrufen
-                message_details = self.get_message_details(message_id)
-                if not message_details:
-                    continue
-                
-                # PDF-Anhänge finden
-                pdf_attachments = self.extract_pdf_attachments(message_details)
-                
-                if not pdf_attachments:
-                    continue
-                
-                # Ersten PDF-Anhang verarbeiten
-                pdf_attachment = pdf_attachments[0]
-                filename = pdf_attachment['filename']
-                attachment_id = pdf_attachment['attachment_id']
-                
-                # PDF herunterladen
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                safe_filename = f"{timestamp}_{filename}"
-                pdf_path = self.download_attachment(message_id, attachment_id, safe_filename)
-                
-                if not pdf_path:
-                    continue
-                
-                # PDF analysieren
-                pdf_data = self.pdf_service.extract_invoice_data(pdf_path)
-                
-                if not pdf_data:
-                    logger.warning(f"Sync: PDF-Analyse fehlgeschlagen für {filename}")
-                    continue
-                
-                logger.info(f"Sync: PDF analysiert - Betrag: {pdf_data.get('betrag')}, Datum: {pdf_data.get('datum')}, Rechnungsnummer: {pdf_data.get('rechnungsnummer')}")
-                
-                # Rechnungsnummer aus Dateiname extrahieren falls nicht im PDF gefunden
-                rechnungsnummer = pdf_data.get('rechnungsnummer', '')
-                
-                # Prüfe ob Rechnungsnummer ungültig ist
-                def is_valid_date(date_str):
-                    """Prüft ob eine 8-stellige Zahl ein gültiges Datum ist"""
-                    if len(date_str) != 8 or not date_str.isdigit():
-                        return False
-                    try:
-                        year = int(date_str[:4])
-                        month = int(date_str[4:6])
-                        day = int(date_str[6:8])
-                        from datetime import datetime as dt
-                        dt(year, month, day)
-                        return 2000 <= year <= 2100 and 1 <= month <= 12 and 1 <= day <= 31
-                    except:
-                        return False
-                
-                if not rechnungsnummer or rechnungsnummer.lower() in ['template', 'belegnummer', 'rechnungsnummer', 'nummer'] or is_valid_date(rechnungsnummer):
-                    # Versuche aus Dateiname zu extrahieren
-                    import re as re_module
-                    name_without_ext = filename.replace('.pdf', '').replace('.PDF', '')
-                    parts = name_without_ext.split('_')
-                    
-                    # Verschiedene Formate im Dateinamen suchen
-                    invoice_match = re_module.search(r'INVOICE[-/]?(\d+)', filename, re_module.IGNORECASE)
-                    if invoice_match:
-                        rechnungsnummer = invoice_match.group(1)
-                    elif len(parts) >= 3:
-                        # Format: 20251228_174528_45184639 - nimm letzten Teil
-                        neue_nr = parts[-1]
-                        if not is_valid_date(neue_nr):
-                            rechnungsnummer = neue_nr
-                    elif len(parts) == 2:
-                        # Format: 20251228_45184639
-                        neue_nr = parts[-1]
-                        if not is_valid_date(neue_nr):
-                            rechnungsnummer = neue_nr
-                    else:
-                        # Suche nach Zahlen im Dateinamen
-                        number_match = re_module.search(r'(\d{6,})', filename)
-                        if number_match:
-                            neue_nr = number_match.group(1)
-                            if not is_valid_date(neue_nr):
-                                rechnungsnummer = neue_nr
-                
-                # Prüfe ob DPD-Rechnung (für automatisches Abbuchen)
-                von_zielkonto_abgebucht = False
-                if lieferant and lieferant.name and 'DPD' in lieferant.name.upper():
-                    von_zielkonto_abgebucht = True
+        # Zeiten je Stufe messen und als SyncLauf speichern (Einstellungen > Sync-Läufe)
+        self.messung = SyncMessung(aktiv=current_app.config.get('GMAIL_SYNC_MESSUNG', True))
+        lauf = SyncLauf(job_id=self.fortschritt.job_id, gestartet_am=datetime.utcnow())
+        try:
+            anzahl = self._lieferanten_synchronisieren(lieferanten, backfill, seit, commit_intervall, duplikat_service)
+        except Exception as e:
+            db.session.rollback()
+            self._lauf_speichern(lauf, 'fehler', str(e))
+            raise
+        self._lauf_speichern(lauf, 'abgebrochen' if self.fortschritt.abgebrochen() else 'fertig')
+        logger.info(f"Sync: Gmail-Quota {self.limiter.metriken()}")
+        return anzahl
+    
+    def _lauf_speichern(self, lauf, status, meldung=None):
+        """Messwerte des Laufs speichern (nur bei aktiver Messung)"""
+        if not self.messung.aktiv:
+            return
+        lauf.status = status
+        lauf.meldung = meldung[:500] if meldung else None
+        lauf.beendet_am = datetime.utcnow()
+        lauf.dauer_s = round((lauf.beendet_am - lauf.gestartet_am).total_seconds(), 3)
+        lauf.geprueft = self.fortschritt.geprueft
+        lauf.importiert = self.fortschritt.importiert
+        lauf.fehler = self.fortschritt.fehler
+        lauf.stufen = json.dumps(self.messung.zusammenfassung())
+        lauf.quota = json.dumps(self.limiter.metriken())
+        db.session.add(lauf)
+        db.session.commit()
+    
+    def _lieferanten_synchronisieren(self, lieferanten, backfill, seit, commit_intervall, duplikat_service):
+        """Hauptschleife von sync_rechnungen(); Rückgabe: Anzahl importierter Rechnungen"""
+        import logging
+        logger = logging.getLogger(__name__)
+        anzahl = 0
+        seit_commit = 0
+        with self.pipeline_starten() as pipeline:
+            for lieferant in lieferanten:
+                if self.fortschritt.abgebrochen():
+                    break
+                # Bei API-Fehlern bleibt der Checkpoint stehen, der nächste Lauf versucht es erneut
+                unvollstaendig = False
+                geprueft = 0
+                history_id = None
                 
-                # Buchung erstellen
-                buchung = Buchung(
-                    typ=lieferant.typ,
-                    lieferant_id=lieferant.id if lieferant.typ == 'Ausgabe' else None,
-                    betrag=Decimal(str(pdf_data.get('betrag', 0))),
-                    datum=pdf_data.get('datum') or datetime.now().date(),
-                    rechnungsnummer=rechnungsnummer,
-                    titel=pdf_data.get('titel', filename),
-                    pdf_pfad=pdf_path,
-                    jahr=(pdf_data.get('datum') or datetime.now().date()).year,
-                    quelle='Gmail',
-                    gmail_message_id=message_id,
-                    von_zielkonto_abgebucht=von_zielkonto_abgebucht
-                )
+                try:
+                    # Nur seit dem letzten Lauf hinzugekommene Nachrichten abrufen (Backfill: alle)
+                    messages, history_id = self._messages_seit_checkpoint(lieferant.gmail_label, backfill, seit)
+                    for block in _bloecke(messages, PRUEF_BLOCKGROESSE):
+                        # Bereits importierte E-Mails mit einer Abfrage je Block aussortieren
+                        vorhanden = self._bereits_importiert([msg['id'] for msg in block])
+                        neue = [msg['id'] for msg in block if msg['id'] not in vorhanden]
+                        geprueft += len(block)
+                        self.fortschritt.geprueft += len(block)
+                        for stati in self._block_importieren(lieferant, neue, pipeline, duplikat_service):
+                            for status in stati:
+                                if status == FEHLER:
+                                    unvollstaendig = True
+                                    self.fortschritt.fehler += 1
+                                elif status == IMPORTIERT:
+                                    anzahl += 1
+                                    seit_commit += 1
+                                    self.fortschritt.importiert += 1
+                            # Nur zwischen E-Mails committen, damit keine E-Mail halb importiert bleibt
+                            if seit_commit >= commit_intervall:
+                                with self.messung.messen('commit'):
+                                    db.session.commit()
+                                seit_commit = 0
+                                logger.info(f"Sync: {anzahl} Rechnungen importiert (Zwischenstand)")
+                        # Block committen (auch Duplikate/Fehlversuche), dann Fortschritt melden
+                        with self.messung.messen('commit'):
+                            db.session.commit()
+                        self.fortschritt.melden()
+                        if self.fortschritt.abgebrochen():
+                            # Block ist vollständig angelegt, Rest übernimmt der nächste Lauf
+                            logger.info(f"Sync: Abbruch nach Block, Label '{lieferant.gmail_label}'")
+                            unvollstaendig = True
+                            break
+                except HttpError as error:
+                    logger.error(f"Sync: Fehler beim Abrufen der E-Mails für Label '{lieferant.gmail_label}': {error}")
+                    unvollstaendig = True
+                    self.fortschritt.fehler += 1
+                    self.fortschritt.http_fehler[lieferant.id] = error.resp.status
+                logger.info(f"Sync: Lieferant '{lieferant.name}' - {geprueft} E-Mails geprüft")
                 
-                db.session.add(buchung)
-                anzahl += 1
+                if history_id and not unvollstaendig:
+                    self._checkpoint_setzen(lieferant.gmail_label, history_id)
         
-        db.session.commit()
+        with self.messung.messen('commit'):
+            db.session.commit()
         return anzahl
-
@@ -0,0 +1,185 @@
+import json
+import logging
+import threading
+from datetime import datetime, date, timedelta
+from sqlalchemy.exc import IntegrityError
+from models import db, SyncJob
+from services.gmail_service import GmailService, SyncFortschritt
+from services.monatssummen_service import MonatssummenService
+
+logger = logging.getLogger(__name__)
+
+POSTFACH_GMAIL = 'gmail'
+AKTIV = ('wartend', 'laeuft')
+
+# Laufende Jobs ohne Lebenszeichen gelten danach als abgebrochen (z.B. Neustart des Servers)
+JOB_TIMEOUT = timedelta(minutes=15)
+
+
+class JobFortschritt(SyncFortschritt):
+    """Schreibt den Fortschritt nach jedem Sync-Block in die Job-Zeile
+
+    Der Commit läuft über dieselbe Session wie der Import, damit SQLite
+    keine zweite schreibende Verbindung sperren muss.
+    """
+
+    def __init__(self, job):
+        super().__init__()
+        self.job = job
+        self.job_id = job.id
+
+    def melden(self):
+        self.job.geprueft = self.geprueft
+        self.job.analysiert = self.analysiert
+        self.job.importiert = self.importiert
+        self.job.fehler = self.fehler
+        self.job.aktualisiert_am = datetime.utcnow()
+        db.session.commit()
+
+
+class JobService:
+    """Hintergrund-Jobs der Gmail-Synchronisation (Tabelle sync_job, ohne Broker)"""
+
+    def einreihen(self, postfach=POSTFACH_GMAIL, parameter=None, benutzer_id=None):
+        """
+        Sync-Job anlegen. Ist für das Postfach bereits ein Job wartend oder
+        laufend, wird kein neuer angelegt.
+
+        Returns:
+            (job, neu) - neu ist False, wenn der bestehende Job zurückgegeben wird
+        """
+        self._haengende_beenden(postfach)
+        job = SyncJob(
+            postfach=postfach,
+            parameter=json.dumps(parameter) if parameter else None,
+            benutzer_id=benutzer_id
+        )
+        db.session.add(job)
+        try:
+            db.session.commit()
+            return job, True
+        except IntegrityError:
+            # Partieller eindeutiger Index: ein anderer Request/Prozess war schneller
+            db.session.rollback()
+            return self.get_aktiver_job(postfach), False
+
+    def get_aktiver_job(self, postfach=POSTFACH_GMAIL):
+        """Wartender oder laufender Job des Postfachs (oder None)"""
+        return SyncJob.query.filter(
+            SyncJob.postfach == postfach,
+            SyncJob.status.in_(AKTIV)
+        ).first()
+
+    def get_letzter_job(self, postfach=POSTFACH_GMAIL):
+        """Zuletzt angelegter Job des Postfachs (oder None)"""
+        return SyncJob.query.filter_by(postfach=postfach).order_by(SyncJob.id.desc()).first()
+
+    def _haengende_beenden(self, postfach):
+        """Laufende Jobs ohne Lebenszeichen als Fehler abschließen, damit sie das Postfach nicht sperren"""
+        grenze = datetime.utcnow() - JOB_TIMEOUT
+        db.session.execute(
+            db.update(SyncJob)
+            .where(
+                SyncJob.postfach == postfach,
+                SyncJob.status == 'laeuft',
+                db.func.coalesce(SyncJob.aktualisiert_am, SyncJob.gestartet_am) < grenze
+            )
+            .values(status='fehler', meldung='Abgebrochen (kein Lebenszeichen)', beendet_am=datetime.utcnow())
+        )
+        db.session.commit()
+
+    def _uebernehmen(self, job):
+        """Job atomar von 'wartend' auf 'laeuft' setzen; False, wenn ihn schon ein anderer Worker hat"""
+        jetzt = datetime.utcnow()
+        ergebnis = db.session.execute(
+            db.update(SyncJob)
+            .where(SyncJob.id == job.id, SyncJob.status == 'wartend')
+            .values(status='laeuft', gestartet_am=jetzt, aktualisiert_am=jetzt)
+        )
+        db.session.commit()
+        db.session.refresh(job)
+        return ergebnis.rowcount == 1
+
+    def ausfuehren(self, job, fortschritt=None):
+        """
+        Wartenden Job ausführen (blockiert bis zum Ende des Syncs)
+
+        Args:
+            job: wartender SyncJob
+            fortschritt: optional eigener JobFortschritt (z.B. mit Abbruch-Signal)
+
+        Returns:
+            True wenn der Job ausgeführt wurde, False wenn er bereits übernommen war
+        """
+        if not self._uebernehmen(job):
+            return False
+
+        parameter = json.loads(job.parameter) if job.parameter else {}
+        if parameter.get('seit'):
+            parameter['seit'] = date.fromisoformat(parameter['seit'])
+
+        fortschritt = fortschritt or JobFortschritt(job)
+        try:
+            anzahl = GmailService().sync_rechnungen(fortschritt=fortschritt, **parameter)
+            fortschritt.melden()
+            job.status = 'fertig'
+            job.meldung = f'{anzahl} neue Rechnungen importiert.'
+            if fortschritt.abgebrochen():
+                job.meldung = f'Vorzeitig beendet, {anzahl} neue Rechnungen importiert.'
+            # Monats-Rollup nach dem Import prüfen
+            if anzahl > 0:
+                abweichungen = MonatssummenService().pruefen()
+                if abweichungen:
+                    job.meldung += (f' Warnung: Monatssummen inkonsistent ({len(abweichungen)} Abweichungen), '
+                                    f"bitte 'python scripts/monatssummen.py --rebuild' ausführen.")
+        except Exception as e:
+            logger.exception(f"Sync-Job {job.id} fehlgeschlagen")
+            db.session.rollback()
+            job.status = 'fehler'
+            job.meldung = str(e)[:500]
+        job.beendet_am = datetime.utcnow()
+        db.session.commit()
+        return True
+
+    def naechsten_ausfuehren(self):
+        """Ältesten wartenden Job ausführen; None, wenn keiner wartet"""
+        job = SyncJob.query.filter_by(status='wartend').order_by(SyncJob.id).first()
+        if job:
+            self.ausfuehren(job)
+        return job
+
+
+# Ein Worker-Thread je Prozess, wird beim Einreihen bei Bedarf gestartet
+_worker = None
+_worker_lock = threading.Lock()
+_neuer_job = threading.Event()
+
+
+def worker_starten(app):
+    """Worker-Thread starten bzw. über einen neuen Job benachrichtigen"""
+    global _worker
+    with _worker_lock:
+        _neuer_job.set()
+        if _worker is None:
+            _worker = threading.Thread(target=_worker_schleife, args=(app,), name='sync-job-worker', daemon=True)
+            _worker.start()
+
+
+def _worker_schleife(app):
+    """Wartende Jobs abarbeiten, danach beenden"""
+    global _worker
+    with app.app_context():
+        service = JobService()
+        while True:
+            try:
+                if service.naechsten_ausfuehren():
+                    continue
+            except Exception:
+                logger.exception("Sync-Worker: Fehler beim Abarbeiten der Jobs")
+                db.session.rollback()
+            with _worker_lock:
+                # Zwischen letzter Abfrage und Beenden eingereihte Jobs nicht verlieren
+                if not _neuer_job.is_set():
+                    _worker = None
+                    return
+                _neuer_job.clear()
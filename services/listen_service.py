@@ -0,0 +1,164 @@
+from collections import namedtuple
+from models import db, Buchung, Lieferant, Kunde, Lager, Artikel, Auftrag, Todo, User
+
+# Schlanke, schreibgeschützte Zeilen für die Listenansichten.
+# Es werden nur die Spalten geladen, die die Templates anzeigen; die Zeilen
+# laufen nicht durch die Identity Map der Session und haben keine Beziehungen.
+
+BUCHUNG_SPALTEN = (
+    Buchung.id,
+    Buchung.typ,
+    Buchung.lieferant_id,
+    Buchung.betrag,
+    Buchung.datum,
+    Buchung.rechnungsnummer,
+    Buchung.titel,
+    Buchung.pdf_pfad,
+    Buchung.quelle,
+    Buchung.von_zielkonto_abgebucht,
+    Buchung.ueberwiesen_am,
+)
+BuchungZeile = namedtuple('BuchungZeile', [spalte.key for spalte in BUCHUNG_SPALTEN])
+
+LieferantZeile = namedtuple('LieferantZeile', ['id', 'name'])
+
+KUNDE_SPALTEN = (Kunde.id, Kunde.name, Kunde.firma, Kunde.email, Kunde.telefon, Kunde.aktiv)
+KundeZeile = namedtuple('KundeZeile', [spalte.key for spalte in KUNDE_SPALTEN])
+
+LAGER_SPALTEN = (Lager.id, Lager.name, Lager.beschreibung, Lager.aktiv)
+LagerZeile = namedtuple('LagerZeile', [spalte.key for spalte in LAGER_SPALTEN])
+
+KundeKurz = namedtuple('KundeKurz', ['name', 'firma'])
+
+BenutzerZeile = namedtuple('BenutzerZeile', ['id', 'username'])
+
+
+class ArtikelZeile:
+    """Artikel-Zeile für die Lagerliste"""
+    __slots__ = ('id', 'artikelnummer', 'name', 'beschreibung', 'bestand', 'mindestbestand', 'einkaufspreis')
+
+    def __init__(self, id, artikelnummer, name, beschreibung, bestand, mindestbestand, einkaufspreis):
+        self.id = id
+        self.artikelnummer = artikelnummer
+        self.name = name
+        self.beschreibung = beschreibung
+        self.bestand = bestand
+        self.mindestbestand = mindestbestand
+        self.einkaufspreis = einkaufspreis
+
+    def ist_niedrig(self):
+        """Prüft ob Bestand unter Mindestbestand ist"""
+        return self.bestand <= self.mindestbestand
+
+
+class AuftragZeile:
+    """Auftrags-Karte für die Auftragsübersicht (Todos nur als Zähler)"""
+    __slots__ = ('id', 'auftragsnummer', 'titel', 'beschreibung', 'status', 'prioritaet', 'startdatum',
+                 'kunde', 'kunde_obj', 'zugewiesen_an', 'todos_anzahl', 'todos_erledigt')
+
+    def __init__(self, id, auftragsnummer, titel, beschreibung, status, prioritaet, startdatum,
+                 kunde, kunde_obj, zugewiesen_an, todos_anzahl, todos_erledigt):
+        self.id = id
+        self.auftragsnummer = auftragsnummer
+        self.titel = titel
+        self.beschreibung = beschreibung
+        self.status = status
+        self.prioritaet = prioritaet
+        self.startdatum = startdatum
+        self.kunde = kunde
+        self.kunde_obj = kunde_obj
+        self.zugewiesen_an = zugewiesen_an
+        self.todos_anzahl = todos_anzahl
+        self.todos_erledigt = todos_erledigt
+
+    def get_fortschritt(self):
+        """Berechnet Fortschritt basierend auf erledigten Todos"""
+        if not self.todos_anzahl:
+            return 0
+        return int((self.todos_erledigt / self.todos_anzahl) * 100)
+
+
+def buchung_zeilen(stmt):
+    """SELECT über BUCHUNG_SPALTEN ausführen und als BuchungZeile zurückgeben"""
+    return list(map(BuchungZeile._make, db.session.execute(stmt)))
+
+
+class ListenService:
+    """Schreibgeschützte Abfragen für Kunden-, Lager- und Auftragslisten"""
+
+    def get_kunden(self):
+        """Alle Kunden nach Name"""
+        stmt = db.select(*KUNDE_SPALTEN).order_by(Kunde.name)
+        return list(map(KundeZeile._make, db.session.execute(stmt)))
+
+    def get_lager_liste(self, nur_aktive=True):
+        """Lager nach Name"""
+        stmt = db.select(*LAGER_SPALTEN).order_by(Lager.name)
+        if nur_aktive:
+            stmt = stmt.where(Lager.aktiv == True)
+        return list(map(LagerZeile._make, db.session.execute(stmt)))
+
+    def get_artikel(self, lager_id):
+        """Artikel eines Lagers nach Name"""
+        stmt = db.select(
+            Artikel.id,
+            Artikel.artikelnummer,
+            Artikel.name,
+            Artikel.beschreibung,
+            Artikel.bestand,
+            Artikel.mindestbestand,
+            Artikel.einkaufspreis
+        ).where(Artikel.lager_id == lager_id).order_by(Artikel.name)
+        return [ArtikelZeile(*zeile) for zeile in db.session.execute(stmt)]
+
+    def get_artikel_anzahl(self):
+        """Artikelanzahl je Lager als {lager_id: anzahl} (eine gruppierte Abfrage)"""
+        stmt = db.select(Artikel.lager_id, db.func.count(Artikel.id)).group_by(Artikel.lager_id)
+        return dict(db.session.execute(stmt).all())
+
+    def get_auftraege(self, status=None):
+        """Aufträge (neueste zuerst) inkl. Kunde, Zuweisung und Todo-Zählern in einer Abfrage"""
+        todo_zaehler = db.select(
+            Todo.auftrag_id.label('auftrag_id'),
+            db.func.count(Todo.id).label('anzahl'),
+            db.func.sum(db.case((Todo.erledigt == True, 1), else_=0)).label('erledigt')
+        ).group_by(Todo.auftrag_id).subquery()
+
+        stmt = db.select(
+            Auftrag.id,
+            Auftrag.auftragsnummer,
+            Auftrag.titel,
+            # Die Karte zeigt höchstens 100 Zeichen (+1 für die "..."-Prüfung)
+            db.func.substr(Auftrag.beschreibung, 1, 101),
+            Auftrag.status,
+            Auftrag.prioritaet,
+            Auftrag.startdatum,
+            Auftrag.kunde,
+            Kunde.name,
+            Kunde.firma,
+            User.id,
+            User.username,
+            todo_zaehler.c.anzahl,
+            todo_zaehler.c.erledigt
+        ).outerjoin(
+            Kunde, Auftrag.kunde_id == Kunde.id
+        ).outerjoin(
+            User, Auftrag.zugewiesen_an_id == User.id
+        ).outerjoin(
+            todo_zaehler, todo_zaehler.c.auftrag_id == Auftrag.id
+        ).order_by(Auftrag.created_at.desc())
+
+        if status:
+            stmt = stmt.where(Auftrag.status == status)
+
+        auftraege = []
+        for (auftrag_id, auftragsnummer, titel, beschreibung, status_wert, prioritaet, startdatum, kunde,
+             kunde_name, kunde_firma, user_id, username, todos_anzahl, todos_erledigt) in db.session.execute(stmt):
+            auftraege.append(AuftragZeile(
+                auftrag_id, auftragsnummer, titel, beschreibung, status_wert, prioritaet, startdatum, kunde,
+                KundeKurz(kunde_name, kunde_firma) if kunde_name is not None else None,
+                BenutzerZeile(user_id, username) if user_id is not None else None,
+                int(todos_anzahl or 0),
+                int(todos_erledigt or 0)
+            ))
+        return auftraege
@@ -0,0 +1,133 @@
+import logging
+from decimal import Decimal
+from models import db, Buchung, BuchungMonatsSumme
+
+logger = logging.getLogger(__name__)
+
+
+class MonatssummenService:
+    """Lesen, Neuaufbau und Prüfung des Monats-Rollups (BuchungMonatsSumme)"""
+
+    def _aggregat_aus_buchungen(self):
+        """Gruppierte Abfrage über buchung in der Struktur des Rollups"""
+        monat = db.cast(db.extract('month', Buchung.datum), db.Integer).label('monat')
+        summe_cent = db.cast(
+            db.func.sum(db.func.round(Buchung.betrag * 100)), db.BigInteger
+        ).label('summe_cent')
+        return db.session.query(
+            Buchung.jahr,
+            monat,
+            Buchung.typ,
+            Buchung.lieferant_id,
+            summe_cent,
+            db.func.count(Buchung.id).label('anzahl')
+        ).group_by(Buchung.jahr, monat, Buchung.typ, Buchung.lieferant_id)
+
+    def rebuild(self, commit=True):
+        """Rollup vollständig aus der buchung-Tabelle neu berechnen (INSERT ... SELECT)
+
+        Mit commit=False bleibt der Neuaufbau in der laufenden Transaktion des
+        Aufrufers (z.B. einer Schema-Migration), die auch Commit bzw. Rollback übernimmt.
+        """
+        tabelle = BuchungMonatsSumme.__table__
+        if commit:
+            try:
+                self._neu_aufbauen(tabelle)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        else:
+            self._neu_aufbauen(tabelle)
+        anzahl = db.session.query(db.func.count(BuchungMonatsSumme.id)).scalar()
+        logger.info(f"Monatssummen neu aufgebaut: {anzahl} Zeilen")
+        return anzahl
+
+    def _neu_aufbauen(self, tabelle):
+        """Rollup leeren und per INSERT ... SELECT neu befüllen (ohne Commit)"""
+        db.session.execute(tabelle.delete())
+        db.session.execute(
+            tabelle.insert().from_select(
+                ['jahr', 'monat', 'typ', 'lieferant_id', 'summe_cent', 'anzahl'],
+                self._aggregat_aus_buchungen().statement
+            )
+        )
+
+    def pruefen(self):
+        """Rollup gegen die buchung-Tabelle prüfen
+
+        Gibt eine Liste von Abweichungen zurück (leer = konsistent). Jede Abweichung
+        enthält den Schlüssel sowie Soll- (buchung) und Ist-Werte (Rollup).
+        """
+        soll = {}
+        for jahr, monat, typ, lieferant_id, summe_cent, anzahl in self._aggregat_aus_buchungen():
+            soll[(jahr, int(monat), typ, lieferant_id)] = (int(summe_cent or 0), anzahl)
+
+        ist = {}
+        zeilen = db.session.query(
+            BuchungMonatsSumme.jahr,
+            BuchungMonatsSumme.monat,
+            BuchungMonatsSumme.typ,
+            BuchungMonatsSumme.lieferant_id,
+            db.func.sum(BuchungMonatsSumme.summe_cent),
+            db.func.sum(BuchungMonatsSumme.anzahl)
+        ).group_by(
+            BuchungMonatsSumme.jahr,
+            BuchungMonatsSumme.monat,
+            BuchungMonatsSumme.typ,
+            BuchungMonatsSumme.lieferant_id
+        )
+        for jahr, monat, typ, lieferant_id, summe_cent, anzahl in zeilen:
+            # Leere Gruppen (alle Buchungen verschoben/gelöscht) zählen nicht
+            if int(anzahl or 0) == 0 and int(summe_cent or 0) == 0:
+                continue
+            ist[(jahr, monat, typ, lieferant_id)] = (int(summe_cent or 0), int(anzahl or 0))
+
+        abweichungen = []
+        for schluessel in sorted(set(soll) | set(ist), key=lambda s: tuple(str(x) for x in s)):
+            soll_wert = soll.get(schluessel, (0, 0))
+            ist_wert = ist.get(schluessel, (0, 0))
+            if soll_wert != ist_wert:
+                jahr, monat, typ, lieferant_id = schluessel
+                abweichungen.append({
+                    'jahr': jahr,
+                    'monat': monat,
+                    'typ': typ,
+                    'lieferant_id': lieferant_id,
+                    'soll_cent': soll_wert[0],
+                    'ist_cent': ist_wert[0],
+                    'soll_anzahl': soll_wert[1],
+                    'ist_anzahl': ist_wert[1]
+                })
+
+        if abweichungen:
+            logger.warning(f"Monatssummen inkonsistent: {len(abweichungen)} Abweichungen")
+        return abweichungen
+
+    def get_monatssummen(self, jahr):
+        """Summen je (Typ, Monat) eines Jahres als {(typ, monat): Decimal}"""
+        zeilen = db.session.query(
+            BuchungMonatsSumme.typ,
+            BuchungMonatsSumme.monat,
+            db.func.sum(BuchungMonatsSumme.summe_cent)
+        ).filter(
+            BuchungMonatsSumme.jahr == jahr
+        ).group_by(BuchungMonatsSumme.typ, BuchungMonatsSumme.monat).all()
+
+        return {(typ, monat): Decimal(int(summe_cent or 0)).scaleb(-2) for typ, monat, summe_cent in zeilen}
+
+    def get_lieferanten_summen(self, jahr, typ='Ausgabe'):
+        """Jahressummen je Lieferant als {lieferant_id: (Decimal, Anzahl)} (None = ohne Lieferant)"""
+        zeilen = db.session.query(
+            BuchungMonatsSumme.lieferant_id,
+            db.func.sum(BuchungMonatsSumme.summe_cent),
+            db.func.sum(BuchungMonatsSumme.anzahl)
+        ).filter(
+            BuchungMonatsSumme.jahr == jahr,
+            BuchungMonatsSumme.typ == typ
+        ).group_by(BuchungMonatsSumme.lieferant_id).all()
+
+        return {
+            lieferant_id: (Decimal(int(summe_cent or 0)).scaleb(-2), int(anzahl or 0))
+            for lieferant_id, summe_cent, anzahl in zeilen
+        }
@@ -0,0 +1,147 @@
+import os
+import re
+import hashlib
+import tempfile
+import time
+from flask import current_app, has_app_context
+from models import db, Buchung
+
+# Dateiname in der Ablage: SHA-256 des Inhalts
+INHALT_NAME = re.compile(r'^([0-9a-f]{64})\.pdf$')
+BLOCKGROESSE = 1024 * 1024
+# Jüngere Dateien lässt aufraeumen() liegen: ihre Buchung kann noch im Entstehen sein
+KARENZ_SEKUNDEN = 3600
+
+
+class PDFAblage:
+    """Inhaltsadressierte Ablage der Rechnungs-PDFs
+
+    Jede Datei heißt nach dem SHA-256 ihres Inhalts und liegt in zwei
+    Verzeichnisebenen darunter (ab/cd/abcd….pdf), damit kein Verzeichnis
+    zehntausende Einträge bekommt. Identischer Inhalt wird nur einmal
+    gespeichert. Ältere Dateien (Zeitstempel-Namen direkt in UPLOAD_FOLDER)
+    bleiben über pfad() erreichbar, bis migrate_schema.py sie umzieht.
+    """
+
+    def __init__(self, basis=None):
+        if basis:
+            self.basis = basis
+        elif has_app_context():
+            self.basis = current_app.config['UPLOAD_FOLDER']
+        else:
+            self.basis = os.environ.get('UPLOAD_FOLDER', 'data/rechnungen')
+
+    def relativer_pfad(self, sha):
+        """Ablageort relativ zu UPLOAD_FOLDER, z.B. 'ab/cd/abcd….pdf'"""
+        return os.path.join(sha[:2], sha[2:4], f'{sha}.pdf')
+
+    def pfad(self, name):
+        """Absoluter Pfad zu einem Dateinamen aus einer Buchung (Inhaltsname oder alter Name)"""
+        treffer = INHALT_NAME.match(os.path.basename(name))
+        if treffer:
+            return os.path.join(self.basis, self.relativer_pfad(treffer.group(1)))
+        return os.path.join(self.basis, name)
+
+    def hash_von(self, pfad):
+        """SHA-256 einer abgelegten Datei (bei Inhaltsnamen ohne erneutes Lesen)"""
+        treffer = INHALT_NAME.match(os.path.basename(pfad))
+        if treffer:
+            return treffer.group(1)
+        from services.duplikat_service import datei_hash
+        return datei_hash(pfad)
+
+    def speichern(self, quelle):
+        """
+        PDF ablegen; der Hash entsteht beim Schreiben, ohne die Datei erneut zu lesen
+
+        Args:
+            quelle: bytes oder Datei-Objekt (z.B. FileStorage.stream eines Uploads)
+
+        Returns:
+            (absoluter Pfad, SHA-256)
+        """
+        os.makedirs(self.basis, exist_ok=True)
+        sha = hashlib.sha256()
+        # Temporäre Datei im selben Dateisystem, damit das Umbenennen atomar ist
+        fd, tmp_pfad = tempfile.mkstemp(prefix='.upload-', suffix='.pdf', dir=self.basis)
+        try:
+            with os.fdopen(fd, 'wb') as ziel:
+                if isinstance(quelle, (bytes, bytearray)):
+                    sha.update(quelle)
+                    ziel.write(quelle)
+                else:
+                    for block in iter(lambda: quelle.read(BLOCKGROESSE), b''):
+                        sha.update(block)
+                        ziel.write(block)
+            return self._einsortieren(tmp_pfad, sha.hexdigest()), sha.hexdigest()
+        except BaseException:
+            if os.path.exists(tmp_pfad):
+                os.remove(tmp_pfad)
+            raise
+
+    def _einsortieren(self, quelle_pfad, sha):
+        """Datei an ihren Inhaltsort verschieben; ist er schon belegt, die Quelle verwerfen"""
+        ziel = os.path.join(self.basis, self.relativer_pfad(sha))
+        if os.path.exists(ziel):
+            os.remove(quelle_pfad)
+            # Als frisch markieren, damit aufraeumen() die wiederverwendete Datei nicht löscht
+            os.utime(ziel)
+        else:
+            os.makedirs(os.path.dirname(ziel), exist_ok=True)
+            os.replace(quelle_pfad, ziel)
+        return ziel
+
+    def umziehen(self, alter_pfad, sha=None):
+        """
+        Vorhandene Datei in die Ablage verschieben (Migration alter Dateinamen)
+
+        Args:
+            sha: bekannter SHA-256 (Buchung.pdf_hash), spart das Lesen der Datei
+
+        Returns:
+            (neuer Pfad, SHA-256)
+        """
+        sha = sha or self.hash_von(alter_pfad)
+        return self._einsortieren(alter_pfad, sha), sha
+
+    def verwaiste(self, karenz=KARENZ_SEKUNDEN):
+        """
+        Dateien der Ablage, die keine Buchung verwendet (z.B. abgewiesene Duplikate,
+        gelöschte Buchungen) und die älter als karenz Sekunden sind
+
+        Returns:
+            Liste absoluter Pfade
+        """
+        benutzt = {sha for (sha,) in db.session.query(Buchung.pdf_hash).filter(Buchung.pdf_hash.isnot(None))}
+        for (pdf_pfad,) in db.session.query(Buchung.pdf_pfad).filter(Buchung.pdf_pfad.isnot(None)):
+            treffer = INHALT_NAME.match(os.path.basename(pdf_pfad))
+            if treffer:
+                benutzt.add(treffer.group(1))
+
+        grenze = time.time() - karenz
+        verwaist = []
+        for verzeichnis, _, dateien in os.walk(self.basis):
+            for name in dateien:
+                pfad = os.path.join(verzeichnis, name)
+                treffer = INHALT_NAME.match(name)
+                # Nur Inhaltsnamen an ihrem Ablageort, alte Dateinamen bleiben unangetastet
+                if not treffer or pfad != os.path.join(self.basis, self.relativer_pfad(treffer.group(1))):
+                    continue
+                if treffer.group(1) not in benutzt and os.path.getmtime(pfad) < grenze:
+                    verwaist.append(pfad)
+        return verwaist
+
+    def aufraeumen(self, karenz=KARENZ_SEKUNDEN):
+        """Verwaiste Dateien löschen (offline, z.B. scripts/duplikate.py --aufraeumen)
+
+        Returns:
+            Liste der gelöschten Pfade
+        """
+        geloescht = []
+        for pfad in self.verwaiste(karenz):
+            try:
+                os.remove(pfad)
+            except FileNotFoundError:
+                continue
+            geloescht.append(pfad)
+        return geloescht
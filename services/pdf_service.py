@@ -1,155 +1,308 @@
-import pdfplumber
+import os
 import re
+import logging
+import traceback
+from contextlib import closing
+import pdfplumber
+from flask import current_app, has_app_context
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
 
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+logger = logging.getLogger(__name__)
+
+# Letzter Buchstabe bzw. Länge der Schlüsselwörter vor einem Betrag (Total, Amount, Sum, Summe,
+# Endbetrag, Zu zahlen, ...): nur dann lohnt die Suche nach dem Schlüsselwort
+SCHLUESSELWORT_ENDEN = frozenset('ltmegnLTMEGN')
+SCHLUESSELWORT_LAENGE = 9
+
+# Treffer, die nur die Beschriftung statt der Rechnungsnummer sind
+UNGUELTIGE_NUMMERN = {'belegnummer', 'rechnung', 'rechnungsnummer', 'rechnungsdatum', 'zahlungsziel', 'datum',
+                      'invoice', 'nr', 'no', 'template', 'debitoren', 'xml', 'nummer', 'seite'}
+
+
+def _seiten_pymupdf(pdf_path):
+    """Text je Seite mit PyMuPDF (Zeilen nach Position sortiert)"""
+    with fitz.open(pdf_path) as pdf:
+        for page in pdf:
+            yield page.get_text('text', sort=True)
+
+
+def _seiten_pdfplumber(pdf_path):
+    """Text je Seite mit pdfplumber (Layout-Analyse, deutlich langsamer)"""
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            yield page.extract_text() or ""
+
+
+# Text-Backends für PDFService: Name -> Funktion, die die Seitentexte liefert
+TEXT_BACKENDS = {
+    'pymupdf': _seiten_pymupdf,
+    'pdfplumber': _seiten_pdfplumber,
+}
+
+
+def _betrag_wert(text):
+    """'1.744,36' / '1744,36' / '1744.36' -> float, None wenn keine Zahl"""
+    # Prüfen ob es ein deutsches Format ist (Komma als Dezimaltrenner)
+    if ',' in text and '.' in text:
+        # Format: 1.744,36 -> 1744.36
+        text = text.replace('.', '').replace(',', '.')
+    elif ',' in text:
+        # Format: 1744,36 -> 1744.36
+        text = text.replace(',', '.')
+    try:
+        return float(text)
+    except (ValueError, InvalidOperation):
+        return None
+
+
 class PDFService:
-    """PDF-Verarbeitung für Rechnungen"""
+    """PDF-Verarbeitung für Rechnungen
+    
+    Alle Muster werden einmal beim Laden der Klasse kompiliert. Den Text
+    liest standardmäßig PyMuPDF (PDF_TEXT_BACKEND), pdfplumber nur als
+    Rückfalloption.
+    """
+    
+    # Betrag: Sonderformat ##BETRAGBRUTTO=1744,36##
+    BETRAG_SONDERFORMAT = [
+        re.compile(r'##BETRAGBRUTTO=([\d.,]+)##', re.IGNORECASE | re.MULTILINE),
+        re.compile(r'##BETRAGNETTO=([\d.,]+)##', re.IGNORECASE | re.MULTILINE),
+    ]
+    # Betrag: jede Zahlenfolge mit den Leerzeichen/Doppelpunkten davor und, ohne es zu
+    # verbrauchen, der Währung bzw. dem MwSt-Hinweis danach
+    ZAHLENFOLGE = re.compile(
+        r'[\s:]*(?P<zahl>[\d.,]+)(?:(?=\s*(?:(?P<waehrung>EUR|€|Euro)|(?P<hinweis>BTW|inkl\.|MwSt)))|)',
+        re.IGNORECASE
+    )
+    # Schlüsselwort direkt vor den Leerzeichen/Doppelpunkten, eine Gruppe je Schlüsselwort-Liste
+    # (Amount/Total/Sum/Price/Totaal bzw. Gesamt/Total/Summe/Totaal/Endbetrag/Zu zahlen)
+    SCHLUESSELWORT = re.compile(
+        r'(?:(?P<total>Total|Totaal)|(?P<amount>Amount|Sum|Price)|(?P<gesamt>Gesamt|Summe|Endbetrag|Zu zahlen))\Z',
+        re.IGNORECASE
+    )
+    # Zahlen im Tausenderformat (1.234,56), nach "Gesamt" auch ohne Nachkommastellen
+    GESAMT_ZAHL = re.compile(r'\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})?')
+    BETRAG_ZAHL = re.compile(r'\d{1,3}(?:[.,]\d{3})*[.,]\d{2}')
+    # Fallback ohne Schlüsselwort/Währung: Zahl mit 2 Dezimalstellen am Zeilenende
+    BETRAG_FALLBACK = [
+        re.compile(r'([\d]{1,3}(?:[.,]\d{3})*[.,]\d{2})\s*$', re.MULTILINE),  # Am Ende der Zeile
+        re.compile(r'([\d]{1,3}(?:[.,]\d{3})*[.,]\d{2})\s*\n', re.MULTILINE),  # Vor Zeilenumbruch
+    ]
+    # Zeile mit dem Endbetrag der Rechnung: danach kann das Lesen weiterer Seiten enden. Nur eindeutige
+    # Formulierungen; Seiten-, Netto-, Teil- und Zwischensummen sowie Überträge beenden das Lesen nicht
+    SUMMENZEILE = re.compile(
+        r'^(?![^\n]*(?:netto|übertrag|seitensumme|teilsumme|zwischensumme))[^\n]*?'
+        r'(?:Gesamtbetrag|Rechnungsbetrag|Endbetrag|Zu zahlen|BETRAGBRUTTO=)'
+        r'[^\n\d]{0,40}\d+(?:[.,]\d{3})*[.,]\d{2}',
+        re.IGNORECASE | re.MULTILINE
+    )
+    GESAMT_DEBUG = re.compile(r'(?:Gesamt|Total|Summe|Totaal|Endbetrag)[\s:]*([\d.,]+)', re.IGNORECASE)
+    
+    # Datumsformate in Prioritätsreihenfolge
+    DATUM_MUSTER = [
+        re.compile(r'(?:Rechnungsdatum|Datum|Date)[\s:]*(\d{1,2})[./-](\d{1,2})[./-](\d{2,4})'),
+        re.compile(r'(\d{1,2})[./-](\d{1,2})[./-](\d{2,4})'),
+        re.compile(r'(\d{4})[./-](\d{1,2})[./-](\d{1,2})'),
+    ]
+    
+    # Rechnungsnummer in Prioritätsreihenfolge
+    RECHNUNGSNUMMER_MUSTER = [re.compile(muster, re.IGNORECASE | re.MULTILINE) for muster in (
+        # Belegnummer Format: "Belegnummer Datum Seite" gefolgt von Zahl
+        r'Belegnummer\s+Datum\s+Seite\s*\n\s*(\d+)',
+        # Belegnummer direkt gefolgt von Zahl
+        r'Belegnummer\s+(\d+)',
+        # Rechnungsnummer Format: "Rechnungsnummer" gefolgt von Nummer (nicht das Wort selbst!)
+        # Wichtig: Muss mit Zahl oder Buchstabe-Zahl-Kombination beginnen, nicht mit "Rechnungsdatum"
+        # Format für Ralateam: "Rechnungsnummer Rechnungsdatum Zahlungsziel" - Rechnungsnummer steht in der nächsten Zeile
+        r'Rechnungsnummer\s+Rechnungsdatum\s+Zahlungsziel\s*\n\s*(\d+)',  # Format: Rechnungsnummer Rechnungsdatum Zahlungsziel\n999901690
+        r'Rechnungsnummer\s*[:]?\s+([A-Z0-9][A-Z0-9\-/]*)',  # Mindestens ein Leerzeichen nach "Rechnungsnummer"
+        r'Rechnungsnummer\s*:\s*([A-Z0-9][A-Z0-9\-/]*)',  # Mit Doppelpunkt
+        # Format für Ralateam: "Rechnungsnummer OP/I051733" oder "999901690"
+        r'Rechnungsnummer\s+([A-Z0-9][A-Z0-9\-/]+)',  # Mindestens 2 Zeichen
+        # Spezielles Format: INVOICE-4937130 oder OP/I051733
+        r'INVOICE[-/](\d+)',
+        r'OP[/]?([A-Z0-9\-/]+)',  # Format: OP/I051733
+        # Standard-Muster (nur wenn nicht "Rechnungsnummer" selbst)
+        r'(?:Invoice|Nr\.?|No\.?)[\s:]*([A-Z0-9][A-Z0-9\-/]*)',
+        r'#\s*([A-Z0-9][A-Z0-9\-/]*)',
+        r'INV[-/]?([A-Z0-9][A-Z0-9\-/]*)',
+    )]
+    
+    def __init__(self, backend=None):
+        """
+        Args:
+            backend: Text-Backend ('pymupdf' oder 'pdfplumber'), sonst PDF_TEXT_BACKEND
+        """
+        if not backend:
+            if has_app_context():
+                backend = current_app.config.get('PDF_TEXT_BACKEND')
+            else:
+                backend = os.environ.get('PDF_TEXT_BACKEND')
+        backend = (backend or 'pymupdf').lower()
+        if backend not in TEXT_BACKENDS:
+            raise ValueError(f"Unbekanntes PDF-Text-Backend: {backend} (erlaubt: {', '.join(TEXT_BACKENDS)})")
+        if backend == 'pymupdf' and fitz is None:
+            logger.warning("PyMuPDF nicht installiert, PDF-Text wird mit pdfplumber gelesen")
+            backend = 'pdfplumber'
+        self.backend = backend
     
     def extract_invoice_data(self, pdf_path):
-        """Rechnungsdaten aus PDF extrahieren"""
+        """Rechnungsdaten aus PDF extrahieren
+        
+        Liefert PyMuPDF keinen Betrag (oder scheitert am PDF), wird das PDF
+        noch einmal mit pdfplumber gelesen, dessen Layout-Analyse Zeilen aus
+        Tabellen und Spalten oft besser zusammensetzt.
+        """
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                # Text aus allen Seiten extrahieren
-                full_text = ""
-                for page in pdf.pages:
-                    full_text += page.extract_text() or ""
-                
-                if not full_text or len(full_text.strip()) < 10:
-                    import logging
-                    logger = logging.getLogger(__name__)
-                    logger.warning(f"PDF enthält keinen oder zu wenig Text: {pdf_path}")
-                    return None
-                
-                # Daten extrahieren
-                betrag = self._extract_amount(full_text)
-                datum = self._extract_date(full_text)
-                rechnungsnummer = self._extract_invoice_number(full_text)
-                titel = self._extract_title(full_text, pdf_path)
-                
-                data = {
-                    'betrag': betrag,
-                    'datum': datum,
-                    'rechnungsnummer': rechnungsnummer,
-                    'titel': titel
-                }
-                
-                # Logging für Debugging
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.info(f"PDF-Analyse: Betrag={betrag}, Datum={datum}, Rechnungsnummer={rechnungsnummer}, Titel={titel}")
-                
-                # Wenn kein Betrag gefunden, zeige ersten 500 Zeichen des Textes für Debugging
-                if not betrag:
-                    logger.warning(f"PDF-Analyse: Kein Betrag gefunden. Erste 500 Zeichen: {full_text[:500]}")
-                    # Suche auch nach "Gesamt", "Total" etc. im Text
-                    import re
-                    gesamt_matches = re.findall(r'(?:Gesamt|Total|Summe|Totaal|Endbetrag)[\s:]*([\d.,]+)', full_text, re.IGNORECASE)
-                    if gesamt_matches:
-                        logger.warning(f"PDF-Analyse: Gefundene 'Gesamt/Total' Matches: {gesamt_matches}")
-                
-                return data if data['betrag'] else None
-                
+            data = self._daten_extrahieren(pdf_path, self.backend)
+            if self.backend != 'pdfplumber' and not (data and data['betrag']):
+                logger.info(f"PDF-Analyse: kein Betrag mit {self.backend}, erneut mit pdfplumber: {pdf_path}")
+                data = self._daten_extrahieren(pdf_path, 'pdfplumber')
+            return data if data and data['betrag'] else None
         except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
             logger.error(f"Fehler bei PDF-Verarbeitung: {e}")
-            import traceback
             logger.error(traceback.format_exc())
             return None
     
+    def _daten_extrahieren(self, pdf_path, backend):
+        """Rechnungsdaten mit einem Text-Backend; None bei zu wenig Text"""
+        try:
+            # closing(): bei vorzeitigem Ende das PDF sofort schließen
+            with closing(TEXT_BACKENDS[backend](pdf_path)) as seiten:
+                full_text = self._text_lesen(seiten)
+        except Exception as e:
+            if backend == 'pdfplumber':
+                raise
+            # Defektes PDF: pdfplumber versuchen, statt die Rechnung zu verwerfen
+            logger.warning(f"PDF-Analyse: {backend} fehlgeschlagen ({e}): {pdf_path}")
+            return None
+        
+        if not full_text or len(full_text.strip()) < 10:
+            logger.warning(f"PDF enthält keinen oder zu wenig Text ({backend}): {pdf_path}")
+            return None
+        
+        # Daten extrahieren
+        betrag = self._extract_amount(full_text)
+        datum = self._extract_date(full_text)
+        rechnungsnummer = self._extract_invoice_number(full_text)
+        titel = self._extract_title(full_text, pdf_path)
+        
+        data = {
+            'betrag': betrag,
+            'datum': datum,
+            'rechnungsnummer': rechnungsnummer,
+            'titel': titel
+        }
+        
+        # Logging für Debugging
+        logger.info(f"PDF-Analyse ({backend}): Betrag={betrag}, Datum={datum}, Rechnungsnummer={rechnungsnummer}, Titel={titel}")
+        
+        # Wenn kein Betrag gefunden, zeige ersten 500 Zeichen des Textes für Debugging
+        if not betrag:
+            logger.warning(f"PDF-Analyse: Kein Betrag gefunden. Erste 500 Zeichen: {full_text[:500]}")
+            # Suche auch nach "Gesamt", "Total" etc. im Text
+            gesamt_matches = self.GESAMT_DEBUG.findall(full_text)
+            if gesamt_matches:
+                logger.warning(f"PDF-Analyse: Gefundene 'Gesamt/Total' Matches: {gesamt_matches}")
+        
+        return data
+    
+    def _text_lesen(self, seiten):
+        """Seitentexte zusammensetzen, Seite für Seite
+        
+        Sobald eine Seite den Endbetrag enthält und im bisherigen Text
+        Datum und Rechnungsnummer stehen, werden die restlichen Seiten (AGB,
+        Anlagen, Einzelnachweise) nicht mehr gelesen.
+        """
+        teile = []
+        for seite in seiten:
+            teile.append(seite)
+            if self.SUMMENZEILE.search(seite):
+                text = ''.join(teile)
+                if self._extract_date(text) and self._extract_invoice_number(text):
+                    return text
+        return ''.join(teile)
+    
     def _extract_amount(self, text):
-        """Betrag aus Text extrahieren"""
-        # Verschiedene Muster für Beträge
-        patterns = [
-            # Spezielles Format: ##BETRAGBRUTTO=1744,36##
-            r'##BETRAGBRUTTO=([\d.,]+)##',
-            r'##BETRAGNETTO=([\d.,]+)##',
-            # Standard-Muster mit € Symbol
-            r'(?:Summe|Gesamt|Total|Betrag|Endbetrag|Zu zahlen|Brutto|Netto|Totaal|Totaalbedrag)[\s:]*([\d.,]+)\s*€',
-            r'([\d.,]+)\s*€\s*(?:inkl|MwSt|inkl\.|MwSt\.|BTW)',
-            r'([\d.,]+)\s*EUR',
-            r'([\d.,]+)\s*€',
-            r'€\s*([\d.,]+)',
-            # Weitere Muster für verschiedene Formate
-            r'(?:Amount|Total|Sum|Price|Totaal)[\s:]*([\d.,]+)',
-            r'([\d.,]+)\s*(?:EUR|€|Euro)',
-            # Muster ohne Währungssymbol (nur wenn nach "Gesamt", "Total" etc.)
-            r'(?:Gesamt|Total|Summe|Totaal|Endbetrag|Zu zahlen)[\s:]*([\d]{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})?)',
-            # Zahlen mit Tausender-Trennzeichen am Ende (wahrscheinlich Gesamtbetrag)
-            r'([\d]{1,3}(?:[.,]\d{3})*[.,]\d{2})\s*(?:€|EUR|Euro|BTW|inkl\.|MwSt)',
-        ]
-        
-        # Suche nach größtem Betrag (wahrscheinlich Gesamtbetrag)
-        amounts = []
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
-            for match in matches:
-                try:
-                    # Komma/Punkt als Dezimaltrenner behandeln
-                    # Prüfen ob es ein deutsches Format ist (Komma als Dezimaltrenner)
-                    if ',' in match and '.' in match:
-                        # Format: 1.744,36 -> 1744.36
-                        amount_str = match.replace('.', '').replace(',', '.')
-                    elif ',' in match:
-                        # Format: 1744,36 -> 1744.36
-                        amount_str = match.replace(',', '.')
-                    else:
-                        # Format: 1744.36 oder 1744
-                        amount_str = match
-                    
-                    amount = float(amount_str)
-                    # Nur Beträge > 0 und < 1 Million akzeptieren (realistische Rechnungsbeträge)
-                    if 0 < amount < 1000000:
-                        amounts.append(amount)
-                except (ValueError, InvalidOperation):
-                    continue
+        """Betrag aus Text extrahieren
         
+        Größter Betrag aller Muster (wahrscheinlich Gesamtbetrag), siehe
+        _betrag_kandidaten(); ohne Treffer Zahlen am Zeilenende.
+        """
+        # Nur Beträge > 0 und < 1 Million akzeptieren (realistische Rechnungsbeträge)
+        amounts = [amount for amount in self._betrag_kandidaten(text) if amount is not None and 0 < amount < 1000000]
         if amounts:
             # Größten Betrag zurückgeben (wahrscheinlich Gesamtbetrag)
             return max(amounts)
         
         # Fallback: Suche nach großen Zahlen am Ende des Textes (oft Gesamtbetrag)
-        # Suche nach Zahlen mit 2 Dezimalstellen am Ende
-        fallback_patterns = [
-            r'([\d]{1,3}(?:[.,]\d{3})*[.,]\d{2})\s*$',  # Am Ende der Zeile
-            r'([\d]{1,3}(?:[.,]\d{3})*[.,]\d{2})\s*\n',  # Vor Zeilenumbruch
-        ]
-        
-        for pattern in fallback_patterns:
-            matches = re.findall(pattern, text, re.MULTILINE)
-            for match in matches:
-                try:
-                    if ',' in match and '.' in match:
-                        amount_str = match.replace('.', '').replace(',', '.')
-                    elif ',' in match:
-                        amount_str = match.replace(',', '.')
-                    else:
-                        amount_str = match
-                    
-                    amount = float(amount_str)
-                    if 1 <= amount < 1000000:  # Mindestens 1 EUR
-                        amounts.append(amount)
-                except (ValueError, InvalidOperation):
-                    continue
+        for pattern in self.BETRAG_FALLBACK:
+            for match in pattern.findall(text):
+                amount = _betrag_wert(match)
+                if amount is not None and 1 <= amount < 1000000:  # Mindestens 1 EUR
+                    amounts.append(amount)
         
         if amounts:
             return max(amounts)
         
         return None
     
+    def _betrag_kandidaten(self, text):
+        """Beträge aller Betrags-Muster in einem Durchlauf über die Zahlenfolgen
+        
+        Jede Zahlenfolge aus Ziffern, Punkten und Kommas wird einmal gefunden,
+        zusammen mit dem Schlüsselwort oder € davor und der Währung bzw. dem
+        MwSt-Hinweis danach. Das ergibt dieselben Beträge wie die einzelnen Muster:
+        
+        - "Summe: 12,50 €", "12,50 € inkl. MwSt", "12,50 EUR": Zahl vor €/EUR/Euro
+        - "€ 12,50": Zahl nach €
+        - "Total: 12,50": Zahl nach Amount/Total/Sum/Price/Totaal
+        - "Gesamt 1.234,50": Tausenderformat nach Gesamt/Total/Summe/...
+        - "1.234,50 BTW": Tausenderformat vor €/EUR/Euro/BTW/inkl./MwSt
+        
+        Das Sonderformat ##BETRAGBRUTTO=…## wird nur gesucht, wenn '##' vorkommt.
+        """
+        if '##' in text:
+            for pattern in self.BETRAG_SONDERFORMAT:
+                for match in pattern.findall(text):
+                    yield _betrag_wert(match)
+        
+        for treffer in self.ZAHLENFOLGE.finditer(text):
+            zahl, waehrung, hinweis = treffer.groups()
+            vor = treffer.start()
+            davor = text[vor - 1] if vor else ''
+            total = amount = gesamt = euro = None
+            if davor == '€':
+                # Zwischen € und Zahl nur Leerzeichen
+                euro = ':' not in text[vor:treffer.start('zahl')]
+            elif davor in SCHLUESSELWORT_ENDEN:
+                schluesselwort = self.SCHLUESSELWORT.search(text, max(0, vor - SCHLUESSELWORT_LAENGE), vor)
+                if schluesselwort:
+                    total, amount, gesamt = schluesselwort.groups()
+            if waehrung or total or amount or euro:
+                yield _betrag_wert(zahl)
+            if total or gesamt:
+                tausender = self.GESAMT_ZAHL.match(zahl)
+                if tausender:
+                    yield _betrag_wert(tausender.group())
+            if waehrung or hinweis:
+                # Längste Endung der Zahlenfolge im Tausenderformat ("1234,50" -> "234,50")
+                for position in range(len(zahl)):
+                    if self.BETRAG_ZAHL.fullmatch(zahl, position):
+                        yield _betrag_wert(zahl[position:])
+                        break
+    
     def _extract_date(self, text):
-        """Datum aus Text extrahieren"""
-        # Verschiedene Datumsformate
-        patterns = [
-            r'(?:Rechnungsdatum|Datum|Date)[\s:]*(\d{1,2})[./-](\d{1,2})[./-](\d{2,4})',
-            r'(\d{1,2})[./-](\d{1,2})[./-](\d{2,4})',
-            r'(\d{4})[./-](\d{1,2})[./-](\d{1,2})',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
+        """Datum aus Text extrahieren (erstes gültiges Datum nach Muster-Reihenfolge)"""
+        for pattern in self.DATUM_MUSTER:
+            for treffer in pattern.finditer(text):
+                match = treffer.groups()
                 try:
                     if len(match) == 3:
                         if len(match[2]) == 4:  # YYYY-MM-DD oder DD.MM.YYYY
@@ -169,37 +322,13 @@ class PDFService:
         return None
     
     def _extract_invoice_number(self, text):
-        """Rechnungsnummer extrahieren"""
-        patterns = [
-            # Belegnummer Format: "Belegnummer Datum Seite" gefolgt von Zahl
-            r'Belegnummer\s+Datum\s+Seite\s*\n\s*(\d+)',
-            # Belegnummer direkt gefolgt von Zahl
-            r'Belegnummer\s+(\d+)',
-            # Rechnungsnummer Format: "Rechnungsnummer" gefolgt von Nummer (nicht das Wort selbst!)
-            # Wichtig: Muss mit Zahl oder Buchstabe-Zahl-Kombination beginnen, nicht mit "Rechnungsdatum"
-            # Pattern: "Rechnungsnummer" gefolgt von Leerzeichen/Doppelpunkt, dann Nummer (nicht "Rechnungsdatum"!)
-            # Format für Ralateam: "Rechnungsnummer Rechnungsdatum Zahlungsziel" - Rechnungsnummer steht in der nächsten Zeile
-            r'Rechnungsnummer\s+Rechnungsdatum\s+Zahlungsziel\s*\n\s*(\d+)',  # Format: Rechnungsnummer Rechnungsdatum Zahlungsziel\n999901690
-            r'Rechnungsnummer\s*[:]?\s+([A-Z0-9][A-Z0-9\-/]*)',  # Mindestens ein Leerzeichen nach "Rechnungsnummer"
-            r'Rechnungsnummer\s*:\s*([A-Z0-9][A-Z0-9\-/]*)',  # Mit Doppelpunkt
-            # Format für Ralateam: "Rechnungsnummer OP/I051733" oder "999901690"
-            r'Rechnungsnummer\s+([A-Z0-9][A-Z0-9\-/]+)',  # Mindestens 2 Zeichen
-            # Spezielles Format: INVOICE-4937130 oder OP/I051733
-            r'INVOICE[-/](\d+)',
-            r'OP[/]?([A-Z0-9\-/]+)',  # Format: OP/I051733
-            # Standard-Muster (nur wenn nicht "Rechnungsnummer" selbst)
-            r'(?:Invoice|Nr\.?|No\.?)[\s:]*([A-Z0-9][A-Z0-9\-/]*)',
-            r'#\s*([A-Z0-9][A-Z0-9\-/]*)',
-            r'INV[-/]?([A-Z0-9][A-Z0-9\-/]*)',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
-            if matches:
-                result = matches[0].strip()
+        """Rechnungsnummer extrahieren (erster Treffer des ersten passenden Musters)"""
+        for pattern in self.RECHNUNGSNUMMER_MUSTER:
+            treffer = pattern.search(text)
+            if treffer:
+                result = treffer.group(1).strip()
                 # Prüfen ob es nicht nur "Belegnummer", "Rechnungsnummer", "Rechnungsdatum" oder ähnliches ist
-                invalid = ['belegnummer', 'rechnung', 'rechnungsnummer', 'rechnungsdatum', 'zahlungsziel', 'datum', 'invoice', 'nr', 'no', 'template', 'debitoren', 'xml', 'nummer', 'seite']
-                if result.lower() not in invalid and len(result) > 2:
+                if result.lower() not in UNGUELTIGE_NUMMERN and len(result) > 2:
                     # Prüfe auch, ob es nicht mit "rechnungs" beginnt
                     if not result.lower().startswith('rechnungs'):
                         # Prüfe ob es eine Zahl enthält (Rechnungsnummern enthalten meist Zahlen)
@@ -214,7 +343,7 @@ class PDFService:
     def _extract_title(self, text, pdf_path):
         """Titel/Bezeichnung extrahieren"""
         # Erste Zeile oder Rechnungstitel
-        lines = text.split('\n')
+        lines = text.split('\n', 10)
         for line in lines[:10]:  # Erste 10 Zeilen prüfen
             line = line.strip()
             if line and len(line) > 5 and not line.isdigit():
@@ -223,6 +352,5 @@ class PDFService:
                     return line
         
         # Fallback: Dateiname
-        import os
         return os.path.basename(pdf_path)
 
@@ -0,0 +1,175 @@
+import os
+import json
+import random
+import signal
+import logging
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db, Lieferant
+from services.job_service import JobService, JobFortschritt
+
+logger = logging.getLogger(__name__)
+
+# Rate-Limit und Serverfehler: mit wachsender Wartezeit erneut versuchen
+WIEDERHOLBAR = {429, 500, 502, 503, 504}
+BACKOFF_BASIS = timedelta(minutes=1)
+# So oft wird geprüft, ob Labels fällig sind (neue Lieferanten/Intervalle ohne Neustart)
+TAKT_SEKUNDEN = 30
+
+
+class DaemonFortschritt(JobFortschritt):
+    """Job-Fortschritt, der den Lauf bei SIGTERM nach dem aktuellen Block beendet"""
+
+    def __init__(self, job, stop):
+        super().__init__(job)
+        self.stop = stop
+
+    def abgebrochen(self):
+        return self.stop.is_set()
+
+
+class SyncDaemon:
+    """Dauerhaft laufende Gmail-Synchronisation mit Intervall je Label
+
+    Fällige Labels werden gemeinsam als Sync-Job ausgeführt, damit die Sperre
+    "ein Sync je Postfach" auch gegenüber dem Dashboard und Cron gilt. Nach
+    429/5xx wartet das betroffene Label exponentiell länger (bis
+    GMAIL_SYNC_BACKOFF_MAX_MINUTEN). Der Stand wird nach jedem Durchlauf als
+    JSON nach GMAIL_DAEMON_STATUS_PATH geschrieben.
+    """
+
+    def __init__(self, uhr=datetime.utcnow):
+        self.uhr = uhr
+        self.stop = threading.Event()
+        self.gestartet_am = uhr()
+        self.labels = {}  # Lieferant-ID -> Stand (label, status, letzter/naechster Lauf, fehlversuche)
+        self.letzter_job = None
+
+    def signale_registrieren(self):
+        """SIGTERM/SIGINT: laufenden Block fertig committen, dann beenden"""
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._signal)
+
+    def _signal(self, signum, frame):
+        logger.info(f"Sync-Daemon: Signal {signum} empfangen, beende nach dem aktuellen Block")
+        self.stop.set()
+
+    def _intervall(self, lieferant):
+        minuten = lieferant.gmail_sync_intervall or current_app.config.get('GMAIL_SYNC_INTERVALL_MINUTEN', 60)
+        return timedelta(minutes=minuten)
+
+    def _backoff(self, fehlversuche):
+        """Wartezeit nach dem n-ten Fehlversuch in Folge (1, 2, 4, ... Minuten, gedeckelt)"""
+        maximum = timedelta(minutes=current_app.config.get('GMAIL_SYNC_BACKOFF_MAX_MINUTEN', 60))
+        wartezeit = min(maximum, BACKOFF_BASIS * 2 ** (fehlversuche - 1))
+        # Streuung, damit nach einer Störung nicht alle Labels gleichzeitig wiederholen
+        return wartezeit * random.uniform(0.8, 1.0)
+
+    def faellige_lieferanten(self):
+        """Aktive Lieferanten mit Label, deren nächster Lauf erreicht ist"""
+        lieferanten = Lieferant.query.filter(
+            Lieferant.aktiv == True,
+            Lieferant.gmail_label.isnot(None),
+            Lieferant.gmail_label != ''
+        ).all()
+        jetzt = self.uhr()
+        # Gelöschte/deaktivierte Lieferanten nicht weiter anzeigen
+        self.labels = {l.id: self.labels.get(l.id) or {
+            'label': l.gmail_label, 'status': None, 'letzter_lauf': None,
+            'naechster_lauf': jetzt, 'fehlversuche': 0, 'http_status': None
+        } for l in lieferanten}
+        for l in lieferanten:
+            self.labels[l.id]['label'] = l.gmail_label
+        return [l for l in lieferanten if self.labels[l.id]['naechster_lauf'] <= jetzt]
+
+    def durchlauf(self):
+        """
+        Fällige Labels synchronisieren
+
+        Returns:
+            Anzahl synchronisierter Labels (0 wenn keines fällig ist oder bereits ein Sync läuft)
+        """
+        faellig = self.faellige_lieferanten()
+        if not faellig:
+            return 0
+
+        job_service = JobService()
+        job, neu = job_service.einreihen(parameter={'lieferant_ids': [l.id for l in faellig]})
+        if not neu:
+            logger.info(f"Sync-Daemon: Job {job.id} läuft bereits, nächster Versuch im nächsten Takt")
+            return 0
+        fortschritt = DaemonFortschritt(job, self.stop)
+        if not job_service.ausfuehren(job, fortschritt=fortschritt):
+            return 0
+        self.letzter_job = job.als_dict()
+        if self.stop.is_set():
+            # Nicht fertig geprüfte Labels beim nächsten Start sofort wieder fällig
+            return 0
+
+        jetzt = self.uhr()
+        for lieferant in faellig:
+            stand = self.labels[lieferant.id]
+            http_status = fortschritt.http_fehler.get(lieferant.id)
+            stand['letzter_lauf'] = jetzt
+            stand['http_status'] = http_status
+            if job.status == 'fehler' or http_status in WIEDERHOLBAR:
+                stand['fehlversuche'] += 1
+                stand['status'] = 'backoff'
+                stand['naechster_lauf'] = jetzt + self._backoff(stand['fehlversuche'])
+                logger.warning(f"Sync-Daemon: Label '{stand['label']}' fehlgeschlagen "
+                               f"({http_status or job.meldung}), nächster Versuch {stand['naechster_lauf']:%H:%M:%S}")
+            else:
+                stand['fehlversuche'] = 0
+                stand['status'] = 'fehler' if http_status else 'ok'
+                stand['naechster_lauf'] = jetzt + self._intervall(lieferant)
+        return len(faellig)
+
+    def status(self):
+        """Stand des Daemons (für die Statusdatei)"""
+        def zeit(wert):
+            return wert.isoformat() if wert else None
+        return {
+            'pid': os.getpid(),
+            'gestartet_am': zeit(self.gestartet_am),
+            'aktualisiert_am': zeit(self.uhr()),
+            'beendet': self.stop.is_set(),
+            'letzter_job': self.letzter_job,
+            'labels': [
+                {
+                    'lieferant_id': lieferant_id,
+                    'label': stand['label'],
+                    'status': stand['status'],
+                    'letzter_lauf': zeit(stand['letzter_lauf']),
+                    'naechster_lauf': zeit(stand['naechster_lauf']),
+                    'fehlversuche': stand['fehlversuche'],
+                    'http_status': stand['http_status'],
+                }
+                for lieferant_id, stand in sorted(self.labels.items())
+            ],
+        }
+
+    def status_schreiben(self):
+        """Statusdatei atomar ersetzen (Leser sehen nie eine halbe Datei)"""
+        pfad = current_app.config['GMAIL_DAEMON_STATUS_PATH']
+        os.makedirs(os.path.dirname(pfad), exist_ok=True)
+        with open(pfad + '.tmp', 'w') as f:
+            json.dump(self.status(), f, indent=2)
+        os.replace(pfad + '.tmp', pfad)
+
+    def laufen(self):
+        """Bis SIGTERM/SIGINT synchronisieren (benötigt App-Kontext)"""
+        self.signale_registrieren()
+        logger.info("Sync-Daemon gestartet")
+        while not self.stop.is_set():
+            try:
+                self.durchlauf()
+            except Exception:
+                logger.exception("Sync-Daemon: Fehler im Durchlauf")
+                db.session.rollback()
+            self.status_schreiben()
+            # Verbindung freigeben und Identity-Map leeren, der Prozess läuft dauerhaft
+            db.session.remove()
+            self.stop.wait(TAKT_SEKUNDEN)
+        self.status_schreiben()
+        logger.info("Sync-Daemon beendet")
@@ -0,0 +1,96 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Stufen der Import-Pipeline in Anzeigereihenfolge
+STUFEN = ['auflisten', 'details', 'download', 'analyse', 'buchung', 'commit']
+
+
+class Messpunkt:
+    """Einzelne Messung; bytes/fehler kann der Aufrufer innerhalb des with-Blocks setzen"""
+    __slots__ = ('bytes', 'fehler')
+
+    def __init__(self):
+        self.bytes = 0
+        self.fehler = False
+
+
+class _Stufe:
+    __slots__ = ('aufrufe', 'fehler', 'bytes', 'dauern')
+
+    def __init__(self):
+        self.aufrufe = 0
+        self.fehler = 0
+        self.bytes = 0
+        self.dauern = []
+
+
+def _perzentil(sortiert, anteil):
+    """Perzentil einer sortierten Liste (nächster Rang)"""
+    if not sortiert:
+        return 0.0
+    return sortiert[min(len(sortiert) - 1, int(anteil * len(sortiert)))]
+
+
+class SyncMessung:
+    """Zeiten und Zähler je Stufe eines Sync-Laufs (thread-sicher)
+
+    Je Aufruf werden nur perf_counter() und ein Listeneintrag fällig; die
+    Perzentile entstehen erst in zusammenfassung(). Mit aktiv=False liefert
+    messen() einen leeren Messpunkt ohne Zeitmessung.
+    """
+
+    def __init__(self, aktiv=True):
+        self.aktiv = aktiv
+        self.stufen = {}
+        self._lock = threading.Lock()
+
+    def erfassen(self, stufe, dauer, bytes=0, fehler=False):
+        """Bereits gemessene Dauer (Sekunden) eintragen, z.B. aus einem PDF-Prozess"""
+        if not self.aktiv:
+            return
+        with self._lock:
+            eintrag = self.stufen.get(stufe)
+            if eintrag is None:
+                eintrag = self.stufen[stufe] = _Stufe()
+            eintrag.aufrufe += 1
+            eintrag.bytes += bytes
+            eintrag.dauern.append(dauer)
+            if fehler:
+                eintrag.fehler += 1
+
+    @contextmanager
+    def messen(self, stufe):
+        """Dauer des with-Blocks erfassen; eine Exception zählt als Fehler"""
+        punkt = Messpunkt()
+        if not self.aktiv:
+            yield punkt
+            return
+        start = time.perf_counter()
+        try:
+            yield punkt
+        except BaseException:
+            punkt.fehler = True
+            raise
+        finally:
+            self.erfassen(stufe, time.perf_counter() - start, punkt.bytes, punkt.fehler)
+
+    def zusammenfassung(self):
+        """{stufe: {aufrufe, fehler, bytes, summe_s, p50_ms, p90_ms, p99_ms, max_ms}}"""
+        with self._lock:
+            stufen = dict(self.stufen)
+        ergebnis = {}
+        for name in sorted(stufen, key=lambda s: STUFEN.index(s) if s in STUFEN else len(STUFEN)):
+            eintrag = stufen[name]
+            dauern = sorted(eintrag.dauern)
+            ergebnis[name] = {
+                'aufrufe': eintrag.aufrufe,
+                'fehler': eintrag.fehler,
+                'bytes': eintrag.bytes,
+                'summe_s': round(sum(dauern), 3),
+                'p50_ms': round(_perzentil(dauern, 0.5) * 1000, 1),
+                'p90_ms': round(_perzentil(dauern, 0.9) * 1000, 1),
+                'p99_ms': round(_perzentil(dauern, 0.99) * 1000, 1),
+                'max_ms': round(dauern[-1] * 1000, 1) if dauern else 0.0,
+            }
+        return ergebnis